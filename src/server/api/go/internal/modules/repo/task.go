@@ -20,7 +20,11 @@ func NewTaskRepo(db *gorm.DB) TaskRepo {
 }
 
 func (r *taskRepo) ListBySessionWithCursor(ctx context.Context, sessionID uuid.UUID, afterCreatedAt time.Time, afterID uuid.UUID, limit int, timeDesc bool) ([]model.Task, error) {
-	q := r.db.WithContext(ctx).Where("session_id = ? AND is_planning = false", sessionID)
+	// tasks.order is a sparse sort key, expose the dense 1..n rank of each task instead
+	ranked := r.db.Model(&model.Task{}).
+		Select(`id, session_id, project_id, ROW_NUMBER() OVER (ORDER BY "order" ASC) AS "order", data, status, is_planning, created_at, updated_at`).
+		Where("session_id = ? AND is_planning = false", sessionID)
+	q := r.db.WithContext(ctx).Table("(?) AS tasks", ranked)
 
 	// Apply cursor-based pagination filter if cursor is provided
 	if !afterCreatedAt.IsZero() && afterID != uuid.Nil {
@@ -0,0 +1,93 @@
+package repo
+
+import (
+	"context"
+	"testing"
+	"time"
+
+	"github.com/google/uuid"
+	"github.com/memodb-io/Acontext/internal/modules/model"
+	"github.com/stretchr/testify/assert"
+	"github.com/stretchr/testify/require"
+)
+
+// TestTaskRepo_ListBySessionWithCursor_DenseOrder tests that the sparse sort keys
+// of tasks.order are exposed as their 1..n rank
+func TestTaskRepo_ListBySessionWithCursor_DenseOrder(t *testing.T) {
+	db := setupSessionTestDB(t)
+	if db == nil {
+		return // Test was skipped
+	}
+	require.NoError(t, db.AutoMigrate(&model.Task{}))
+
+	repo := NewTaskRepo(db)
+	ctx := context.Background()
+
+	project := &model.Project{
+		ID:               uuid.New(),
+		SecretKeyHMAC:    "test_hmac_task_order",
+		SecretKeyHashPHC: "test_hash_task_order",
+	}
+	require.NoError(t, db.Create(project).Error)
+	defer cleanupSessionTestDB(t, db, project.ID)
+
+	session := &model.Session{ID: uuid.New(), ProjectID: project.ID}
+	require.NoError(t, db.Create(session).Error)
+	defer db.Exec("DELETE FROM tasks WHERE session_id = ?", session.ID)
+
+	// Created in this order, with sort keys left by inserts between existing tasks
+	base := time.Now().Add(-time.Hour).UTC()
+	tasks := []struct {
+		order      int
+		isPlanning bool
+		desc       string
+	}{
+		{2048, false, "second"},
+		{4096, false, "third"},
+		{1024, false, "first"},
+		{0, true, "planning"},
+	}
+	for i, tk := range tasks {
+		require.NoError(t, db.Create(&model.Task{
+			ID:         uuid.New(),
+			SessionID:  session.ID,
+			ProjectID:  project.ID,
+			Order:      tk.order,
+			Data:       model.TaskData{TaskDescription: tk.desc},
+			Status:     "pending",
+			IsPlanning: tk.isPlanning,
+			CreatedAt:  base.Add(time.Duration(i) * time.Second),
+		}).Error)
+	}
+
+	t.Run("exposes dense orders and skips the planning task", func(t *testing.T) {
+		items, err := repo.ListBySessionWithCursor(ctx, session.ID, time.Time{}, uuid.Nil, 10, false)
+		require.NoError(t, err)
+		require.Len(t, items, 3)
+
+		// Still listed by creation time
+		assert.Equal(t, "second", items[0].Data.TaskDescription)
+		assert.Equal(t, 2, items[0].Order)
+		assert.Equal(t, "third", items[1].Data.TaskDescription)
+		assert.Equal(t, 3, items[1].Order)
+		assert.Equal(t, "first", items[2].Data.TaskDescription)
+		assert.Equal(t, 1, items[2].Order)
+	})
+
+	t.Run("ranks the whole session, not only the page", func(t *testing.T) {
+		page, err := repo.ListBySessionWithCursor(ctx, session.ID, time.Time{}, uuid.Nil, 1, false)
+		require.NoError(t, err)
+		require.Len(t, page, 1)
+
+		items, err := repo.ListBySessionWithCursor(ctx, session.ID, page[0].CreatedAt, page[0].ID, 10, false)
+		require.NoError(t, err)
+		require.Len(t, items, 2)
+		assert.Equal(t, 3, items[0].Order)
+		assert.Equal(t, 1, items[1].Order)
+
+		items, err = repo.ListBySessionWithCursor(ctx, session.ID, time.Time{}, uuid.Nil, 10, true)
+		require.NoError(t, err)
+		require.Len(t, items, 3)
+		assert.Equal(t, []int{1, 3, 2}, []int{items[0].Order, items[1].Order, items[2].Order})
+	})
+}
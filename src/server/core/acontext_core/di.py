@@ -1,14 +1,31 @@
 from .env import LOG
 from .infra.db import init_database, close_database
 from .infra.redis import init_redis, close_redis
-from .infra.async_mq import init_mq, close_mq
+from .infra.async_mq import init_mq, close_mq, set_mq_backpressure
 from .infra.s3 import init_s3, close_s3
 from .infra.sandbox.client import init_sandbox, close_sandbox
 
 # from .llm.complete import llm_sanity_check
+from .llm.complete.scheduler import LLM_SCHEDULER
+
 # from .llm.embeddings import embedding_sanity_check
 
 from .service import import_consumers
+from .service.buffer_timer import start_buffer_timer, stop_buffer_timer
+from .service.data.task_index import start_task_indexer, stop_task_indexer
+from .service.data.sandbox import (
+    start_sandbox_ref_listener,
+    stop_sandbox_ref_listener,
+)
+from .service.data.sandbox_events import (
+    start_sandbox_event_writer,
+    stop_sandbox_event_writer,
+)
+from .telemetry.capture_metrics import start_metric_flusher, stop_metric_flusher
+from .service.data.project import (
+    start_project_config_listener,
+    stop_project_config_listener,
+)
 
 
 async def setup() -> None:
@@ -19,12 +36,27 @@ async def setup() -> None:
     await init_redis()
     await init_s3()
     await init_mq()
+    # LLM consumers stop pulling deliveries while LLM calls are queueing up
+    set_mq_backpressure(LLM_SCHEDULER)
     await init_sandbox()
+    await start_metric_flusher()
+    await start_buffer_timer()
+    await start_project_config_listener()
+    await start_task_indexer()
+    await start_sandbox_ref_listener()
+    await start_sandbox_event_writer()
     LOG.info("Launch Acontext core successfully 🎉")
 
 
 async def cleanup() -> None:
+    await stop_sandbox_event_writer()
+    await stop_sandbox_ref_listener()
+    await stop_task_indexer()
+    await stop_project_config_listener()
+    await stop_buffer_timer()
     await close_sandbox()
+    # Last, after everything that may still capture metrics
+    await stop_metric_flusher()
     await close_mq()
     await close_s3()
     await close_redis()
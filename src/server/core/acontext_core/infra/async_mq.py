@@ -7,7 +7,7 @@ from enum import StrEnum
 from functools import partial
 from pydantic import ValidationError, BaseModel
 from dataclasses import dataclass, field
-from typing import Callable, Awaitable, Any, Dict, Optional, List, Set
+from typing import Callable, Awaitable, Any, Dict, Optional, List, Set, Protocol
 from time import perf_counter
 
 from aio_pika import connect_robust, ExchangeType, Message
@@ -16,7 +16,12 @@ from aio_pika.abc import AbstractConnection, AbstractChannel, AbstractQueue
 
 from ..env import LOG, DEFAULT_CORE_CONFIG
 from ..telemetry.log import bound_logging_vars
-from ..util.handler_spec import check_handler_function_sanity, get_handler_body_type
+from ..util.handler_spec import (
+    check_handler_function_sanity,
+    get_handler_body_type,
+    check_batch_handler_function_sanity,
+    get_batch_handler_body_type,
+)
 
 # OpenTelemetry imports for manual context propagation
 try:
@@ -86,6 +91,20 @@ class ConsumerConfigData:
     dlx_ttl_days: int = DEFAULT_CORE_CONFIG.mq_default_dlx_ttl_days
     use_dlx_ex_rk: Optional[tuple[str, str]] = None
     dlx_suffix: str = "dead"
+    # Batch mode, enabled when batch_max_size > 1:
+    # collect up to `batch_max_size` deliveries or wait `batch_max_wait_ms`,
+    # then call the handler once per group of bodies sharing `batch_group_by` fields.
+    # The handler signature becomes (bodies: list[T], messages: list[Message]).
+    batch_max_size: int = 1
+    batch_max_wait_ms: int = 0
+    batch_group_by: tuple[str, ...] = ("project_id", "session_id")
+    # Stop taking deliveries while the consumer client's backpressure is
+    # saturated, only for consumers whose handlers need that resource
+    wait_for_backpressure: bool = False
+
+    @property
+    def batching(self) -> bool:
+        return self.batch_max_size > 1
 
 
 @dataclass
@@ -101,16 +120,34 @@ class ConsumerConfig(ConsumerConfigData):
         assert self.handler is not None, "Consumer Handler can not be None"
         if isinstance(self.handler, SpecialHandler):
             return
-        _, eil = check_handler_function_sanity(self.handler).unpack()
+        if self.batching:
+            assert (
+                self.batch_max_size <= self.prefetch_count
+            ), "batch_max_size can not exceed prefetch_count"
+            _, eil = check_batch_handler_function_sanity(self.handler).unpack()
+        else:
+            _, eil = check_handler_function_sanity(self.handler).unpack()
         if eil:
             raise ValueError(
                 f"Handler function {self.handler} does not meet the sanity requirements:\n{eil}"
             )
 
-        self.body_pydantic_type = get_handler_body_type(self.handler)
+        if self.batching:
+            self.body_pydantic_type = get_batch_handler_body_type(self.handler)
+        else:
+            self.body_pydantic_type = get_handler_body_type(self.handler)
         assert self.body_pydantic_type is not None, "Handler body type can not be None"
 
 
+class Backpressure(Protocol):
+    """A downstream resource that consumers stop taking deliveries for while saturated."""
+
+    @property
+    def saturated(self) -> bool: ...
+
+    async def wait_until_unsaturated(self) -> None: ...
+
+
 @dataclass
 class ConnectionConfig:
     """MQ connection configuration"""
@@ -146,6 +183,7 @@ class AsyncSingleThreadMQConsumer:
         self.__running = False
         self._connection_lock = asyncio.Lock()  # Lock for connection operations
         self._stop_lock = asyncio.Lock()
+        self._backpressure: Optional[Backpressure] = None
 
     @property
     def running(self) -> bool:
@@ -189,6 +227,35 @@ class AsyncSingleThreadMQConsumer:
             self.connection = None
         LOG.info("Disconnected from MQ")
 
+    def set_backpressure(self, backpressure: Optional[Backpressure]) -> None:
+        """
+        Pause the consumers with `wait_for_backpressure` while `backpressure` is
+        saturated. Deliveries stay in the broker (beyond the prefetched ones)
+        instead of piling up as handler tasks.
+        """
+        self._backpressure = backpressure
+
+    async def _wait_backpressure(self, config: ConsumerConfig) -> None:
+        backpressure = self._backpressure
+        if (
+            not config.wait_for_backpressure
+            or backpressure is None
+            or not backpressure.saturated
+        ):
+            return
+        LOG.info(f"Consumer paused by backpressure - queue: {config.queue_name}")
+        _start_s = perf_counter()
+        waiter = asyncio.ensure_future(backpressure.wait_until_unsaturated())
+        shutdown = asyncio.ensure_future(self._shutdown_event.wait())
+        try:
+            await asyncio.wait([waiter, shutdown], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            shutdown.cancel()
+        LOG.info(
+            f"Consumer resumed after {perf_counter() - _start_s:.2f}s - queue: {config.queue_name}"
+        )
+
     def register_consumer(self, consumer_config: ConsumerConfig) -> None:
         """Register a consumer at runtime"""
         if self.running:
@@ -291,6 +358,109 @@ class AsyncSingleThreadMQConsumer:
                         await message.reject(requeue=False)
                         return
 
+    async def _process_batch(
+        self,
+        config: ConsumerConfig,
+        messages: List[Message],
+    ) -> None:
+        """Process a batch of messages, calling the handler once per group."""
+        groups: Dict[tuple, tuple[list, list]] = {}
+        for message in messages:
+            try:
+                payload = json.loads(message.body.decode("utf-8"))
+                validated_body = config.body_pydantic_type.model_validate(payload)
+            except (ValidationError, ValueError) as e:
+                LOG.error(
+                    f"Message validation failed - queue: {config.queue_name}, "
+                    f"error: {str(e)}"
+                )
+                await message.reject(requeue=False)
+                continue
+            key = tuple(payload.get(k, None) for k in config.batch_group_by)
+            bodies, group_messages = groups.setdefault(key, ([], []))
+            bodies.append(validated_body)
+            group_messages.append(message)
+
+        LOG.debug(
+            f"Queue: {config.queue_name} batch of {len(messages)} messages in {len(groups)} groups"
+        )
+        await asyncio.gather(
+            *[
+                self._process_group(config, bodies, group_messages)
+                for bodies, group_messages in groups.values()
+            ]
+        )
+
+    async def _process_group(
+        self,
+        config: ConsumerConfig,
+        bodies: List[BaseModel],
+        messages: List[Message],
+    ) -> None:
+        """Process one group of a batch with retry logic, then settle all its messages."""
+        extracted_context = _extract_trace_context_from_headers(messages[-1])
+        _logging_vars = {k: getattr(bodies[-1], k, None) for k in LOGGING_FIELDS}
+
+        retry_count = 0
+        max_retries = config.max_retries
+        while retry_count <= max_retries:
+            try:
+                with bound_logging_vars(queue_name=config.queue_name, **_logging_vars):
+                    token = None
+                    if extracted_context and OTEL_AVAILABLE:
+                        token = otel_context.attach(extracted_context)
+                    try:
+                        _start_s = perf_counter()
+                        await asyncio.wait_for(
+                            config.handler(bodies, messages), timeout=config.timeout
+                        )
+                        _end_s = perf_counter()
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(
+                            f"Handler timeout after {config.timeout}s - queue: {config.queue_name}"
+                        )
+                    finally:
+                        if token is not None:
+                            otel_context.detach(token)
+                    LOG.debug(
+                        f"Queue: {config.queue_name} processed {len(bodies)} messages in {_end_s - _start_s:.4f}s"
+                    )
+                break
+            except Exception as e:
+                retry_count += 1
+                _wait_for = config.retry_delay * (retry_count**2)
+                if retry_count <= max_retries:
+                    LOG.warning(
+                        f"Message processing unknown error - queue: {config.queue_name}, "
+                        f"attempt: {retry_count}/{config.max_retries}, "
+                        f"retry after {_wait_for}s, "
+                        f"error: {str(e)}.",
+                        extra={"traceback": traceback.format_exc()},
+                    )
+                    await asyncio.sleep(_wait_for)
+                else:
+                    LOG.error(
+                        f"Message processing failed permanently - queue: {config.queue_name}, "
+                        f"error: {str(e)}",
+                        extra={"traceback": traceback.format_exc()},
+                    )
+                    # goto DLX if any
+                    for message in messages:
+                        await message.reject(requeue=False)
+                    return
+        for message in messages:
+            await message.ack()
+
+    def _track_processing_task(self, config: ConsumerConfig, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._processing_tasks.add(task)
+        task.add_done_callback(
+            partial(
+                self.cleanup_message_task,
+                config.queue_name,
+            )
+        )
+
     def cleanup_message_task(self, consumer_name: str, task: asyncio.Task) -> None:
         try:
             task.result()
@@ -352,22 +522,20 @@ class AsyncSingleThreadMQConsumer:
                     f"Looping consumer - queue: {config.queue_name} <- ({config.exchange_name}, {config.routing_key})"
                 )
 
-                async with queue.iterator() as queue_iter:
-                    async for message in queue_iter:
-                        if self._shutdown_event.is_set():
-                            break
-
-                        # Process message in background task for concurrency
-                        task = asyncio.create_task(
-                            self._process_message_with_tracing(config, message)
-                        )
-                        self._processing_tasks.add(task)
-                        task.add_done_callback(
-                            partial(
-                                self.cleanup_message_task,
-                                config.queue_name,
+                if config.batching:
+                    await self._consume_batches(config, queue)
+                else:
+                    async with queue.iterator() as queue_iter:
+                        async for message in queue_iter:
+                            if self._shutdown_event.is_set():
+                                break
+                            await self._wait_backpressure(config)
+
+                            # Process message in background task for concurrency
+                            self._track_processing_task(
+                                config,
+                                self._process_message_with_tracing(config, message),
                             )
-                        )
 
                 # If we exit the loop normally (shutdown), break the reconnect loop
                 if self._shutdown_event.is_set():
@@ -405,6 +573,43 @@ class AsyncSingleThreadMQConsumer:
                         )
                 LOG.debug(f"Consumer channel closed - queue: {config.queue_name}")
 
+    async def _consume_batches(
+        self, config: ConsumerConfig, queue: AbstractQueue
+    ) -> None:
+        """Collect deliveries into batches of up to `batch_max_size` messages or `batch_max_wait_ms`."""
+        loop = asyncio.get_running_loop()
+        pending: List[Message] = []
+        flush_handle: Optional[asyncio.TimerHandle] = None
+
+        def flush() -> None:
+            nonlocal flush_handle
+            if flush_handle is not None:
+                flush_handle.cancel()
+                flush_handle = None
+            if not pending:
+                return
+            batch = pending.copy()
+            pending.clear()
+            self._track_processing_task(config, self._process_batch(config, batch))
+
+        try:
+            async with queue.iterator() as queue_iter:
+                async for message in queue_iter:
+                    if self._shutdown_event.is_set():
+                        break
+                    await self._wait_backpressure(config)
+                    pending.append(message)
+                    if len(pending) >= config.batch_max_size:
+                        flush()
+                    elif flush_handle is None:
+                        flush_handle = loop.call_later(
+                            config.batch_max_wait_ms / 1000, flush
+                        )
+        finally:
+            # Unsettled deliveries are redelivered by the broker
+            if flush_handle is not None:
+                flush_handle.cancel()
+
     async def _setup_consumer_on_channel(
         self,
         config: ConsumerConfig,
@@ -738,6 +943,10 @@ def register_consumer(config: ConsumerConfigData):
     return decorator
 
 
+def set_mq_backpressure(backpressure: Optional[Backpressure]) -> None:
+    MQ_CLIENT.set_backpressure(backpressure)
+
+
 async def publish_mq(exchange_name: str, routing_key: str, body: str) -> None:
     await MQ_CLIENT.publish(exchange_name, routing_key, body)
 
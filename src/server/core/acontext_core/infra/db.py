@@ -1,6 +1,6 @@
 import traceback
 import os
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
@@ -11,7 +11,8 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
 )
 from sqlalchemy.pool import AsyncAdaptedQueuePool
-from sqlalchemy import text
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
 from sqlalchemy.exc import DisconnectionError, OperationalError
 
 # from ..schema.orm import Base
@@ -19,6 +20,38 @@ from ..schema.orm import ORM_BASE
 from ..env import LOG as logger
 from ..env import DEFAULT_CORE_CONFIG
 
+_AFTER_COMMIT_KEY = "after_commit"
+_COMMITTED_KEY = "after_commit_ready"
+
+
+def after_commit(db_session: AsyncSession, fn: Callable[[], Awaitable[None]]) -> None:
+    """
+    Await `fn` once `db_session` commits, e.g. to update a cache of the written
+    rows. Dropped if the session rolls back. Only sessions from
+    `get_session_context` run it.
+    """
+    db_session.info.setdefault(_AFTER_COMMIT_KEY, []).append(fn)
+
+
+@event.listens_for(Session, "after_commit")
+def _ready_after_commit(session: Session) -> None:
+    callbacks = session.info.pop(_AFTER_COMMIT_KEY, None)
+    if callbacks:
+        session.info.setdefault(_COMMITTED_KEY, []).extend(callbacks)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session: Session) -> None:
+    session.info.pop(_AFTER_COMMIT_KEY, None)
+
+
+async def _run_after_commit(session: AsyncSession) -> None:
+    for fn in session.info.pop(_COMMITTED_KEY, []):
+        try:
+            await fn()
+        except Exception as e:
+            logger.warning(f"After commit callback {fn} failed: {e}")
+
 
 class DatabaseClient:
     """
@@ -171,6 +204,7 @@ class DatabaseClient:
             raise e
         finally:
             await session.close()
+            await _run_after_commit(session)
 
     async def health_check(self) -> bool:
         """
@@ -196,6 +230,7 @@ class DatabaseClient:
         logger.info("pgvector extension init")
         async with self.engine.begin() as conn:
             await conn.run_sync(ORM_BASE.metadata.create_all)
+            await conn.run_sync(_create_missing_indexes)
 
         self._table_created = True
 
@@ -227,6 +262,22 @@ class DatabaseClient:
         }
 
 
+def _create_missing_indexes(conn) -> None:
+    """
+    create_all skips existing tables, add the indexes they don't have yet.
+    Unique indexes may need their rows fixed first, their owners create them.
+    """
+    for table in ORM_BASE.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.unique:
+                continue
+            try:
+                with conn.begin_nested():
+                    index.create(conn, checkfirst=True)
+            except Exception as e:
+                logger.warning(f"Failed to create index {index.name}: {e}")
+
+
 # Lazy Loading Global database client instance
 DB_CLIENT = DatabaseClient()
 
@@ -1,5 +1,8 @@
 import asyncio
-from typing import Optional, Dict, Any, AsyncGenerator
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Optional, Dict, Any, AsyncGenerator, AsyncIterable, AsyncIterator
 from contextlib import asynccontextmanager
 
 import aiobotocore.session
@@ -8,10 +11,28 @@ from aiobotocore.client import AioBaseClient
 from aiobotocore.session import get_session as get_aiobotocore_session
 
 from botocore.exceptions import ClientError, NoCredentialsError
+from opentelemetry import metrics
 
 from ..env import LOG as logger
 from ..env import DEFAULT_CORE_CONFIG
 
+_meter = metrics.get_meter(__name__)
+_S3_OP_DURATION = _meter.create_histogram(
+    "acontext.s3.operation.duration",
+    unit="s",
+    description="Duration of S3 operations, excluding time queued for a slot",
+)
+_S3_OP_QUEUE_WAIT = _meter.create_histogram(
+    "acontext.s3.operation.queue_wait",
+    unit="s",
+    description="Time S3 operations waited for a concurrency slot",
+)
+_S3_OP_SIZE = _meter.create_histogram(
+    "acontext.s3.operation.size",
+    unit="By",
+    description="Payload size of S3 uploads and downloads",
+)
+
 
 def _handle_s3_client_error(
     e: ClientError, bucket_name: str, key: str, ignore_not_found: bool = False
@@ -54,6 +75,117 @@ def _handle_unexpected_error(e: Exception, bucket_name: str, key: str) -> None:
     raise e
 
 
+class S3IOPriority(IntEnum):
+    """Priority classes of S3 operations, lower values are served first."""
+
+    INGEST = 0
+    SANDBOX = 1
+
+
+class S3IOScheduler:
+    """
+    Bound the number of concurrent S3 operations in this process.
+
+    Waiting operations are granted slots by priority class, FIFO within a class.
+    A class can be capped below ``max_concurrency`` so that long transfers of a
+    low priority class never take the whole connection pool.
+
+    Not thread-safe, meant to be used from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        class_limits: Optional[Dict[S3IOPriority, int]] = None,
+    ):
+        assert max_concurrency > 0, "max_concurrency must be positive"
+        self.max_concurrency = max_concurrency
+        self.class_limits = class_limits or {}
+        self._in_flight: Dict[S3IOPriority, int] = {p: 0 for p in S3IOPriority}
+        self._waiters: Dict[S3IOPriority, deque[asyncio.Future]] = {
+            p: deque() for p in S3IOPriority
+        }
+
+    def _has_capacity(self, priority: S3IOPriority) -> bool:
+        if sum(self._in_flight.values()) >= self.max_concurrency:
+            return False
+        limit = self.class_limits.get(priority, self.max_concurrency)
+        return self._in_flight[priority] < limit
+
+    def _wake(self) -> None:
+        for priority in S3IOPriority:
+            waiters = self._waiters[priority]
+            while waiters and self._has_capacity(priority):
+                fut = waiters.popleft()
+                if fut.done():
+                    continue
+                self._in_flight[priority] += 1
+                fut.set_result(None)
+
+    async def _acquire(self, priority: S3IOPriority) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(fut)
+        self._wake()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The slot was granted right before the cancellation
+                self._release(priority)
+            else:
+                try:
+                    self._waiters[priority].remove(fut)
+                except ValueError:
+                    pass
+            raise
+
+    def _release(self, priority: S3IOPriority) -> None:
+        self._in_flight[priority] -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(
+        self, operation: str, priority: S3IOPriority = S3IOPriority.INGEST
+    ) -> AsyncGenerator[None, None]:
+        """
+        Hold one S3 concurrency slot and record the operation's queue wait and duration.
+
+        Usage:
+            async with scheduler.slot("get_object", S3IOPriority.INGEST):
+                ...
+        """
+        attributes = {"operation": operation, "priority": priority.name.lower()}
+        queued_at = time.perf_counter()
+        await self._acquire(priority)
+        started_at = time.perf_counter()
+        _S3_OP_QUEUE_WAIT.record(started_at - queued_at, attributes)
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self._release(priority)
+            _S3_OP_DURATION.record(
+                time.perf_counter() - started_at, {**attributes, "outcome": outcome}
+            )
+
+    @staticmethod
+    def record_size(operation: str, priority: S3IOPriority, size: int) -> None:
+        _S3_OP_SIZE.record(
+            size, {"operation": operation, "priority": priority.name.lower()}
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": {p.name.lower(): n for p, n in self._in_flight.items()},
+            "waiting": {
+                p.name.lower(): sum(not f.done() for f in w)
+                for p, w in self._waiters.items()
+            },
+        }
+
+
 class S3Client:
     """
     Best-practice async S3 client for read-only operations.
@@ -64,6 +196,7 @@ class S3Client:
     - Session management with proper lifecycle
     - Health checks and monitoring
     - Configuration via environment variables
+    - Bounded, prioritized concurrency via a shared S3IOScheduler
     """
 
     def __init__(self, s3_config: Dict[str, Any] = {}):
@@ -85,10 +218,28 @@ class S3Client:
         self.read_timeout = s3_config.get(
             "read_timeout", DEFAULT_CORE_CONFIG.s3_read_timeout
         )
+        self.stream_part_size = s3_config.get(
+            "stream_part_size", DEFAULT_CORE_CONFIG.s3_stream_part_size
+        )
+        self.stream_chunk_size = s3_config.get(
+            "stream_chunk_size", DEFAULT_CORE_CONFIG.s3_stream_chunk_size
+        )
 
         if not self.bucket:
             raise ValueError("S3 bucket name is required")
 
+        self.scheduler = S3IOScheduler(
+            s3_config.get(
+                "io_max_concurrency", DEFAULT_CORE_CONFIG.s3_io_max_concurrency
+            ),
+            class_limits={
+                S3IOPriority.SANDBOX: s3_config.get(
+                    "io_sandbox_max_concurrency",
+                    DEFAULT_CORE_CONFIG.s3_io_sandbox_max_concurrency,
+                )
+            },
+        )
+
         logger.debug(
             f"S3 Client Config - Region: {self.region}, Bucket: {self.bucket}, Endpoint: {self.endpoint}"
         )
@@ -185,13 +336,19 @@ class S3Client:
             # Don't close the client on exceptions - let it be reused
             raise
 
-    async def download_object(self, key: str, bucket: Optional[str] = None) -> bytes:
+    async def download_object(
+        self,
+        key: str,
+        bucket: Optional[str] = None,
+        priority: S3IOPriority = S3IOPriority.INGEST,
+    ) -> bytes:
         """
         Download S3 object content as bytes.
 
         Args:
             key: The S3 object key
             bucket: Optional bucket name (uses default if not specified)
+            priority: Scheduling class of this download
 
         Returns:
             bytes: The object content
@@ -203,13 +360,15 @@ class S3Client:
         bucket_name = bucket or self.bucket
 
         try:
-            async with self.get_client() as client:
+            async with self.scheduler.slot("get_object", priority):
+                client = await self._get_client()
                 response = await client.get_object(Bucket=bucket_name, Key=key)
                 content = await response["Body"].read()
-                logger.debug(
-                    f"Downloaded object - bucket: {bucket_name}, key: {key}, size: {len(content)} bytes"
-                )
-                return content
+            self.scheduler.record_size("get_object", priority, len(content))
+            logger.debug(
+                f"Downloaded object - bucket: {bucket_name}, key: {key}, size: {len(content)} bytes"
+            )
+            return content
 
         except ClientError as e:
             _handle_s3_client_error(e, bucket_name, key)
@@ -223,6 +382,7 @@ class S3Client:
         bucket: Optional[str] = None,
         content_type: Optional[str] = None,
         metadata: Optional[Dict[str, str]] = None,
+        priority: S3IOPriority = S3IOPriority.INGEST,
     ) -> Dict[str, Any]:
         """
         Upload data to S3 object.
@@ -233,6 +393,7 @@ class S3Client:
             bucket: Optional bucket name (uses default if not specified)
             content_type: Optional content type (e.g., 'image/jpeg', 'text/plain')
             metadata: Optional user-defined metadata
+            priority: Scheduling class of this upload
 
         Returns:
             Dict containing upload response (ETag, VersionId if versioning enabled, etc.)
@@ -253,22 +414,204 @@ class S3Client:
             if metadata:
                 put_args["Metadata"] = metadata
 
-            async with self.get_client() as client:
+            async with self.scheduler.slot("put_object", priority):
+                client = await self._get_client()
                 response = await client.put_object(**put_args)
-                # Remove ResponseMetadata as it's not useful for application logic
-                result = {k: v for k, v in response.items() if k != "ResponseMetadata"}
-                logger.debug(
-                    f"Uploaded object - bucket: {bucket_name}, key: {key}, size: {len(data)} bytes"
-                )
-                return result
+            self.scheduler.record_size("put_object", priority, len(data))
+            # Remove ResponseMetadata as it's not useful for application logic
+            result = {k: v for k, v in response.items() if k != "ResponseMetadata"}
+            logger.debug(
+                f"Uploaded object - bucket: {bucket_name}, key: {key}, size: {len(data)} bytes"
+            )
+            return result
+
+        except ClientError as e:
+            _handle_s3_client_error(e, bucket_name, key)
+        except Exception as e:
+            _handle_unexpected_error(e, bucket_name, key)
+
+    async def stream_download(
+        self,
+        key: str,
+        bucket: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        priority: S3IOPriority = S3IOPriority.INGEST,
+    ) -> AsyncIterator[bytes]:
+        """
+        Download S3 object content as an async iterator of chunks.
+
+        Only one chunk is held in memory at a time. The scheduler slot is held
+        until the iterator is exhausted or closed, so always consume it fully
+        or close it.
+
+        Args:
+            key: The S3 object key
+            bucket: Optional bucket name (uses default if not specified)
+            chunk_size: Max bytes per chunk (uses s3_stream_chunk_size if not specified)
+            priority: Scheduling class of this download
+
+        Yields:
+            bytes: The next chunk of the object content
+
+        Raises:
+            ClientError: If the object doesn't exist or other S3 errors
+            NoCredentialsError: If credentials are not configured
+        """
+        bucket_name = bucket or self.bucket
+        chunk_size = chunk_size or self.stream_chunk_size
+
+        try:
+            size = 0
+            async with self.scheduler.slot("get_object", priority):
+                client = await self._get_client()
+                response = await client.get_object(Bucket=bucket_name, Key=key)
+                body = response["Body"]
+                try:
+                    async for chunk in body.iter_chunks(chunk_size):
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    body.close()
+            self.scheduler.record_size("get_object", priority, size)
+            logger.debug(
+                f"Streamed object - bucket: {bucket_name}, key: {key}, size: {size} bytes"
+            )
 
         except ClientError as e:
             _handle_s3_client_error(e, bucket_name, key)
         except Exception as e:
             _handle_unexpected_error(e, bucket_name, key)
 
+    async def stream_upload(
+        self,
+        key: str,
+        chunks: AsyncIterable[bytes],
+        bucket: Optional[str] = None,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        part_size: Optional[int] = None,
+        priority: S3IOPriority = S3IOPriority.INGEST,
+    ) -> Dict[str, Any]:
+        """
+        Upload an async iterator of chunks to an S3 object.
+
+        Chunks are buffered up to ``part_size`` and sent as multipart upload
+        parts, so memory stays bounded by one part regardless of the object
+        size. Content smaller than one part is sent with a single put_object.
+        The multipart upload is aborted if the chunks or any part fail, and
+        ``chunks`` is closed once consumed if it supports ``aclose``.
+
+        Args:
+            key: The S3 object key
+            chunks: Async iterable of the content
+            bucket: Optional bucket name (uses default if not specified)
+            content_type: Optional content type (e.g., 'image/jpeg', 'text/plain')
+            metadata: Optional user-defined metadata
+            part_size: Bytes per part, at least 5MB (uses s3_stream_part_size if not specified)
+            priority: Scheduling class of this upload
+
+        Returns:
+            Dict containing upload response (ETag, VersionId if versioning enabled, etc.)
+
+        Raises:
+            ClientError: If upload fails or other S3 errors
+            NoCredentialsError: If credentials are not configured
+        """
+        bucket_name = bucket or self.bucket
+        part_size = part_size or self.stream_part_size
+
+        extra_args = {}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        if metadata:
+            extra_args["Metadata"] = metadata
+
+        upload_id = None
+        parts = []
+        size = 0
+
+        async def _upload_part(data: bytes) -> None:
+            part_number = len(parts) + 1
+            async with self.scheduler.slot("upload_part", priority):
+                client = await self._get_client()
+                response = await client.upload_part(
+                    Bucket=bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=data,
+                )
+            parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+        try:
+            buffer = bytearray()
+            try:
+                async for chunk in chunks:
+                    buffer.extend(chunk)
+                    size += len(chunk)
+                    while len(buffer) >= part_size:
+                        if upload_id is None:
+                            async with self.scheduler.slot(
+                                "create_multipart_upload", priority
+                            ):
+                                client = await self._get_client()
+                                response = await client.create_multipart_upload(
+                                    Bucket=bucket_name, Key=key, **extra_args
+                                )
+                            upload_id = response["UploadId"]
+                        await _upload_part(bytes(buffer[:part_size]))
+                        del buffer[:part_size]
+            finally:
+                aclose = getattr(chunks, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+            if upload_id is None:
+                # Everything fits in one part
+                async with self.scheduler.slot("put_object", priority):
+                    client = await self._get_client()
+                    response = await client.put_object(
+                        Bucket=bucket_name, Key=key, Body=bytes(buffer), **extra_args
+                    )
+            else:
+                if buffer:
+                    await _upload_part(bytes(buffer))
+                async with self.scheduler.slot("complete_multipart_upload", priority):
+                    client = await self._get_client()
+                    response = await client.complete_multipart_upload(
+                        Bucket=bucket_name,
+                        Key=key,
+                        UploadId=upload_id,
+                        MultipartUpload={"Parts": parts},
+                    )
+            self.scheduler.record_size("stream_upload", priority, size)
+            # Remove ResponseMetadata as it's not useful for application logic
+            result = {k: v for k, v in response.items() if k != "ResponseMetadata"}
+            logger.debug(
+                f"Streamed upload - bucket: {bucket_name}, key: {key}, size: {size} bytes, parts: {len(parts) or 1}"
+            )
+            return result
+
+        except Exception as e:
+            if upload_id is not None:
+                try:
+                    client = await self._get_client()
+                    await client.abort_multipart_upload(
+                        Bucket=bucket_name, Key=key, UploadId=upload_id
+                    )
+                except Exception as abort_error:
+                    logger.warning(
+                        f"Failed to abort multipart upload - bucket: {bucket_name}, key: {key}, error: {abort_error}"
+                    )
+            if isinstance(e, ClientError):
+                _handle_s3_client_error(e, bucket_name, key)
+            _handle_unexpected_error(e, bucket_name, key)
+
     async def delete_object(
-        self, key: str, bucket: Optional[str] = None
+        self,
+        key: str,
+        bucket: Optional[str] = None,
+        priority: S3IOPriority = S3IOPriority.INGEST,
     ) -> Dict[str, Any]:
         """
         Delete an S3 object.
@@ -276,6 +619,7 @@ class S3Client:
         Args:
             key: The S3 object key
             bucket: Optional bucket name (uses default if not specified)
+            priority: Scheduling class of this request
 
         Returns:
             Dict containing delete response (DeleteMarker, VersionId if versioning enabled, etc.)
@@ -287,12 +631,13 @@ class S3Client:
         bucket_name = bucket or self.bucket
 
         try:
-            async with self.get_client() as client:
+            async with self.scheduler.slot("delete_object", priority):
+                client = await self._get_client()
                 response = await client.delete_object(Bucket=bucket_name, Key=key)
-                # Remove ResponseMetadata as it's not useful for application logic
-                result = {k: v for k, v in response.items() if k != "ResponseMetadata"}
-                logger.debug(f"Deleted object - bucket: {bucket_name}, key: {key}")
-                return result
+            # Remove ResponseMetadata as it's not useful for application logic
+            result = {k: v for k, v in response.items() if k != "ResponseMetadata"}
+            logger.debug(f"Deleted object - bucket: {bucket_name}, key: {key}")
+            return result
 
         except ClientError as e:
             _handle_s3_client_error(e, bucket_name, key, ignore_not_found=True)
@@ -300,7 +645,10 @@ class S3Client:
             _handle_unexpected_error(e, bucket_name, key)
 
     async def get_object_metadata(
-        self, key: str, bucket: Optional[str] = None
+        self,
+        key: str,
+        bucket: Optional[str] = None,
+        priority: S3IOPriority = S3IOPriority.INGEST,
     ) -> Dict[str, Any] | None:
         """
         Get object metadata without downloading content.
@@ -308,6 +656,7 @@ class S3Client:
         Args:
             key: The S3 object key
             bucket: Optional bucket name (uses default if not specified)
+            priority: Scheduling class of this request
 
         Returns:
             Dict containing metadata (ContentLength, ETag, ContentType, LastModified, etc.)
@@ -318,14 +667,13 @@ class S3Client:
         bucket_name = bucket or self.bucket
 
         try:
-            async with self.get_client() as client:
+            async with self.scheduler.slot("head_object", priority):
+                client = await self._get_client()
                 response = await client.head_object(Bucket=bucket_name, Key=key)
-                # Remove ResponseMetadata as it's not useful for application logic
-                metadata = {
-                    k: v for k, v in response.items() if k != "ResponseMetadata"
-                }
-                logger.debug(f"Retrieved metadata - bucket: {bucket_name}, key: {key}")
-                return metadata
+            # Remove ResponseMetadata as it's not useful for application logic
+            metadata = {k: v for k, v in response.items() if k != "ResponseMetadata"}
+            logger.debug(f"Retrieved metadata - bucket: {bucket_name}, key: {key}")
+            return metadata
 
         except ClientError as e:
             _handle_s3_client_error(e, bucket_name, key, ignore_not_found=True)
@@ -385,6 +733,7 @@ class S3Client:
             "session_initialized": self._session is not None,
             "client_initialized": self._client is not None,
             "max_pool_connections": self.max_pool_connections,
+            "io_scheduler": self.scheduler.stats(),
             "bucket": self.bucket,
             "region": self.region,
             "endpoint": self.endpoint,
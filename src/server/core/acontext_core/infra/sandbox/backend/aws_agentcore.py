@@ -1,11 +1,14 @@
-import base64
+import asyncio
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Type
+from typing import Any, Callable, Iterable, Iterator, Optional, Type, TypeVar
 
 import boto3
+from botocore.config import Config as BotoConfig
 
-from .base import SandboxBackend
+from .base import SandboxBackend, iter_b64decode, b64encode_stream
 from ....schema.sandbox import (
     SandboxCreateConfig,
     SandboxUpdateConfig,
@@ -14,7 +17,110 @@ from ....schema.sandbox import (
     SandboxStatus,
 )
 from ....env import DEFAULT_CORE_CONFIG, LOG as logger
-from ...s3 import S3_CLIENT
+from ...s3 import S3_CLIENT, S3IOPriority
+
+T = TypeVar("T")
+
+_STREAM_EXCEPTIONS = (
+    "accessDeniedException",
+    "conflictException",
+    "internalServerException",
+    "resourceNotFoundException",
+    "serviceQuotaExceededException",
+    "throttlingException",
+    "validationException",
+)
+
+
+def _iter_until(stream: Iterable[dict], cancelled: threading.Event) -> Iterator[dict]:
+    """Stop reading the event stream once the caller gave up on it."""
+    for event in stream:
+        if cancelled.is_set():
+            return
+        yield event
+
+
+def _parse_command_events(events: Iterable[dict]) -> SandboxCommandOutput:
+    """Collect the stdout/stderr/exit code of an ``executeCommand`` event stream."""
+    stdout = ""
+    stderr = ""
+    exit_code = 0
+
+    for event in events:
+        # Handle result event
+        if "result" in event:
+            result_data = event["result"]
+
+            # Check if this is an error result
+            is_error = result_data.get("isError", False)
+
+            # Priority 1: Use structuredContent if available (has stdout/stderr/exitCode)
+            if "structuredContent" in result_data:
+                structured = result_data["structuredContent"]
+                stdout += structured.get("stdout", "")
+                stderr += structured.get("stderr", "")
+                exit_code = structured.get("exitCode", 1 if is_error else 0)
+
+            # Priority 2: Parse content array
+            elif "content" in result_data:
+                for content_item in result_data["content"]:
+                    content_type = content_item.get("type")
+
+                    # Text content
+                    if content_type == "text" and "text" in content_item:
+                        text = content_item["text"]
+                        if is_error:
+                            stderr += text
+                        else:
+                            stdout += text
+
+                    # Resource content
+                    elif content_type == "resource" and "resource" in content_item:
+                        resource = content_item["resource"]
+                        if resource.get("type") == "text" and "text" in resource:
+                            stdout += resource["text"]
+                        elif resource.get("type") == "blob" and "blob" in resource:
+                            blob_data = resource["blob"]
+                            if isinstance(blob_data, bytes):
+                                stdout += blob_data.decode("utf-8", errors="replace")
+
+                if is_error:
+                    exit_code = 1
+
+        # Handle various exception types
+        elif any(exc in event for exc in _STREAM_EXCEPTIONS):
+            # Find which exception it is
+            for exc_type in event:
+                if exc_type.endswith("Exception"):
+                    exc_data = event[exc_type]
+                    stderr = f"[{exc_type}] {exc_data.get('message', 'Unknown error')}"
+                    exit_code = 1
+                    break
+
+    return SandboxCommandOutput(
+        stdout=stdout,
+        stderr=stderr,
+        exit_code=exit_code,
+    )
+
+
+def _find_file_resource(events: Iterable[dict]) -> dict | None:
+    """The first text or blob resource of a ``readFiles`` event stream."""
+    for event in events:
+        if "result" not in event:
+            continue
+        for content_item in event["result"].get("content", []):
+            if content_item.get("type") != "resource":
+                continue
+            item_resource = content_item.get("resource", {})
+            if "text" in item_resource or "blob" in item_resource:
+                return item_resource
+    return None
+
+
+def _drain(events: Iterable[dict]) -> None:
+    for _ in events:
+        pass
 
 
 class AWSAgentCoreSandboxBackend(SandboxBackend):
@@ -22,6 +128,9 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
 
     This backend manages code interpreter sessions through AWS Bedrock AgentCore,
     providing secure isolated environments for code execution with AWS managed infrastructure.
+
+    boto3 is sync, so every call runs on a bounded thread pool and is awaited
+    with a timeout; event streams are read and parsed on the pool as well.
     """
 
     type: str = "aws_agentcore"
@@ -34,15 +143,44 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
         region: str,
         access_key: Optional[str] = None,
         secret_key: Optional[str] = None,
+        client: Any = None,
+        max_workers: Optional[int] = None,
+        api_timeout: Optional[float] = None,
+        invoke_timeout: Optional[float] = None,
     ):
         """Initialize the AWS AgentCore sandbox backend.
 
         Args:
             region: AWS region (e.g., "us-west-2")
+            client: A ready ``bedrock-agentcore`` client, built from the other arguments if omitted
+            max_workers: Threads running the blocking client calls
+            api_timeout: Seconds to wait for a session start/stop/get call
+            invoke_timeout: Seconds to wait for a command or file call and its stream
         """
         self.__region = region
+        self.__max_workers = max_workers or DEFAULT_CORE_CONFIG.aws_agentcore_max_workers
+        self.__api_timeout = (
+            api_timeout or DEFAULT_CORE_CONFIG.aws_agentcore_api_timeout_seconds
+        )
+        self.__invoke_timeout = (
+            invoke_timeout or DEFAULT_CORE_CONFIG.aws_agentcore_invoke_timeout_seconds
+        )
+        self.__executor = ThreadPoolExecutor(
+            max_workers=self.__max_workers, thread_name_prefix="aws-agentcore"
+        )
+        if client is not None:
+            self.__client = client
+            return
+
         client_kwargs: dict = {
             "region_name": region,
+            # One connection per worker thread; the read timeout also ends a
+            # worker stuck on a silent stream after its caller gave up
+            "config": BotoConfig(
+                max_pool_connections=self.__max_workers,
+                connect_timeout=min(self.__api_timeout, 10),
+                read_timeout=self.__invoke_timeout,
+            ),
         }
         # Only pass credentials to boto3 when explicitly provided; otherwise rely on the
         # default credential chain (env / shared config / assume-role / etc.).
@@ -63,6 +201,66 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
             secret_key=DEFAULT_CORE_CONFIG.aws_agentcore_secret_key,
         )
 
+    async def close(self) -> None:
+        # Running calls finish on their own, bounded by the boto3 timeouts
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_blocking(
+        self, what: str, fn: Callable[[threading.Event], T], timeout: float
+    ) -> T:
+        """Run `fn` on the pool. `fn` receives an event set once the result is no longer awaited."""
+        cancelled = threading.Event()
+        future = asyncio.get_running_loop().run_in_executor(
+            self.__executor, fn, cancelled
+        )
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"AWS AgentCore {what} timed out after {timeout}s"
+            ) from None
+        finally:
+            cancelled.set()
+
+    async def _call_api(self, method: str, **kwargs) -> dict:
+        return await self._run_blocking(
+            method,
+            lambda _: getattr(self.__client, method)(
+                codeInterpreterIdentifier=self._DEFAULT_CODE_INTERPRETER_IDENTIFIER,
+                **kwargs,
+            ),
+            self.__api_timeout,
+        )
+
+    async def _invoke(
+        self,
+        sandbox_id: str,
+        name: str,
+        arguments: dict,
+        consume: Callable[[Iterable[dict]], T],
+    ) -> T:
+        """Invoke a code interpreter tool and `consume` its event stream, off the event loop."""
+
+        def run(cancelled: threading.Event) -> T:
+            # reference: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/bedrock-agentcore/client/invoke_code_interpreter.html
+            result = self.__client.invoke_code_interpreter(
+                codeInterpreterIdentifier=self._DEFAULT_CODE_INTERPRETER_IDENTIFIER,
+                sessionId=sandbox_id,
+                name=name,
+                arguments=arguments,
+            )
+            stream = result.get("stream")
+            if stream is None:
+                return consume([])
+            try:
+                return consume(_iter_until(stream, cancelled))
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+
+        return await self._run_blocking(name, run, self.__invoke_timeout)
+
     async def start_sandbox(
         self, create_config: SandboxCreateConfig
     ) -> SandboxRuntimeInfo:
@@ -76,8 +274,8 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
         """
         # NOTE: we intentionally do not keep per-session state; we always use the
         # system-managed interpreter identifier.
-        response = self.__client.start_code_interpreter_session(
-            codeInterpreterIdentifier=self._DEFAULT_CODE_INTERPRETER_IDENTIFIER,
+        response = await self._call_api(
+            "start_code_interpreter_session",
             name=f"code-session-{uuid.uuid4().hex[:8]}",
             sessionTimeoutSeconds=DEFAULT_CORE_CONFIG.sandbox_default_keepalive_seconds,
         )
@@ -111,9 +309,8 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
             True if successfully stopped
         """
         try:
-            self.__client.stop_code_interpreter_session(
-                codeInterpreterIdentifier=self._DEFAULT_CODE_INTERPRETER_IDENTIFIER,
-                sessionId=sandbox_id,
+            await self._call_api(
+                "stop_code_interpreter_session", sessionId=sandbox_id
             )
             logger.info(f"Stopped AWS AgentCore session: {sandbox_id}")
             return True
@@ -135,9 +332,8 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
         """
         try:
             # Get actual session info from AWS
-            session_info = self.__client.get_code_interpreter_session(
-                codeInterpreterIdentifier=self._DEFAULT_CODE_INTERPRETER_IDENTIFIER,
-                sessionId=sandbox_id,
+            session_info = await self._call_api(
+                "get_code_interpreter_session", sessionId=sandbox_id
             )
 
             # Parse status
@@ -148,18 +344,18 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
                 status = SandboxStatus.SUCCESS
             else:
                 status = SandboxStatus.ERROR
-            
+
             # Parse timestamps
             created_at = session_info.get("createdAt")
             if not isinstance(created_at, datetime):
                 raise ValueError("Failed to get createdAt from session info")
-            
+
             # Calculate expiration time
             timeout_seconds = session_info.get("sessionTimeoutSeconds")
             if timeout_seconds is None:
                 raise ValueError("Failed to get sessionTimeoutSeconds from session info")
             expires_at = created_at + timedelta(seconds=int(timeout_seconds))
-            
+
             return SandboxRuntimeInfo(
                 sandbox_id=sandbox_id,
                 sandbox_status=status,
@@ -204,80 +400,11 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
             Command output including stdout, stderr, and exit code
         """
         try:
-            # Execute command and get result
-            # reference: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/bedrock-agentcore/client/invoke_code_interpreter.html
-            result = self.__client.invoke_code_interpreter(
-                codeInterpreterIdentifier=self._DEFAULT_CODE_INTERPRETER_IDENTIFIER,
-                sessionId=sandbox_id,
-                name="executeCommand",
-                arguments={"command": command},
-            )
-            
-            stdout = ""
-            stderr = ""
-            exit_code = 0
-            
-            # Process the event stream
-            if "stream" in result:
-                for event in result["stream"]:
-                    # Handle result event
-                    if "result" in event:
-                        result_data = event["result"]
-                        
-                        # Check if this is an error result
-                        is_error = result_data.get("isError", False)
-                        
-                        # Priority 1: Use structuredContent if available (has stdout/stderr/exitCode)
-                        if "structuredContent" in result_data:
-                            structured = result_data["structuredContent"]
-                            stdout += structured.get("stdout", "")
-                            stderr += structured.get("stderr", "")
-                            exit_code = structured.get("exitCode", 1 if is_error else 0)
-                        
-                        # Priority 2: Parse content array
-                        elif "content" in result_data:
-                            for content_item in result_data["content"]:
-                                content_type = content_item.get("type")
-                                
-                                # Text content
-                                if content_type == "text" and "text" in content_item:
-                                    text = content_item["text"]
-                                    if is_error:
-                                        stderr += text
-                                    else:
-                                        stdout += text
-                                
-                                # Resource content
-                                elif content_type == "resource" and "resource" in content_item:
-                                    resource = content_item["resource"]
-                                    if resource.get("type") == "text" and "text" in resource:
-                                        stdout += resource["text"]
-                                    elif resource.get("type") == "blob" and "blob" in resource:
-                                        blob_data = resource["blob"]
-                                        if isinstance(blob_data, bytes):
-                                            stdout += blob_data.decode("utf-8", errors="replace")
-                            
-                            if is_error:
-                                exit_code = 1
-                    
-                    # Handle various exception types
-                    elif any(exc in event for exc in [
-                        "accessDeniedException", "conflictException", "internalServerException",
-                        "resourceNotFoundException", "serviceQuotaExceededException",
-                        "throttlingException", "validationException"
-                    ]):
-                        # Find which exception it is
-                        for exc_type in event:
-                            if exc_type.endswith("Exception"):
-                                exc_data = event[exc_type]
-                                stderr = f"[{exc_type}] {exc_data.get('message', 'Unknown error')}"
-                                exit_code = 1
-                                break
-            
-            return SandboxCommandOutput(
-                stdout=stdout,
-                stderr=stderr,
-                exit_code=exit_code,
+            return await self._invoke(
+                sandbox_id,
+                "executeCommand",
+                {"command": command},
+                _parse_command_events,
             )
         except Exception as e:
             logger.error(f"Failed to execute command in session {sandbox_id}: {e}")
@@ -302,51 +429,38 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
         """
         try:
             # Read file content from the session using readFiles
-            result = self.__client.invoke_code_interpreter(
-                codeInterpreterIdentifier=self._DEFAULT_CODE_INTERPRETER_IDENTIFIER,
-                sessionId=sandbox_id,
-                name="readFiles",
-                arguments={"paths": [from_sandbox_file]},
+            resource = await self._invoke(
+                sandbox_id,
+                "readFiles",
+                {"paths": [from_sandbox_file]},
+                _find_file_resource,
             )
 
-            content: str | bytes | None = None
-            if "stream" in result:
-                for event in result["stream"]:
-                    if "result" not in event:
-                        continue
-                    for content_item in event["result"].get("content", []):
-                        if content_item.get("type") != "resource":
-                            continue
-                        resource = content_item.get("resource", {})
-                        if "text" in resource:
-                            content = resource["text"]
-                            break
-                        if "blob" in resource:
-                            content = base64.b64decode(resource["blob"])
-                            break
-                    if content is not None:
-                        break
-
-            if content is None:
+            if resource is None:
                 raise FileNotFoundError(f"Could not read file: {from_sandbox_file}")
-            
-            # Convert to bytes if necessary
-            if isinstance(content, str):
-                content_bytes = content.encode("utf-8")
-            else:
-                content_bytes = content
-            
+
             # Upload to S3 using the provided key directly
-            await S3_CLIENT.upload_object(
-                key=download_to_s3_key,
-                data=content_bytes,
-            )
-            
+            if "text" in resource:
+                await S3_CLIENT.upload_object(
+                    key=download_to_s3_key,
+                    data=resource["text"].encode("utf-8"),
+                    priority=S3IOPriority.SANDBOX,
+                )
+            else:
+                # Decode the blob part by part while uploading
+                await S3_CLIENT.stream_upload(
+                    key=download_to_s3_key,
+                    chunks=iter_b64decode(
+                        resource["blob"], S3_CLIENT.stream_chunk_size
+                    ),
+                    priority=S3IOPriority.SANDBOX,
+                )
+
             logger.info(
                 f"Downloaded file from session {sandbox_id}: {from_sandbox_file} -> s3://{download_to_s3_key}"
             )
             return True
-        
+
         except Exception as e:
             logger.error(
                 f"Failed to download file from session {sandbox_id}: "
@@ -368,42 +482,32 @@ class AWSAgentCoreSandboxBackend(SandboxBackend):
             True if successful
         """
         try:
-            # Download from S3
-            content = await S3_CLIENT.download_object(key=from_s3_key)
-
-            # Upload to session via writeFiles (blob for bytes)
-            file_payload: dict
-            if isinstance(content, bytes):
-                file_payload = {
-                    "path": upload_to_sandbox_file,
-                    "blob": base64.b64encode(content).decode("utf-8"),
-                }
-            else:
-                file_payload = {
-                    "path": upload_to_sandbox_file,
-                    "text": content,
-                }
-
-            self.__client.invoke_code_interpreter(
-                codeInterpreterIdentifier=self._DEFAULT_CODE_INTERPRETER_IDENTIFIER,
-                sessionId=sandbox_id,
-                name="writeFiles",
-                arguments={
-                    "content": [
-                        file_payload
-                    ]
-                },
+            # Encode from the S3 stream, writeFiles takes the whole blob
+            file_payload = {
+                "path": upload_to_sandbox_file,
+                "blob": await b64encode_stream(
+                    S3_CLIENT.stream_download(
+                        key=from_s3_key, priority=S3IOPriority.SANDBOX
+                    )
+                ),
+            }
+
+            # Read the stream through, the write is done once it ends
+            await self._invoke(
+                sandbox_id,
+                "writeFiles",
+                {"content": [file_payload]},
+                _drain,
             )
-            
+
             logger.info(
                 f"Uploaded file to session {sandbox_id}: s3://{from_s3_key} -> {upload_to_sandbox_file}"
             )
             return True
-        
+
         except Exception as e:
             logger.error(
                 f"Failed to upload file to session {sandbox_id}: "
                 f"{from_s3_key} -> {upload_to_sandbox_file}, error: {e}"
             )
             return False
-
@@ -1,5 +1,8 @@
+import asyncio
+import base64
+import tempfile
 from abc import abstractmethod, ABC
-from typing import Type
+from typing import AsyncIterable, AsyncIterator, Type
 from ....schema.sandbox import (
     SandboxCreateConfig,
     SandboxUpdateConfig,
@@ -8,6 +11,50 @@ from ....schema.sandbox import (
 )
 
 
+async def iter_b64decode(content: str, chunk_size: int) -> AsyncIterator[bytes]:
+    """Decode base64 content slice by slice, the decoded file is never held whole."""
+    step = max(chunk_size - chunk_size % 4, 4)
+    for i in range(0, len(content), step):
+        yield base64.b64decode(content[i : i + step], validate=True)
+
+
+async def b64encode_stream(chunks: AsyncIterable[bytes]) -> str:
+    """Base64 encode streamed content without holding its raw bytes whole."""
+    encoded = []
+    rest = b""
+    async for chunk in chunks:
+        data = rest + chunk
+        cut = len(data) - len(data) % 3
+        encoded.append(base64.b64encode(data[:cut]).decode("ascii"))
+        rest = data[cut:]
+    encoded.append(base64.b64encode(rest).decode("ascii"))
+    return "".join(encoded)
+
+
+async def spool_stream(
+    chunks: AsyncIterable[bytes], max_memory: int
+) -> tempfile.SpooledTemporaryFile:
+    """Write streamed content to a temporary file that moves to disk past ``max_memory``.
+
+    The returned file is rewound, the caller is responsible for closing it.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_memory:
+                # Rolled over (or about to), disk writes run off the event loop
+                await asyncio.to_thread(spooled.write, chunk)
+            else:
+                spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled
+
+
 class SandboxBackend(ABC):
     type: str
 
@@ -15,6 +62,9 @@ class SandboxBackend(ABC):
     @abstractmethod
     def from_default(cls: Type["SandboxBackend"]) -> "SandboxBackend": ...
 
+    async def close(self) -> None:
+        """Release the resources held by the backend, a no-op by default."""
+
     @abstractmethod
     async def start_sandbox(
         self, create_config: SandboxCreateConfig
@@ -1,11 +1,11 @@
 import os
-import base64
+import binascii
 from datetime import datetime
 from typing import Type, Literal
 import httpx
 from pydantic import BaseModel, field_validator
 
-from .base import SandboxBackend
+from .base import SandboxBackend, iter_b64decode, b64encode_stream
 from ....schema.sandbox import (
     SandboxCreateConfig,
     SandboxUpdateConfig,
@@ -14,7 +14,7 @@ from ....schema.sandbox import (
     SandboxStatus,
 )
 from ....env import DEFAULT_CORE_CONFIG, LOG as logger
-from ...s3 import S3_CLIENT
+from ...s3 import S3_CLIENT, S3IOPriority
 
 
 class _CFSandboxInfoResponse(BaseModel):
@@ -321,21 +321,22 @@ class CloudflareSandboxBackend(SandboxBackend):
             response.raise_for_status()
             cf_response = _CFFileDownloadResponse.model_validate(response.json())
 
+            # Decode part by part while uploading to S3 using the provided key directly
             try:
-                content_bytes = base64.b64decode(cf_response.content, validate=True)
-            except Exception as decode_error:
+                await S3_CLIENT.stream_upload(
+                    key=download_to_s3_key,
+                    chunks=iter_b64decode(
+                        cf_response.content, S3_CLIENT.stream_chunk_size
+                    ),
+                    priority=S3IOPriority.SANDBOX,
+                )
+            except binascii.Error as decode_error:
                 logger.error(
                     f"Base64 decode failed. Content length: {len(cf_response.content)}, "
                     f"First 50 chars: {cf_response.content[:50]}, error: {decode_error}"
                 )
                 raise
 
-            # Upload to S3 using the provided key directly
-            await S3_CLIENT.upload_object(
-                key=download_to_s3_key,
-                data=content_bytes,
-            )
-
             logger.info(
                 f"Downloaded file from sandbox {sandbox_id}: {from_sandbox_file} -> s3://{download_to_s3_key}"
             )
@@ -361,8 +362,11 @@ class CloudflareSandboxBackend(SandboxBackend):
             True if the download and upload were successful, False otherwise.
         """
         try:
-            content_bytes = await S3_CLIENT.download_object(key=from_s3_key)
-            content_base64 = base64.b64encode(content_bytes).decode("utf-8")
+            content_base64 = await b64encode_stream(
+                S3_CLIENT.stream_download(
+                    key=from_s3_key, priority=S3IOPriority.SANDBOX
+                )
+            )
 
             request_body = {
                 "file_path": upload_to_sandbox_file,
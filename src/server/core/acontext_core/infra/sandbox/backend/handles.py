@@ -0,0 +1,110 @@
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Generic, Optional, TypeVar
+from ....env import LOG as logger
+from ....util.ttl_cache import TTLCache, SingleFlight
+
+H = TypeVar("H")
+
+
+@dataclass
+class _Handle(Generic[H]):
+    sandbox: H
+    keepalive_seconds: int
+    # monotonic time the sandbox timeout was last reset
+    refreshed_at: float
+
+
+class SandboxHandleCache(Generic[H]):
+    """
+    LRU of live SDK sandbox handles by backend sandbox id, so each call doesn't
+    pay a connect handshake. Concurrent connects of the same id share one.
+
+    Connecting keeps the sandbox alive for ``keepalive_seconds``. A cached
+    handle is kept alive by ``refresh`` once ``refresh_interval_seconds`` passed
+    since the last reset, and is dropped once the sandbox would have expired.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[str], Awaitable[H]],
+        refresh: Callable[[H, int], Awaitable[None]],
+        maxsize: int,
+        keepalive_seconds: int,
+        refresh_interval_seconds: float,
+    ):
+        self._connect = connect
+        self._refresh = refresh
+        self.keepalive_seconds = keepalive_seconds
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self._handles: TTLCache[_Handle[H]] = TTLCache(maxsize, ttl_seconds=None)
+        self._connects: SingleFlight[_Handle[H]] = SingleFlight()
+        self._refreshes: SingleFlight[None] = SingleFlight()
+
+    async def get(self, sandbox_id: str) -> H:
+        handle = self._handles.get(sandbox_id)
+        now = time.monotonic()
+        if handle is not None and now - handle.refreshed_at >= handle.keepalive_seconds:
+            self._handles.pop(sandbox_id)
+            handle = None
+        if handle is None:
+            handle = await self._connects.do(
+                sandbox_id, lambda: self._connect_handle(sandbox_id)
+            )
+        elif now - handle.refreshed_at >= self.refresh_interval_seconds:
+            await self._refreshes.do(
+                sandbox_id, lambda: self._refresh_handle(sandbox_id, handle)
+            )
+        return handle.sandbox
+
+    @asynccontextmanager
+    async def use(
+        self, sandbox_id: str, keep_on: tuple[type[BaseException], ...] = ()
+    ) -> AsyncIterator[H]:
+        """Yield the handle of `sandbox_id`, evicting it if the block raises anything but `keep_on`."""
+        sandbox = await self.get(sandbox_id)
+        try:
+            yield sandbox
+        except keep_on:
+            raise
+        except Exception:
+            self.evict(sandbox_id)
+            raise
+
+    def put(
+        self, sandbox_id: str, sandbox: H, keepalive_seconds: Optional[int] = None
+    ) -> None:
+        """Cache a handle whose sandbox timeout was just reset, e.g. a new sandbox."""
+        self._handles.set(
+            sandbox_id,
+            _Handle(
+                sandbox,
+                keepalive_seconds or self.keepalive_seconds,
+                time.monotonic(),
+            ),
+        )
+
+    def evict(self, sandbox_id: str) -> None:
+        self._handles.pop(sandbox_id)
+
+    def clear(self) -> None:
+        self._handles.clear()
+
+    def stats(self) -> dict:
+        return self._handles.stats()
+
+    async def _connect_handle(self, sandbox_id: str) -> _Handle[H]:
+        sandbox = await self._connect(sandbox_id)
+        handle = _Handle(sandbox, self.keepalive_seconds, time.monotonic())
+        self._handles.set(sandbox_id, handle)
+        return handle
+
+    async def _refresh_handle(self, sandbox_id: str, handle: _Handle[H]) -> None:
+        try:
+            await self._refresh(handle.sandbox, handle.keepalive_seconds)
+        except Exception as e:
+            logger.warning(f"Failed to refresh sandbox {sandbox_id} keepalive: {e}")
+            self.evict(sandbox_id)
+            raise
+        handle.refreshed_at = time.monotonic()
@@ -2,10 +2,11 @@
 Novita's sandbox sdk looks just like E2B, except the Sandbox.connect will reset the timeout
 """
 
-from novita_sandbox.code_interpreter import AsyncSandbox
+from novita_sandbox.code_interpreter import AsyncSandbox, CommandExitException
 from novita_sandbox.code_interpreter import SandboxState as E2B_SandboxState
 from typing import Type
-from .base import SandboxBackend
+from .base import SandboxBackend, spool_stream
+from .handles import SandboxHandleCache
 from ....env import DEFAULT_CORE_CONFIG, LOG as logger
 from ....schema.sandbox import (
     SandboxCreateConfig,
@@ -14,7 +15,7 @@ from ....schema.sandbox import (
     SandboxCommandOutput,
     SandboxStatus,
 )
-from ...s3 import S3_CLIENT
+from ...s3 import S3_CLIENT, S3IOPriority
 
 
 def _convert_e2b_state(state: E2B_SandboxState) -> SandboxStatus:
@@ -46,8 +47,19 @@ class NovitaSandboxBackend(SandboxBackend):
         self.__domain_base_url = domain_base_url
         self.__default_template = default_template
         self.__api_key = api_key
+        self.__handles: SandboxHandleCache[AsyncSandbox] = SandboxHandleCache(
+            connect=self._connect_sandbox,
+            refresh=lambda sandbox, seconds: sandbox.set_timeout(seconds),
+            maxsize=DEFAULT_CORE_CONFIG.sandbox_handle_cache_size,
+            keepalive_seconds=DEFAULT_CORE_CONFIG.sandbox_default_keepalive_seconds,
+            refresh_interval_seconds=DEFAULT_CORE_CONFIG.sandbox_handle_refresh_interval_seconds,
+        )
 
     async def connect_sandbox(self, sandbox_id: str) -> AsyncSandbox:
+        """A live handle of the sandbox, cached across calls."""
+        return await self.__handles.get(str(sandbox_id))
+
+    async def _connect_sandbox(self, sandbox_id: str) -> AsyncSandbox:
         return await AsyncSandbox.connect(
             sandbox_id=str(sandbox_id),
             api_key=self.__api_key,
@@ -55,6 +67,9 @@ class NovitaSandboxBackend(SandboxBackend):
             timeout=DEFAULT_CORE_CONFIG.sandbox_default_keepalive_seconds,
         )
 
+    async def close(self) -> None:
+        self.__handles.clear()
+
     @classmethod
     def from_default(cls: Type["NovitaSandboxBackend"]) -> "NovitaSandboxBackend":
         return cls(
@@ -82,6 +97,7 @@ class NovitaSandboxBackend(SandboxBackend):
             metadata=create_config.additional_configs,
         )
         info = await sandbox.get_info()
+        self.__handles.put(info.sandbox_id, sandbox)
         return SandboxRuntimeInfo(
             sandbox_id=info.sandbox_id,
             sandbox_status=_convert_e2b_state(info.state),
@@ -95,6 +111,7 @@ class NovitaSandboxBackend(SandboxBackend):
         Args:
             sandbox_id: The ID of the sandbox to kill.
         """
+        self.__handles.evict(str(sandbox_id))
         r = await AsyncSandbox.kill(
             sandbox_id=str(sandbox_id),
             api_key=self.__api_key,
@@ -116,10 +133,9 @@ class NovitaSandboxBackend(SandboxBackend):
         """
         try:
             # Connect to the sandbox to verify it exists and is running
-            sandbox = await self.connect_sandbox(sandbox_id)
-
-            # Get sandbox info using the SDK method
-            info = await sandbox.get_info()
+            async with self.__handles.use(str(sandbox_id)) as sandbox:
+                # Get sandbox info using the SDK method
+                info = await sandbox.get_info()
 
             return SandboxRuntimeInfo(
                 sandbox_id=info.sandbox_id,
@@ -142,9 +158,13 @@ class NovitaSandboxBackend(SandboxBackend):
         Returns:
             Runtime information about the updated sandbox.
         """
-        sandbox = await self.connect_sandbox(sandbox_id)
-        await sandbox.set_timeout(update_config.keepalive_longer_by_seconds)
-        info = await sandbox.get_info()
+        async with self.__handles.use(str(sandbox_id)) as sandbox:
+            await sandbox.set_timeout(update_config.keepalive_longer_by_seconds)
+            # Later refreshes keep the sandbox alive for the new timeout
+            self.__handles.put(
+                str(sandbox_id), sandbox, update_config.keepalive_longer_by_seconds
+            )
+            info = await sandbox.get_info()
         return SandboxRuntimeInfo(
             sandbox_id=info.sandbox_id,
             sandbox_status=_convert_e2b_state(info.state),
@@ -162,8 +182,11 @@ class NovitaSandboxBackend(SandboxBackend):
         Returns:
             The command output including stdout, stderr, and exit code.
         """
-        sandbox = await self.connect_sandbox(sandbox_id)
-        result = await sandbox.commands.run(cmd=command)
+        # A failing command leaves the sandbox usable
+        async with self.__handles.use(
+            str(sandbox_id), keep_on=(CommandExitException,)
+        ) as sandbox:
+            result = await sandbox.commands.run(cmd=command)
 
         return SandboxCommandOutput(
             stdout=result.stdout,
@@ -186,22 +209,16 @@ class NovitaSandboxBackend(SandboxBackend):
         """
 
         try:
-            sandbox = await self.connect_sandbox(sandbox_id)
-
-            # Read file content from sandbox
-            content = await sandbox.files.read(from_sandbox_file)
-
-            # Convert to bytes if necessary (files.read returns str or bytes)
-            if isinstance(content, str):
-                content_bytes = content.encode("utf-8")
-            else:
-                content_bytes = content
-
-            # Upload to S3 using the provided key directly
-            await S3_CLIENT.upload_object(
-                key=download_to_s3_key,
-                data=content_bytes,
-            )
+            async with self.__handles.use(str(sandbox_id)) as sandbox:
+                # Stream the file from sandbox to S3 using the provided key directly
+                content_stream = await sandbox.files.read(
+                    from_sandbox_file, format="stream"
+                )
+                await S3_CLIENT.stream_upload(
+                    key=download_to_s3_key,
+                    chunks=content_stream,
+                    priority=S3IOPriority.SANDBOX,
+                )
 
             logger.info(
                 f"Downloaded file from sandbox {sandbox_id}: {from_sandbox_file} -> s3://{download_to_s3_key}"
@@ -229,13 +246,15 @@ class NovitaSandboxBackend(SandboxBackend):
         """
 
         try:
-            # Download from S3
-            content = await S3_CLIENT.download_object(key=from_s3_key)
-
-            sandbox = await self.connect_sandbox(sandbox_id)
-
-            # Write file to sandbox using the provided path directly
-            await sandbox.files.write(upload_to_sandbox_file, content)
+            # Spool from S3, then stream the file object to the sandbox path
+            with await spool_stream(
+                S3_CLIENT.stream_download(
+                    key=from_s3_key, priority=S3IOPriority.SANDBOX
+                ),
+                max_memory=S3_CLIENT.stream_part_size,
+            ) as content:
+                async with self.__handles.use(str(sandbox_id)) as sandbox:
+                    await sandbox.files.write(upload_to_sandbox_file, content)
 
             logger.info(
                 f"Uploaded file to sandbox {sandbox_id}: s3://{from_s3_key} -> {upload_to_sandbox_file}"
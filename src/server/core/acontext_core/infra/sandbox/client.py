@@ -40,6 +40,8 @@ class SandboxClient:
         LOG.info("Sandbox is enabled")
 
     async def close(self):
+        if self.__sanbox_backend is not None:
+            await self.__sanbox_backend.close()
         self.__sanbox_backend = None
         self.__enabled = False
 
@@ -1,17 +1,22 @@
-from typing import List
-from ...env import LOG
+from dataclasses import replace
+from functools import partial
+from typing import List, Optional
+from ...env import LOG, DEFAULT_CORE_CONFIG
 from ...telemetry.log import bound_logging_vars
 from ...infra.db import AsyncSession, DB_CLIENT
 from ...schema.result import Result
 from ...schema.utils import asUUID
 from ...schema.session.task import TaskSchema
+from ...schema.llm import LLMResponse, LLMToolCall
 from ...schema.session.message import MessageBlob
 from ...service.data import task as TD
-from ..complete import llm_complete, response_to_sendable_message
+from ..complete import llm_complete, llm_complete_stream, response_to_sendable_message
 from ..prompt.task import TaskPrompt, TASK_TOOLS
 from ...util.generate_ids import track_process
+from ..tool.base import ToolAccess
+from ..tool.executor import ToolCallRunner, run_tool_calls
 from ..tool.task_lib.ctx import TaskCtx
-from ..tool.task_lib.insert import _insert_task_tool
+from ..tool.task_lib.insert import _insert_task_tool, insert_tasks_handler
 from ..tool.task_lib.update import _update_task_tool
 from ..tool.task_lib.append import _append_messages_to_task_tool
 
@@ -89,12 +94,7 @@ async def build_task_ctx(
     project_id: asUUID,
     session_id: asUUID,
     messages: list[MessageBlob],
-    before_use_ctx: TaskCtx = None,
-) -> TaskCtx:
-    if before_use_ctx is not None:
-        before_use_ctx.db_session = db_session
-        return before_use_ctx
-
+) -> Result[TaskCtx]:
     r = await TD.fetch_current_tasks(db_session, session_id)
     current_tasks, eil = r.unpack()
     if eil:
@@ -110,7 +110,204 @@ async def build_task_ctx(
         task_index=current_tasks,
         message_ids_index=[m.message_id for m in messages],
     )
-    return use_ctx
+    return Result.resolve(use_ctx)
+
+
+async def check_task_ctx_consistency(ctx: TaskCtx) -> None:
+    """Debug only: compare the in-memory tasks with the DB and resync on drift."""
+    r = await TD.fetch_current_tasks(ctx.db_session, ctx.session_id)
+    db_tasks, eil = r.unpack()
+    if eil:
+        LOG.warning(f"Failed to check task context consistency: {eil}")
+        return
+    if db_tasks != ctx.task_index:
+        LOG.warning(
+            f"Task context drifted from DB, "
+            f"ctx: {[t.model_dump() for t in ctx.task_index]}, "
+            f"db: {[t.model_dump() for t in db_tasks]}"
+        )
+        ctx.reset_tasks(db_tasks)
+
+
+def tool_call_access(tool_call: LLMToolCall) -> ToolAccess | None:
+    tool = TASK_TOOLS[tool_call.function.name]
+    if tool.access is None:
+        return None
+    return tool.access(tool_call.function.arguments)
+
+
+async def run_task_tool_call(ctx: TaskCtx, tool_call: LLMToolCall) -> Result[str]:
+    tool_name = tool_call.function.name
+    try:
+        with bound_logging_vars(tool=tool_name):
+            # Each call gets its own DB session, the task snapshot is shared
+            async with DB_CLIENT.get_session_context() as db_session:
+                return await TASK_TOOLS[tool_name].handler(
+                    replace(ctx, db_session=db_session), tool_call.function.arguments
+                )
+    except Exception as e:
+        return Result.reject(f"Tool {tool_name} error: {str(e)}")
+
+
+def group_tool_calls(tool_calls: list[LLMToolCall]) -> list[list[LLMToolCall]]:
+    """Consecutive insert_task calls are grouped to be applied as one batch."""
+    insert_name = _insert_task_tool.schema.function.name
+    groups = []
+    for tool_call in tool_calls:
+        if (
+            tool_call.function.name == insert_name
+            and groups
+            and groups[-1][0].function.name == insert_name
+        ):
+            groups[-1].append(tool_call)
+        else:
+            groups.append([tool_call])
+    return groups
+
+
+async def run_task_tool_group(
+    ctx: TaskCtx, tool_calls: list[LLMToolCall]
+) -> Result[list[str]]:
+    if len(tool_calls) == 1:
+        r = await run_task_tool_call(ctx, tool_calls[0])
+        t, eil = r.unpack()
+        return r if eil else Result.resolve([t])
+    try:
+        with bound_logging_vars(tool=tool_calls[0].function.name):
+            async with DB_CLIENT.get_session_context() as db_session:
+                return await insert_tasks_handler(
+                    replace(ctx, db_session=db_session),
+                    [tc.function.arguments for tc in tool_calls],
+                )
+    except Exception as e:
+        return Result.reject(f"Tool {tool_calls[0].function.name} error: {str(e)}")
+
+
+class TaskToolDispatcher:
+    """
+    Groups the tool calls of a streamed LLM response like group_tool_calls, and
+    starts each group as soon as it is complete, while the LLM generates the rest.
+    """
+
+    def __init__(self, ctx: TaskCtx):
+        self.groups: list[list[LLMToolCall]] = []
+        self.just_finish = False
+        self.unknown_tool: Optional[str] = None
+        self._inserts: list[LLMToolCall] = []
+        self._runner = ToolCallRunner(
+            access=lambda group: tool_call_access(group[0]),
+            run=partial(run_task_tool_group, ctx),
+        )
+
+    def add(self, tool_call: LLMToolCall) -> None:
+        tool_name = tool_call.function.name
+        if tool_name == "finish":
+            self.just_finish = True
+            return
+        if self.unknown_tool is not None:
+            # Nothing is started after an unknown tool
+            return
+        if tool_name not in TASK_TOOLS:
+            self.unknown_tool = tool_name
+            self._flush_inserts()
+            return
+        if tool_name == _insert_task_tool.schema.function.name:
+            # The insert batch is complete once another tool is called
+            self._inserts.append(tool_call)
+            return
+        self._flush_inserts()
+        self._submit([tool_call])
+
+    def _flush_inserts(self) -> None:
+        if self._inserts:
+            self._submit(self._inserts)
+            self._inserts = []
+
+    def _submit(self, group: list[LLMToolCall]) -> None:
+        self.groups.append(group)
+        self._runner.submit(group)
+
+    async def results(self) -> list[Result[list[str]]]:
+        self._flush_inserts()
+        return await self._runner.results()
+
+
+def pack_tool_responses(
+    tool_groups: list[list[LLMToolCall]], results: list[Result[list[str]]]
+) -> Result[list[dict]]:
+    tool_response = []
+    for group, r in zip(tool_groups, results):
+        contents, eil = r.unpack()
+        if eil:
+            # The groups that finished before the failure stay committed
+            return r
+        for tool_call, t in zip(group, contents):
+            tool_name = tool_call.function.name
+            if tool_name != "report_thinking":
+                LOG.info(
+                    f"Tool Call: {tool_name} - {tool_call.function.arguments} -> {t}"
+                )
+            tool_response.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "content": t,
+                }
+            )
+    return Result.resolve(tool_response)
+
+
+async def complete_and_run_tools(
+    ctx: TaskCtx, project_id: asUUID, messages: list[dict], json_tools: list[dict]
+) -> Result[tuple[LLMResponse, list[LLMToolCall], list[dict], bool]]:
+    """
+    One agent iteration: ask the LLM and run its tool calls.
+
+    Returns:
+        The LLM response, the tool calls run, their tool messages and
+        whether `finish` was called
+    """
+    llm_kwargs = dict(
+        system_prompt=TaskPrompt.system_prompt(),
+        history_messages=messages,
+        tools=json_tools,
+        prompt_kwargs=TaskPrompt.prompt_kwargs(),
+        project_id=project_id,
+    )
+    if DEFAULT_CORE_CONFIG.task_agent_stream_tool_calls:
+        dispatcher = TaskToolDispatcher(ctx)
+        r = await llm_complete_stream(dispatcher.add, **llm_kwargs)
+        # Let the tool calls that already started finish before returning
+        results = await dispatcher.results()
+        llm_return, eil = r.unpack()
+        if eil:
+            return r
+        if dispatcher.unknown_tool is not None:
+            return Result.reject(f"Tool {dispatcher.unknown_tool} not found")
+        tool_groups, just_finish = dispatcher.groups, dispatcher.just_finish
+    else:
+        r = await llm_complete(**llm_kwargs)
+        llm_return, eil = r.unpack()
+        if eil:
+            return r
+        tool_calls = llm_return.tool_calls or []
+        use_tools = [tc for tc in tool_calls if tc.function.name != "finish"]
+        just_finish = len(use_tools) < len(tool_calls)
+        for tool_call in use_tools:
+            if tool_call.function.name not in TASK_TOOLS:
+                return Result.reject(f"Tool {tool_call.function.name} not found")
+        tool_groups = group_tool_calls(use_tools)
+        results = await run_tool_calls(
+            tool_groups,
+            access=lambda group: tool_call_access(group[0]),
+            run=partial(run_task_tool_group, ctx),
+        )
+    r = pack_tool_responses(tool_groups, results)
+    tool_response, eil = r.unpack()
+    if eil:
+        return r
+    use_tools = [tc for group in tool_groups for tc in group]
+    return Result.resolve((llm_return, use_tools, tool_response, just_finish))
 
 
 @track_process
@@ -122,10 +319,12 @@ async def task_agent_curd(
     previous_progress_num: int = 6,
 ) -> Result[None]:
     async with DB_CLIENT.get_session_context() as db_session:
-        r = await TD.fetch_current_tasks(db_session, session_id)
-        tasks, eil = r.unpack()
+        r = await build_task_ctx(db_session, project_id, session_id, messages)
+        USE_CTX, eil = r.unpack()
         if eil:
             return r
+    # Tool handlers apply their changes to USE_CTX, tasks are not re-queried
+    tasks = USE_CTX.task_index
 
     task_section = pack_task_section(tasks)
     previous_progress_section = pack_previous_progress_section(
@@ -138,69 +337,36 @@ async def task_agent_curd(
 
     json_tools = [tool.model_dump() for tool in TaskPrompt.tool_schema()]
     already_iterations = 0
+    pack_task_input = (
+        TaskPrompt.pack_task_input_blocks
+        if DEFAULT_CORE_CONFIG.llm_prompt_cache_enabled
+        else TaskPrompt.pack_task_input
+    )
     _messages = [
         {
             "role": "user",
-            "content": TaskPrompt.pack_task_input(
+            "content": pack_task_input(
                 previous_progress_section, current_messages_section, task_section
             ),
         }
     ]
     while already_iterations < max_iterations:
-        r = await llm_complete(
-            system_prompt=TaskPrompt.system_prompt(),
-            history_messages=_messages,
-            tools=json_tools,
-            prompt_kwargs=TaskPrompt.prompt_kwargs(),
-        )
-        llm_return, eil = r.unpack()
+        r = await complete_and_run_tools(USE_CTX, project_id, _messages, json_tools)
+        iteration, eil = r.unpack()
         if eil:
             return r
+        llm_return, use_tools, tool_response, just_finish = iteration
         _messages.append(response_to_sendable_message(llm_return))
         LOG.info(f"LLM Response: {llm_return.content}...")
         if not llm_return.tool_calls:
             LOG.info("No tool calls found, stop iterations")
             break
-        use_tools = llm_return.tool_calls
-        just_finish = False
-        tool_response = []
-        USE_CTX = None
-        for tool_call in use_tools:
-            try:
-                tool_name = tool_call.function.name
-                if tool_name == "finish":
-                    just_finish = True
-                    continue
-                tool_arguments = tool_call.function.arguments
-                tool = TASK_TOOLS[tool_name]
-                with bound_logging_vars(tool=tool_name):
-                    async with DB_CLIENT.get_session_context() as db_session:
-                        USE_CTX = await build_task_ctx(
-                            db_session,
-                            project_id,
-                            session_id,
-                            messages,
-                            before_use_ctx=USE_CTX,
-                        )
-                        r = await tool.handler(USE_CTX, tool_arguments)
-                    t, eil = r.unpack()
-                    if eil:
-                        return r
-                if tool_name != "report_thinking":
-                    LOG.info(f"Tool Call: {tool_name} - {tool_arguments} -> {t}")
-                tool_response.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": t,
-                    }
-                )
-                if tool_name in NEED_UPDATE_CTX:
-                    USE_CTX = None
-            except KeyError as e:
-                return Result.reject(f"Tool {tool_name} not found: {str(e)}")
-            except Exception as e:
-                return Result.reject(f"Tool {tool_name} error: {str(e)}")
+        if DEFAULT_CORE_CONFIG.task_agent_check_ctx_consistency and any(
+            tc.function.name in NEED_UPDATE_CTX for tc in use_tools
+        ):
+            async with DB_CLIENT.get_session_context() as db_session:
+                USE_CTX.db_session = db_session
+                await check_task_ctx_consistency(USE_CTX)
         _messages.extend(tool_response)
         if just_finish:
             LOG.info("finish function is called")
@@ -1,21 +1,92 @@
+import json
 from typing import Callable, Awaitable, Mapping, Optional
-from .openai_sdk import openai_complete
-from .anthropic_sdk import anthropic_complete
-from .mock_sdk import mock_complete
-from ...schema.llm import LLMResponse
+from time import perf_counter
+from opentelemetry import metrics
+from .openai_sdk import openai_complete, openai_complete_stream
+from .anthropic_sdk import anthropic_complete, anthropic_complete_stream
+from .mock_sdk import mock_complete, mock_complete_stream
+from .scheduler import LLM_SCHEDULER
+from .hedge import LLM_LATENCY, race_routes
+from ...schema.config import LLMRoute
+from ...schema.llm import LLMResponse, LLMToolCall
 from ...schema.result import Result
+from ...schema.utils import asUUID
 from ...env import LOG, DEFAULT_CORE_CONFIG
 from ...telemetry.log import bound_logging_vars
 
 
 COMPLETE_FUNC = Callable[..., Awaitable[LLMResponse]]
 
+_meter = metrics.get_meter(__name__)
+_LLM_TOKENS = _meter.create_counter(
+    "acontext.llm.tokens",
+    unit="{token}",
+    description="Tokens of LLM completions, by type (input, cached, output)",
+)
+
 FACTORIES: Mapping[str, COMPLETE_FUNC] = {
     "openai": openai_complete,
     "anthropic": anthropic_complete,
     "mock": mock_complete,
 }
 
+# Take an extra `on_tool_call` callback, called for each complete tool call
+STREAM_FACTORIES: Mapping[str, COMPLETE_FUNC] = {
+    "openai": openai_complete_stream,
+    "anthropic": anthropic_complete_stream,
+    "mock": mock_complete_stream,
+}
+
+
+def estimate_tokens(
+    prompt=None, system_prompt=None, history_messages=None, tools=None
+) -> int:
+    """Rough token count of a request (~4 chars per token), to reserve rate budget."""
+    chars = sum(
+        len(str(part))
+        for part in (prompt, system_prompt, history_messages, tools)
+        if part
+    )
+    return chars // 4 + 1
+
+
+def _rate_limited_pause_seconds(e: Exception) -> Optional[float]:
+    if getattr(e, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return DEFAULT_CORE_CONFIG.llm_rate_limited_pause_seconds
+
+
+def _routes(use_model: str) -> list[LLMRoute]:
+    return [
+        LLMRoute(sdk=DEFAULT_CORE_CONFIG.llm_sdk, model=use_model)
+    ] + DEFAULT_CORE_CONFIG.llm_fallback_routes
+
+
+async def _complete_with_route(
+    factories: Mapping[str, COMPLETE_FUNC],
+    route: LLMRoute,
+    use_model: str,
+    prompt=None,
+    **kwargs,
+) -> LLMResponse:
+    route_model = route.model or use_model
+    _start_s = perf_counter()
+    response = await factories[route.sdk](
+        prompt,
+        model=route_model,
+        base_url=route.base_url,
+        api_key=route.api_key,
+        **kwargs,
+    )
+    LLM_LATENCY.observe(route, perf_counter() - _start_s)
+    response.sdk = route.sdk
+    response.model = route_model
+    return response
+
 
 async def llm_complete(
     prompt=None,
@@ -26,17 +97,18 @@ async def llm_complete(
     max_tokens=1024,
     prompt_kwargs: Optional[dict] = None,
     tools=None,
+    project_id: Optional[asUUID] = None,
     **kwargs,
 ) -> Result[LLMResponse]:
     use_model = model or DEFAULT_CORE_CONFIG.llm_simple_model
-    use_complete_func = FACTORIES[DEFAULT_CORE_CONFIG.llm_sdk]
-
     history_messages = history_messages or []
 
-    try:
-        response = await use_complete_func(
+    async def attempt(route: LLMRoute) -> LLMResponse:
+        return await _complete_with_route(
+            FACTORIES,
+            route,
+            use_model,
             prompt,
-            model=use_model,
             system_prompt=system_prompt,
             history_messages=history_messages,
             json_mode=json_mode,
@@ -45,12 +117,135 @@ async def llm_complete(
             tools=tools,
             **kwargs,
         )
+
+    estimated_tokens = (
+        estimate_tokens(prompt, system_prompt, history_messages, tools) + max_tokens
+    )
+    try:
+        # One slot for the logical call, hedges and fallbacks included
+        async with LLM_SCHEDULER.slot(project_id, estimated_tokens):
+            try:
+                response = await race_routes(_routes(use_model), attempt)
+            except Exception as e:
+                _pause_if_rate_limited(e)
+                raise
     except Exception as e:
-        return Result.reject(f"LLM complete failed - error: {str(e)}")
+        return _reject_failed(e)
 
+    _record_success(response, project_id, estimated_tokens, prompt_kwargs)
     return Result.resolve(response)
 
 
+async def llm_complete_stream(
+    on_tool_call: Callable[[LLMToolCall], None],
+    prompt=None,
+    model=None,
+    system_prompt=None,
+    history_messages=None,
+    json_mode=False,
+    max_tokens=1024,
+    prompt_kwargs: Optional[dict] = None,
+    tools=None,
+    project_id: Optional[asUUID] = None,
+    **kwargs,
+) -> Result[LLMResponse]:
+    """
+    llm_complete that streams the response: `on_tool_call` gets each tool call
+    as soon as its arguments are complete, while the later ones are generated.
+
+    The tool calls may have side effects once handed out, so streamed calls are
+    never hedged, and only fall back to the next route while no tool call has
+    been handed out yet.
+    """
+    use_model = model or DEFAULT_CORE_CONFIG.llm_simple_model
+    history_messages = history_messages or []
+    handed_out = 0
+
+    def _on_tool_call(tool_call: LLMToolCall) -> None:
+        nonlocal handed_out
+        handed_out += 1
+        on_tool_call(tool_call)
+
+    estimated_tokens = (
+        estimate_tokens(prompt, system_prompt, history_messages, tools) + max_tokens
+    )
+    routes = _routes(use_model)
+    try:
+        async with LLM_SCHEDULER.slot(project_id, estimated_tokens):
+            for i, route in enumerate(routes):
+                try:
+                    response = await _complete_with_route(
+                        STREAM_FACTORIES,
+                        route,
+                        use_model,
+                        prompt,
+                        system_prompt=system_prompt,
+                        history_messages=history_messages,
+                        json_mode=json_mode,
+                        max_tokens=max_tokens,
+                        prompt_kwargs=prompt_kwargs,
+                        tools=tools,
+                        on_tool_call=_on_tool_call,
+                        **kwargs,
+                    )
+                    break
+                except Exception as e:
+                    if handed_out or i == len(routes) - 1:
+                        _pause_if_rate_limited(e)
+                        raise
+                    LOG.warning(f"LLM {route.sdk} {route.model} failed: {e}")
+    except Exception as e:
+        return _reject_failed(e)
+
+    _record_success(response, project_id, estimated_tokens, prompt_kwargs)
+    return Result.resolve(response)
+
+
+def _pause_if_rate_limited(e: Exception) -> None:
+    # Called while the call still holds its slot, releasing it first would
+    # hand it straight to the next queued call
+    pause_seconds = _rate_limited_pause_seconds(e)
+    if pause_seconds is not None:
+        LLM_SCHEDULER.pause(pause_seconds)
+
+
+def _reject_failed(e: Exception) -> Result[LLMResponse]:
+    return Result.reject(f"LLM complete failed - error: {str(e)}")
+
+
+def _record_success(
+    response: LLMResponse,
+    project_id: Optional[asUUID],
+    estimated_tokens: int,
+    prompt_kwargs: Optional[dict],
+) -> None:
+    if response.usage is not None:
+        LLM_SCHEDULER.record_usage(
+            project_id,
+            estimated_tokens,
+            response.usage.input_tokens + response.usage.output_tokens,
+        )
+    record_llm_usage(response, prompt_kwargs)
+
+
+def record_llm_usage(
+    response: LLMResponse, prompt_kwargs: Optional[dict] = None
+) -> None:
+    if response.usage is None:
+        return
+    attributes = {
+        "llm.sdk": response.sdk or DEFAULT_CORE_CONFIG.llm_sdk,
+        "llm.model": response.model or "...",
+        "llm.prompt_id": (prompt_kwargs or {}).get("prompt_id", "..."),
+    }
+    for token_type, count in (
+        ("input", response.usage.input_tokens),
+        ("cached", response.usage.cached_tokens),
+        ("output", response.usage.output_tokens),
+    ):
+        _LLM_TOKENS.add(count, {**attributes, "llm.token_type": token_type})
+
+
 async def llm_sanity_check():
     with bound_logging_vars(project_id="__test__"):
         r = await llm_complete("Test", max_tokens=1)
@@ -61,8 +256,27 @@ async def llm_sanity_check():
 
 
 def response_to_sendable_message(message: LLMResponse) -> dict:
+    """
+    Render the response in the format of the primary sdk, the other sdks
+    convert it when a later call falls back to them.
+    """
     if DEFAULT_CORE_CONFIG.llm_sdk == "openai":
-        return message.raw_response.choices[0].message.model_dump()
+        if message.sdk in (None, "openai"):
+            return message.raw_response.choices[0].message.model_dump()
+        dp = {"role": message.role, "content": message.content}
+        if message.tool_calls:
+            dp["tool_calls"] = [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": json.dumps(tool_call.function.arguments),
+                    },
+                }
+                for tool_call in message.tool_calls
+            ]
+        return dp
     elif DEFAULT_CORE_CONFIG.llm_sdk == "anthropic":
         dp = {"role": message.role, "content": []}
         if message.content:
@@ -1,10 +1,10 @@
 import json
-from typing import Optional
+from typing import Callable, Optional
 from .clients import get_anthropic_async_client_instance
-from anthropic.types import Message
+from anthropic.types import Message, ToolUseBlock
 from time import perf_counter
-from ...env import LOG
-from ...schema.llm import LLMResponse
+from ...env import LOG, DEFAULT_CORE_CONFIG
+from ...schema.llm import LLMResponse, LLMToolCall, LLMUsage
 
 
 def convert_openai_tool_to_anthropic_tool(tools: list[dict]) -> list[dict]:
@@ -18,10 +18,33 @@ def convert_openai_tool_to_anthropic_tool(tools: list[dict]) -> list[dict]:
     ]
 
 
+def convert_openai_assistant_message(message: dict) -> dict:
+    """Turn an assistant message with OpenAI tool calls into Anthropic content blocks."""
+    content = []
+    if message.get("content"):
+        content.append({"type": "text", "text": message["content"]})
+    for tool_call in message["tool_calls"] or []:
+        arguments = tool_call["function"]["arguments"]
+        content.append(
+            {
+                "type": "tool_use",
+                "id": tool_call["id"],
+                "name": tool_call["function"]["name"],
+                "input": (
+                    json.loads(arguments) if isinstance(arguments, str) else arguments
+                ),
+            }
+        )
+    return {"role": "assistant", "content": content}
+
+
 def process_messages(messages: list[dict]) -> list[dict]:
     new_messages = []
     for m in messages:
-        if isinstance(m, dict) and m["role"] == "tool" and "tool_call_id" in m:
+        if isinstance(m, dict) and m["role"] == "assistant" and "tool_calls" in m:
+            # Answered by an OpenAI route, e.g. before falling back here
+            new_messages.append(convert_openai_assistant_message(m))
+        elif isinstance(m, dict) and m["role"] == "tool" and "tool_call_id" in m:
             if (
                 isinstance(new_messages[-1], dict)
                 and new_messages[-1]["role"] == "user"
@@ -51,22 +74,9 @@ def process_messages(messages: list[dict]) -> list[dict]:
     return new_messages
 
 
-async def anthropic_complete(
-    prompt=None,
-    model=None,
-    system_prompt=None,
-    history_messages=[],
-    json_mode=False,
-    max_tokens=1024,
-    prompt_kwargs: Optional[dict] = None,
-    tools=None,
-    **kwargs,
-) -> LLMResponse:
-    prompt_kwargs = prompt_kwargs or {}
-    prompt_id = prompt_kwargs.get("prompt_id", "...")
-
-    anthropic_async_client = get_anthropic_async_client_instance()
-
+def _prepare_request(
+    model, prompt, system_prompt, history_messages, json_mode, max_tokens, tools, kwargs
+) -> dict:
     # Convert messages to Anthropic format
     messages = []
     messages.extend(history_messages)
@@ -101,57 +111,199 @@ async def anthropic_complete(
         anthropic_tools = convert_openai_tool_to_anthropic_tool(tools)
         request_params["tools"] = anthropic_tools
 
+    if DEFAULT_CORE_CONFIG.llm_prompt_cache_enabled and request_params["system"]:
+        # Tools and system prompt are rendered first, a breakpoint on the system
+        # prompt caches both. The messages may carry their own breakpoints.
+        request_params["system"] = [
+            {
+                "type": "text",
+                "text": request_params["system"],
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+    return request_params
+
+
+def _to_llm_response(
+    response: Message, json_mode: bool, prompt_id: str, model, elapsed: float
+) -> LLMResponse:
+    # input_tokens excludes the tokens read from and written to the cache
+    usage = LLMUsage(
+        input_tokens=response.usage.input_tokens
+        + (response.usage.cache_read_input_tokens or 0)
+        + (response.usage.cache_creation_input_tokens or 0),
+        output_tokens=response.usage.output_tokens,
+        cached_tokens=response.usage.cache_read_input_tokens or 0,
+    )
+
+    LOG.info(
+        f"LLM Complete: {prompt_id} {model}. "
+        f"cached {response.usage.cache_read_input_tokens}, "
+        f"input {response.usage.input_tokens}, "
+        f"total {response.usage.input_tokens + response.usage.output_tokens}, "
+        f"time {elapsed:.4f}s"
+    )
+
+    # Extract content from response
+    content = ""
+    tool_calls = []
+    for content_block in response.content:
+        if content_block.type == "text":
+            content += content_block.text
+        elif content_block.type == "tool_use":
+            tool_calls.append(convert_anthropic_tool_use(content_block))
+
+    llm_response = LLMResponse(
+        role="assistant",
+        raw_response=response,
+        content=content if content else None,
+        tool_calls=tool_calls if tool_calls else None,
+        usage=usage,
+    )
+
+    # Handle JSON mode parsing
+    if json_mode and content:
+        try:
+            json_content = json.loads(content)
+            llm_response.json_content = json_content
+        except json.JSONDecodeError:
+            LOG.error(f"JSON decode error: {content}")
+            llm_response.json_content = None
+
+    return llm_response
+
+
+def convert_anthropic_tool_use(content_block: ToolUseBlock) -> dict:
+    # Convert Anthropic tool use to OpenAI-style tool call
+    return {
+        "id": content_block.id,
+        "type": "function",
+        "function": {
+            "name": content_block.name,
+            "arguments": (content_block.input or {}),
+        },
+    }
+
+
+async def anthropic_complete(
+    prompt=None,
+    model=None,
+    system_prompt=None,
+    history_messages=[],
+    json_mode=False,
+    max_tokens=1024,
+    prompt_kwargs: Optional[dict] = None,
+    tools=None,
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    **kwargs,
+) -> LLMResponse:
+    prompt_kwargs = prompt_kwargs or {}
+    prompt_id = prompt_kwargs.get("prompt_id", "...")
+
+    anthropic_async_client = get_anthropic_async_client_instance(base_url, api_key)
+    request_params = _prepare_request(
+        model,
+        prompt,
+        system_prompt,
+        history_messages,
+        json_mode,
+        max_tokens,
+        tools,
+        kwargs,
+    )
+
     try:
         _start_s = perf_counter()
         response: Message = await anthropic_async_client.messages.create(
             **request_params
         )
         _end_s = perf_counter()
-
-        LOG.info(
-            f"LLM Complete: {prompt_id} {model}. "
-            f"cached {response.usage.cache_read_input_tokens}, "
-            f"input {response.usage.input_tokens}, "
-            f"total {response.usage.input_tokens + response.usage.output_tokens}, "
-            f"time {_end_s - _start_s:.4f}s"
+        return _to_llm_response(
+            response, json_mode, prompt_id, model, _end_s - _start_s
         )
+    except Exception as e:
+        LOG.error(f"Anthropic completion failed: {str(e)}")
+        raise e
 
-        # Extract content from response
-        content = ""
-        tool_calls = []
-        for content_block in response.content:
-            if content_block.type == "text":
-                content += content_block.text
-            elif content_block.type == "tool_use":
-                # Convert Anthropic tool use to OpenAI-style tool call
-                tool_call = {
-                    "id": content_block.id,
-                    "type": "function",
-                    "function": {
-                        "name": content_block.name,
-                        "arguments": (content_block.input or {}),
-                    },
-                }
-                tool_calls.append(tool_call)
-
-        llm_response = LLMResponse(
-            role="assistant",
-            raw_response=response,
-            content=content if content else None,
-            tool_calls=tool_calls if tool_calls else None,
-        )
 
-        # Handle JSON mode parsing
-        if json_mode and content:
-            try:
-                json_content = json.loads(content)
-                llm_response.json_content = json_content
-            except json.JSONDecodeError:
-                LOG.error(f"JSON decode error: {content}")
-                llm_response.json_content = None
+async def anthropic_complete_stream(
+    prompt=None,
+    model=None,
+    system_prompt=None,
+    history_messages=[],
+    json_mode=False,
+    max_tokens=1024,
+    prompt_kwargs: Optional[dict] = None,
+    tools=None,
+    on_tool_call: Optional[Callable[[LLMToolCall], None]] = None,
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    **kwargs,
+) -> LLMResponse:
+    """
+    Like anthropic_complete, but streams the response and calls `on_tool_call`
+    for each tool use block as soon as it is complete.
+    """
+    prompt_kwargs = prompt_kwargs or {}
+    prompt_id = prompt_kwargs.get("prompt_id", "...")
+
+    anthropic_async_client = get_anthropic_async_client_instance(base_url, api_key)
+    request_params = _prepare_request(
+        model,
+        prompt,
+        system_prompt,
+        history_messages,
+        json_mode,
+        max_tokens,
+        tools,
+        kwargs,
+    )
 
-        return llm_response
+    try:
+        _start_s = perf_counter()
+        stream = await anthropic_async_client.messages.create(
+            **request_params, stream=True
+        )
+        message = None
+        blocks: dict[int, dict] = {}
+        partial_json: dict[int, str] = {}
+        async for event in stream:
+            if event.type == "message_start":
+                message = event.message.model_dump()
+            elif event.type == "content_block_start":
+                blocks[event.index] = event.content_block.model_dump()
+            elif event.type == "content_block_delta":
+                if event.delta.type == "text_delta":
+                    blocks[event.index]["text"] += event.delta.text
+                elif event.delta.type == "input_json_delta":
+                    partial_json[event.index] = (
+                        partial_json.get(event.index, "") + event.delta.partial_json
+                    )
+            elif event.type == "content_block_stop":
+                block = blocks[event.index]
+                if block["type"] != "tool_use":
+                    continue
+                if partial_json.get(event.index):
+                    block["input"] = json.loads(partial_json[event.index])
+                if on_tool_call is not None:
+                    on_tool_call(
+                        LLMToolCall.model_validate(
+                            convert_anthropic_tool_use(
+                                ToolUseBlock.model_validate(block)
+                            )
+                        )
+                    )
+            elif event.type == "message_delta":
+                message["stop_reason"] = event.delta.stop_reason
+                message["usage"]["output_tokens"] = event.usage.output_tokens
+        _end_s = perf_counter()
 
+        message["content"] = [blocks[i] for i in sorted(blocks)]
+        response = Message.model_validate(message)
+        return _to_llm_response(
+            response, json_mode, prompt_id, model, _end_s - _start_s
+        )
     except Exception as e:
         LOG.error(f"Anthropic completion failed: {str(e)}")
         raise e
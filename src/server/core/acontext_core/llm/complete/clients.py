@@ -1,28 +1,40 @@
+from typing import Optional
 from openai import AsyncOpenAI
 from anthropic import AsyncAnthropic
 from ...env import DEFAULT_CORE_CONFIG
 
-_global_openai_async_client = None
-_global_anthropic_async_client = None
+_openai_async_clients: dict[tuple, AsyncOpenAI] = {}
+_anthropic_async_clients: dict[tuple, AsyncAnthropic] = {}
 
 
-def get_openai_async_client_instance() -> AsyncOpenAI:
-    global _global_openai_async_client
-    if _global_openai_async_client is None:
-        _global_openai_async_client = AsyncOpenAI(
-            base_url=DEFAULT_CORE_CONFIG.llm_base_url,
-            api_key=DEFAULT_CORE_CONFIG.llm_api_key,
+def get_openai_async_client_instance(
+    base_url: Optional[str] = None, api_key: Optional[str] = None
+) -> AsyncOpenAI:
+    """One client per endpoint, the configured one unless a fallback route overrides it."""
+    key = (
+        base_url or DEFAULT_CORE_CONFIG.llm_base_url,
+        api_key or DEFAULT_CORE_CONFIG.llm_api_key,
+    )
+    if key not in _openai_async_clients:
+        _openai_async_clients[key] = AsyncOpenAI(
+            base_url=key[0],
+            api_key=key[1],
             default_query=DEFAULT_CORE_CONFIG.llm_openai_default_query,
             default_headers=DEFAULT_CORE_CONFIG.llm_openai_default_header,
         )
-    return _global_openai_async_client
+    return _openai_async_clients[key]
 
 
-def get_anthropic_async_client_instance() -> AsyncAnthropic:
-    global _global_anthropic_async_client
-    if _global_anthropic_async_client is None:
-        _global_anthropic_async_client = AsyncAnthropic(
-            api_key=DEFAULT_CORE_CONFIG.llm_api_key,
-            base_url=DEFAULT_CORE_CONFIG.llm_base_url,
+def get_anthropic_async_client_instance(
+    base_url: Optional[str] = None, api_key: Optional[str] = None
+) -> AsyncAnthropic:
+    key = (
+        base_url or DEFAULT_CORE_CONFIG.llm_base_url,
+        api_key or DEFAULT_CORE_CONFIG.llm_api_key,
+    )
+    if key not in _anthropic_async_clients:
+        _anthropic_async_clients[key] = AsyncAnthropic(
+            api_key=key[1],
+            base_url=key[0],
         )
-    return _global_anthropic_async_client
+    return _anthropic_async_clients[key]
@@ -0,0 +1,129 @@
+import asyncio
+import math
+from collections import deque
+from time import perf_counter
+from typing import Awaitable, Callable, Hashable, Optional
+from opentelemetry import metrics
+from ...env import LOG, DEFAULT_CORE_CONFIG
+from ...schema.config import LLMRoute
+from ...schema.llm import LLMResponse
+
+_meter = metrics.get_meter(__name__)
+_LLM_LATENCY = _meter.create_histogram(
+    "acontext.llm.latency",
+    unit="s",
+    description="Latency of successful LLM completions, by sdk and model",
+)
+_LLM_HEDGES = _meter.create_counter(
+    "acontext.llm.hedges",
+    description="Extra LLM attempts started, by reason (slow, error)",
+)
+
+
+def route_key(route: LLMRoute) -> Hashable:
+    return (route.sdk, route.model, route.base_url)
+
+
+class LatencyTracker:
+    """Recent latencies of the successful completions of each route."""
+
+    def __init__(self, window: int = 256):
+        self.window = window
+        self._samples: dict[Hashable, deque[float]] = {}
+
+    def observe(self, route: LLMRoute, seconds: float) -> None:
+        key = route_key(route)
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window)
+        self._samples[key].append(seconds)
+        _LLM_LATENCY.record(
+            seconds, {"llm.sdk": route.sdk, "llm.model": route.model or "..."}
+        )
+
+    def quantile(
+        self, route: LLMRoute, q: float, min_samples: int = 1
+    ) -> Optional[float]:
+        samples = self._samples.get(route_key(route))
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+LLM_LATENCY = LatencyTracker()
+
+
+def hedge_delay(
+    route: LLMRoute, tracker: LatencyTracker = LLM_LATENCY
+) -> Optional[float]:
+    """Seconds to wait for `route` before hedging, None when hedging is off."""
+    if not DEFAULT_CORE_CONFIG.llm_hedge_enabled:
+        return None
+    delay = tracker.quantile(
+        route,
+        DEFAULT_CORE_CONFIG.llm_hedge_latency_quantile,
+        DEFAULT_CORE_CONFIG.llm_hedge_min_samples,
+    )
+    if delay is None:
+        delay = DEFAULT_CORE_CONFIG.llm_hedge_initial_delay_seconds
+    return max(delay, DEFAULT_CORE_CONFIG.llm_hedge_min_delay_seconds)
+
+
+async def race_routes(
+    routes: list[LLMRoute],
+    attempt: Callable[[LLMRoute], Awaitable[LLMResponse]],
+    delay_of: Callable[[LLMRoute], Optional[float]] = hedge_delay,
+) -> LLMResponse:
+    """
+    Try `routes` in order and return the first successful response.
+
+    The next route starts right away when an attempt fails, or when the latest
+    attempt runs longer than `delay_of(route)` (a hedge). Attempts still running
+    once one succeeds are cancelled. Raises the last error if every route fails.
+    """
+    assert routes, "At least one route is required"
+    pending: dict[asyncio.Task, LLMRoute] = {}
+    next_index = 0
+    launched_at = 0.0
+    last_error: Optional[BaseException] = None
+
+    def launch() -> None:
+        nonlocal next_index, launched_at
+        route = routes[next_index]
+        next_index += 1
+        launched_at = perf_counter()
+        pending[asyncio.create_task(attempt(route))] = route
+
+    launch()
+    try:
+        while pending:
+            timeout = None
+            if next_index < len(routes):
+                delay = delay_of(routes[next_index - 1])
+                if delay is not None:
+                    timeout = max(0, delay - (perf_counter() - launched_at))
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                LOG.info(
+                    f"LLM {routes[next_index - 1].sdk} is slow, hedge with {routes[next_index].sdk}"
+                )
+                _LLM_HEDGES.add(1, {"reason": "slow"})
+                launch()
+                continue
+            for task in done:
+                route = pending.pop(task)
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+                LOG.warning(f"LLM {route.sdk} {route.model} failed: {last_error}")
+                if next_index < len(routes):
+                    _LLM_HEDGES.add(1, {"reason": "error"})
+                    launch()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    raise last_error
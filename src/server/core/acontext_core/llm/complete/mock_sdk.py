@@ -1,5 +1,6 @@
+import asyncio
 import json
-from typing import Optional
+from typing import Callable, Optional
 from time import perf_counter
 from pydantic import BaseModel
 from ...env import LOG
@@ -30,6 +31,10 @@ async def mock_complete(
     - If prompt contains "Simple Hello" -> Return "Hello World"
     - If prompt contains "CALL_TOOL_DISK_LIST" -> Return structured tool call JSON for disk.list
     - Otherwise return a generic response
+
+    The model name simulates a provider, for hedging and fallback tests:
+    - "mock-sleep-<seconds>" -> Answer after <seconds>
+    - "mock-error" -> Raise an error
     """
     # Safe handling of mutable default arguments
     history_messages = history_messages or []
@@ -37,6 +42,11 @@ async def mock_complete(
     prompt_id = prompt_kwargs.get("prompt_id", "mock-prompt")
     
     start_time = perf_counter()
+
+    if model == "mock-error":
+        raise RuntimeError("Mock LLM error")
+    if model and model.startswith("mock-sleep-"):
+        await asyncio.sleep(float(model.removeprefix("mock-sleep-")))
     
     # Combine all text content to check for patterns
     full_text = ""
@@ -88,4 +98,16 @@ async def mock_complete(
         raw_response=MockRawResponse(mock=True, content=content, tool_calls=tool_calls),  # Required field
         content=content,
         tool_calls=tool_calls,
-    )
\ No newline at end of file
+    )
+
+async def mock_complete_stream(
+    prompt=None,
+    on_tool_call: Optional[Callable[[LLMToolCall], None]] = None,
+    **kwargs,
+) -> LLMResponse:
+    """Mock streaming: answers like mock_complete, then hands out its tool calls."""
+    response = await mock_complete(prompt, **kwargs)
+    for tool_call in response.tool_calls or []:
+        if on_tool_call is not None:
+            on_tool_call(tool_call)
+    return response
@@ -1,11 +1,11 @@
 import json
-from typing import Optional
+from typing import Callable, Optional
 from .clients import get_openai_async_client_instance
 from openai.types.chat import ChatCompletion
 from openai.types.chat import ChatCompletionMessageToolCall
 from time import perf_counter
 from ...env import LOG, DEFAULT_CORE_CONFIG
-from ...schema.llm import LLMResponse
+from ...schema.llm import LLMResponse, LLMToolCall, LLMUsage
 
 
 def convert_openai_tool_to_llm_tool(tool_body: ChatCompletionMessageToolCall) -> dict:
@@ -19,51 +19,101 @@ def convert_openai_tool_to_llm_tool(tool_body: ChatCompletionMessageToolCall) ->
     }
 
 
-async def openai_complete(
-    prompt=None,
-    model=None,
-    system_prompt=None,
-    history_messages=[],
-    json_mode=False,
-    max_tokens=1024,
-    prompt_kwargs: Optional[dict] = None,
-    tools=None,
-    **kwargs,
-) -> LLMResponse:
-    prompt_kwargs = prompt_kwargs or {}
-    prompt_id = prompt_kwargs.get("prompt_id", "...")
+def strip_cache_control(messages: list[dict]) -> list[dict]:
+    """Drop the Anthropic cache breakpoints of content blocks, OpenAI caches prefixes by itself."""
+    new_messages = []
+    for m in messages:
+        if isinstance(m, dict) and isinstance(m.get("content"), list):
+            m = {
+                **m,
+                "content": [
+                    (
+                        {k: v for k, v in b.items() if k != "cache_control"}
+                        if isinstance(b, dict)
+                        else b
+                    )
+                    for b in m["content"]
+                ],
+            }
+        new_messages.append(m)
+    return new_messages
+
+
+def convert_anthropic_assistant_message(message: dict) -> dict:
+    """Turn an assistant message with Anthropic content blocks into the OpenAI format."""
+    text = "".join(
+        b.get("text", "") for b in message["content"] if b.get("type") == "text"
+    )
+    tool_calls = [
+        {
+            "id": b["id"],
+            "type": "function",
+            "function": {"name": b["name"], "arguments": json.dumps(b["input"])},
+        }
+        for b in message["content"]
+        if b.get("type") == "tool_use"
+    ]
+    new_message = {"role": "assistant", "content": text or None}
+    if tool_calls:
+        new_message["tool_calls"] = tool_calls
+    return new_message
 
-    openai_async_client = get_openai_async_client_instance()
 
+def _prepare_request(
+    prompt, system_prompt, history_messages, json_mode, prompt_kwargs, kwargs
+) -> list[dict]:
+    """Build the messages, and set the request options of `kwargs` in place."""
     if json_mode:
         kwargs["response_format"] = {"type": "json_object"}
+    if DEFAULT_CORE_CONFIG.llm_prompt_cache_enabled:
+        # Route the requests sharing a prompt prefix to the same cache
+        kwargs.setdefault(
+            "prompt_cache_key",
+            prompt_kwargs.get(
+                "prompt_cache_key", prompt_kwargs.get("prompt_id", "...")
+            ),
+        )
 
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
-    messages.extend(history_messages)
+    messages.extend(
+        (
+            convert_anthropic_assistant_message(m)
+            if isinstance(m, dict)
+            and m.get("role") == "assistant"
+            and isinstance(m.get("content"), list)
+            else m
+        )
+        for m in history_messages
+    )
     if prompt:
         messages.append({"role": "user", "content": prompt})
 
     if not messages:
         raise ValueError("No messages provided")
+    return strip_cache_control(messages)
 
-    _start_s = perf_counter()
-    response: ChatCompletion = await openai_async_client.chat.completions.create(
-        model=model,
-        messages=messages,
-        timeout=DEFAULT_CORE_CONFIG.llm_response_timeout,
-        max_tokens=max_tokens,
-        tools=tools,
-        **DEFAULT_CORE_CONFIG.llm_openai_completion_kwargs,
-        **kwargs,
-    )
-    _end_s = perf_counter()
-    cached_tokens = getattr(response.usage.prompt_tokens_details, "cached_tokens", None)
+
+def _to_llm_response(
+    response: ChatCompletion, json_mode: bool, prompt_id: str, model, elapsed: float
+) -> LLMResponse:
+    usage = None
+    cached_tokens = None
+    if response.usage is not None:
+        cached_tokens = getattr(
+            response.usage.prompt_tokens_details, "cached_tokens", None
+        )
+        usage = LLMUsage(
+            input_tokens=response.usage.prompt_tokens,
+            output_tokens=response.usage.completion_tokens,
+            cached_tokens=cached_tokens or 0,
+        )
     LOG.info(
         f"LLM Complete: {prompt_id} {model}. "
-        f"cached {cached_tokens}, input {response.usage.prompt_tokens}, total {response.usage.total_tokens}, "
-        f"time {_end_s - _start_s:.4f}s"
+        f"cached {cached_tokens}, input {usage and usage.input_tokens}, "
+        f"total {usage and usage.input_tokens + usage.output_tokens}, "
+        f"time {elapsed:.4f}s"
     )
 
     # Only support tool calls
@@ -81,6 +131,7 @@ async def openai_complete(
         raw_response=response,
         content=response.choices[0].message.content,
         tool_calls=_tu,
+        usage=usage,
     )
 
     if json_mode:
@@ -92,3 +143,151 @@ async def openai_complete(
         llm_response.json_content = json_content
 
     return llm_response
+
+
+async def openai_complete(
+    prompt=None,
+    model=None,
+    system_prompt=None,
+    history_messages=[],
+    json_mode=False,
+    max_tokens=1024,
+    prompt_kwargs: Optional[dict] = None,
+    tools=None,
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    **kwargs,
+) -> LLMResponse:
+    prompt_kwargs = prompt_kwargs or {}
+    prompt_id = prompt_kwargs.get("prompt_id", "...")
+
+    openai_async_client = get_openai_async_client_instance(base_url, api_key)
+    messages = _prepare_request(
+        prompt, system_prompt, history_messages, json_mode, prompt_kwargs, kwargs
+    )
+
+    _start_s = perf_counter()
+    response: ChatCompletion = await openai_async_client.chat.completions.create(
+        model=model,
+        messages=messages,
+        timeout=DEFAULT_CORE_CONFIG.llm_response_timeout,
+        max_tokens=max_tokens,
+        tools=tools,
+        **DEFAULT_CORE_CONFIG.llm_openai_completion_kwargs,
+        **kwargs,
+    )
+    _end_s = perf_counter()
+    return _to_llm_response(response, json_mode, prompt_id, model, _end_s - _start_s)
+
+
+async def openai_complete_stream(
+    prompt=None,
+    model=None,
+    system_prompt=None,
+    history_messages=[],
+    json_mode=False,
+    max_tokens=1024,
+    prompt_kwargs: Optional[dict] = None,
+    tools=None,
+    on_tool_call: Optional[Callable[[LLMToolCall], None]] = None,
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    **kwargs,
+) -> LLMResponse:
+    """
+    Like openai_complete, but streams the response and calls `on_tool_call`
+    for each tool call as soon as its arguments are complete, i.e. when the
+    next tool call starts or the choice finishes.
+    """
+    prompt_kwargs = prompt_kwargs or {}
+    prompt_id = prompt_kwargs.get("prompt_id", "...")
+
+    openai_async_client = get_openai_async_client_instance(base_url, api_key)
+    messages = _prepare_request(
+        prompt, system_prompt, history_messages, json_mode, prompt_kwargs, kwargs
+    )
+
+    _start_s = perf_counter()
+    stream = await openai_async_client.chat.completions.create(
+        model=model,
+        messages=messages,
+        timeout=DEFAULT_CORE_CONFIG.llm_response_timeout,
+        max_tokens=max_tokens,
+        tools=tools,
+        stream=True,
+        stream_options={"include_usage": True},
+        **DEFAULT_CORE_CONFIG.llm_openai_completion_kwargs,
+        **kwargs,
+    )
+    completion = {"id": "", "created": 0, "model": model or ""}
+    content_parts = []
+    finish_reason = None
+    usage = None
+    tool_calls: dict[int, dict] = {}
+    emitted: set[int] = set()
+
+    def emit_until(index: Optional[int]) -> None:
+        for i in sorted(tool_calls):
+            if (index is not None and i >= index) or i in emitted:
+                continue
+            emitted.add(i)
+            if on_tool_call is not None:
+                on_tool_call(
+                    LLMToolCall.model_validate(
+                        convert_openai_tool_to_llm_tool(
+                            ChatCompletionMessageToolCall.model_validate(tool_calls[i])
+                        )
+                    )
+                )
+
+    async for chunk in stream:
+        completion.update(id=chunk.id, created=chunk.created, model=chunk.model)
+        if chunk.usage is not None:
+            usage = chunk.usage.model_dump()
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        finish_reason = choice.finish_reason or finish_reason
+        if choice.delta.content:
+            content_parts.append(choice.delta.content)
+        for delta in choice.delta.tool_calls or []:
+            call = tool_calls.setdefault(
+                delta.index,
+                {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                },
+            )
+            if delta.id:
+                call["id"] = delta.id
+            if delta.function is not None:
+                call["function"]["name"] += delta.function.name or ""
+                call["function"]["arguments"] += delta.function.arguments or ""
+            # The earlier tool calls are complete once a later one starts
+            emit_until(delta.index)
+        if choice.finish_reason:
+            emit_until(None)
+    emit_until(None)
+    _end_s = perf_counter()
+
+    response = ChatCompletion.model_validate(
+        {
+            **completion,
+            "object": "chat.completion",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": finish_reason or "stop",
+                    "message": {
+                        "role": "assistant",
+                        "content": "".join(content_parts) or None,
+                        "tool_calls": [tool_calls[i] for i in sorted(tool_calls)]
+                        or None,
+                    },
+                }
+            ],
+            "usage": usage,
+        }
+    )
+    return _to_llm_response(response, json_mode, prompt_id, model, _end_s - _start_s)
@@ -0,0 +1,246 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Hashable, Optional
+from ...env import LOG, DEFAULT_CORE_CONFIG
+
+GLOBAL_KEY = "__global__"
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute, up to a minute's worth.
+    The level may go negative when a reservation is corrected upwards.
+    """
+
+    def __init__(self, per_minute: float):
+        assert per_minute > 0, "per_minute must be positive"
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.level = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(
+            self.capacity, self.level + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken, 0 if it can be taken now."""
+        self._refill(now)
+        # Requests larger than the capacity only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    tokens: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class LLMScheduler:
+    """
+    Admits LLM calls under a global concurrency limit and optional request/token
+    per-minute budgets, both global and per project.
+
+    Waiting calls are queued per project and served round-robin across projects,
+    so a burst from one project doesn't starve the others. A project whose own
+    budget is spent is skipped until it refills.
+
+    The scheduler is saturated when `saturation_queue_size` calls are waiting,
+    MQ consumers wait on `wait_until_unsaturated` before taking more deliveries.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        project_requests_per_minute: Optional[int] = None,
+        project_tokens_per_minute: Optional[int] = None,
+        saturation_queue_size: int = 32,
+    ):
+        assert max_concurrency > 0, "max_concurrency must be positive"
+        self.max_concurrency = max_concurrency
+        self.saturation_queue_size = saturation_queue_size
+        self._rpm = requests_per_minute
+        self._tpm = tokens_per_minute
+        self._project_rpm = project_requests_per_minute
+        self._project_tpm = project_tokens_per_minute
+        self._request_buckets: dict[Hashable, TokenBucket] = {}
+        self._token_buckets: dict[Hashable, TokenBucket] = {}
+        self._queues: OrderedDict[Hashable, deque[_Waiter]] = OrderedDict()
+        self._in_flight = 0
+        self._waiting = 0
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._unsaturated = asyncio.Event()
+        self._unsaturated.set()
+
+    def _buckets(self, key: Hashable) -> tuple[list[TokenBucket], list[TokenBucket]]:
+        rpm, tpm = (
+            (self._rpm, self._tpm)
+            if key == GLOBAL_KEY
+            else (self._project_rpm, self._project_tpm)
+        )
+        requests, tokens = [], []
+        if rpm:
+            if key not in self._request_buckets:
+                self._request_buckets[key] = TokenBucket(rpm)
+            requests.append(self._request_buckets[key])
+        if tpm:
+            if key not in self._token_buckets:
+                self._token_buckets[key] = TokenBucket(tpm)
+            tokens.append(self._token_buckets[key])
+        return requests, tokens
+
+    def _wait_time(self, key: Hashable, tokens: int, now: float) -> float:
+        requests, token_buckets = self._buckets(key)
+        return max(
+            [b.wait_time(1, now) for b in requests]
+            + [b.wait_time(tokens, now) for b in token_buckets]
+            + [0]
+        )
+
+    def _take(self, key: Hashable, tokens: int) -> None:
+        requests, token_buckets = self._buckets(key)
+        for b in requests:
+            b.take(1)
+        for b in token_buckets:
+            b.take(tokens)
+
+    def _update_saturation(self) -> None:
+        if self._waiting >= self.saturation_queue_size:
+            self._unsaturated.clear()
+        else:
+            self._unsaturated.set()
+
+    def _schedule_dispatch(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        now = time.monotonic()
+        if now < self._paused_until:
+            self._schedule_dispatch(self._paused_until - now)
+            return
+        retry_in = None
+        while self._queues and self._in_flight < self.max_concurrency:
+            granted = False
+            for project in list(self._queues):
+                queue = self._queues[project]
+                while queue and queue[0].future.done():
+                    # Cancelled while waiting
+                    queue.popleft()
+                if not queue:
+                    del self._queues[project]
+                    continue
+                waiter = queue[0]
+                global_wait = self._wait_time(GLOBAL_KEY, waiter.tokens, now)
+                if global_wait > 0:
+                    # Every project is blocked by the global budget
+                    retry_in = global_wait
+                    break
+                project_wait = self._wait_time(project, waiter.tokens, now)
+                if project_wait > 0:
+                    retry_in = min(retry_in or project_wait, project_wait)
+                    continue
+                queue.popleft()
+                self._take(GLOBAL_KEY, waiter.tokens)
+                self._take(project, waiter.tokens)
+                self._in_flight += 1
+                self._waiting -= 1
+                waiter.future.set_result(None)
+                # Round-robin: the served project goes to the back of the line
+                if queue:
+                    self._queues.move_to_end(project)
+                else:
+                    del self._queues[project]
+                granted = True
+                break
+            if not granted:
+                break
+        self._update_saturation()
+        if self._queues and retry_in is not None:
+            self._schedule_dispatch(retry_in)
+
+    @asynccontextmanager
+    async def slot(
+        self, project_id: Optional[Hashable], tokens: int
+    ) -> AsyncIterator[None]:
+        """Wait for the turn of an LLM call estimated to use `tokens` tokens."""
+        project = project_id if project_id is not None else GLOBAL_KEY
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens)
+        self._queues.setdefault(project, deque()).append(waiter)
+        self._waiting += 1
+        self._update_saturation()
+        self._dispatch()
+        try:
+            await waiter.future
+        except BaseException:
+            if not waiter.future.done() or waiter.future.cancelled():
+                self._waiting -= 1
+                self._update_saturation()
+            else:
+                # Granted right when cancelled
+                self._release()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def record_usage(
+        self, project_id: Optional[Hashable], estimated: int, actual: int
+    ) -> None:
+        """Correct the token budgets once the actual usage of a call is known."""
+        project = project_id if project_id is not None else GLOBAL_KEY
+        for key in (GLOBAL_KEY, project):
+            for b in self._buckets(key)[1]:
+                b.take(actual - estimated)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every call for a while, e.g. after the provider rate limited us."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        LOG.warning(f"LLM scheduler paused for {seconds:.1f}s")
+
+    @property
+    def saturated(self) -> bool:
+        return not self._unsaturated.is_set()
+
+    async def wait_until_unsaturated(self) -> None:
+        await self._unsaturated.wait()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "projects_waiting": len(self._queues),
+            "saturated": self.saturated,
+        }
+
+
+LLM_SCHEDULER = LLMScheduler(
+    max_concurrency=DEFAULT_CORE_CONFIG.llm_max_concurrency,
+    requests_per_minute=DEFAULT_CORE_CONFIG.llm_requests_per_minute,
+    tokens_per_minute=DEFAULT_CORE_CONFIG.llm_tokens_per_minute,
+    project_requests_per_minute=DEFAULT_CORE_CONFIG.llm_project_requests_per_minute,
+    project_tokens_per_minute=DEFAULT_CORE_CONFIG.llm_project_tokens_per_minute,
+    saturation_queue_size=DEFAULT_CORE_CONFIG.llm_scheduler_saturation_queue_size,
+)
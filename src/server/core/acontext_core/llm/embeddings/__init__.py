@@ -1,14 +1,19 @@
+import numpy as np
 from typing import Literal
 from traceback import format_exc
 from ...env import LOG, DEFAULT_CORE_CONFIG
 from ...schema.result import Result
 from ...schema.embedding import EmbeddingReturn
+from .batcher import EmbeddingBatcher
+from .cache import EMBEDDING_CACHE, embedding_key
+from .fake_embedding import fake_embedding
 from .jina_embedding import jina_embedding
 from .openai_embedding import openai_embedding
 
 FACTORIES = {
     "openai": openai_embedding,
     "jina": jina_embedding,
+    "fake": fake_embedding,
 }
 assert (
     DEFAULT_CORE_CONFIG.block_embedding_provider in FACTORIES
@@ -30,18 +35,58 @@ async def embedding_sanity_check():
     LOG.info(f"Embedding dimension matched with Config: {embedding_dim}")
 
 
+async def _provider_embedding(
+    model: str, texts: list[str], phase: Literal["query", "document"]
+) -> EmbeddingReturn:
+    return await FACTORIES[DEFAULT_CORE_CONFIG.block_embedding_provider](
+        model, texts, phase
+    )
+
+
+EMBEDDING_BATCHER = EmbeddingBatcher(
+    _provider_embedding,
+    EMBEDDING_CACHE,
+    max_size=DEFAULT_CORE_CONFIG.block_embedding_batch_max_size,
+    max_wait_ms=DEFAULT_CORE_CONFIG.block_embedding_batch_max_wait_ms,
+    max_concurrency=DEFAULT_CORE_CONFIG.block_embedding_max_concurrency,
+)
+
+
 async def get_embedding(
     texts: list[str],
     phase: Literal["query", "document"] = "document",
     model: str = None,
 ) -> Result[EmbeddingReturn]:
+    """
+    Embed `texts`, one row per text. Cached texts are not sent to the provider,
+    the others are batched with the texts of concurrent calls.
+
+    The token counts only cover this call's share of the provider calls.
+    """
     model = model or DEFAULT_CORE_CONFIG.block_embedding_model
     provider = DEFAULT_CORE_CONFIG.block_embedding_provider
+    dim = DEFAULT_CORE_CONFIG.block_embedding_dim
+    keys = [embedding_key(provider, model, dim, phase, text) for text in texts]
     try:
-        results = await FACTORIES[provider](
-            model, texts, phase
+        unique = dict(zip(keys, texts))
+        embedded = dict(
+            zip(
+                unique,
+                await EMBEDDING_BATCHER.embed(model, phase, dim, list(unique.items())),
+            )
         )
     except Exception as e:
         LOG.error(f"Error in get_embedding: {e} {format_exc()}")
         return Result.reject(f"Error in get_embedding: {e}")
-    return Result.resolve(results)
+    embedding = (
+        np.stack([embedded[key].vector for key in keys])
+        if keys
+        else np.empty((0, dim), dtype=np.float32)
+    )
+    return Result.resolve(
+        EmbeddingReturn(
+            embedding=embedding,
+            prompt_tokens=round(sum(e.prompt_tokens for e in embedded.values())),
+            total_tokens=round(sum(e.total_tokens for e in embedded.values())),
+        )
+    )
@@ -0,0 +1,137 @@
+import asyncio
+import numpy as np
+from typing import Awaitable, Callable, NamedTuple
+from ...env import LOG
+from ...schema.embedding import EmbeddingReturn
+from .cache import EmbeddingCache
+
+EMBED_FUNC = Callable[[str, list[str], str], Awaitable[EmbeddingReturn]]
+
+
+class EmbeddedText(NamedTuple):
+    vector: np.ndarray
+    # The text's share of its batch's tokens by length, 0 when it was cached
+    prompt_tokens: float
+    total_tokens: float
+
+
+class EmbeddingBatcher:
+    """
+    Embeds texts through `cache`, merging the cache misses of concurrent
+    requests into provider calls of at most `max_size` texts. A batch waits up
+    to `max_wait_ms` to fill up, and is looked up in Redis as a whole before
+    the provider is called.
+
+    A text already queued or in flight is not sent again, the requests share
+    its result. At most `max_concurrency` provider calls run at once.
+    """
+
+    def __init__(
+        self,
+        embed: EMBED_FUNC,
+        cache: EmbeddingCache,
+        max_size: int,
+        max_wait_ms: int,
+        max_concurrency: int,
+    ):
+        assert max_size > 0, "max_size must be positive"
+        self._embed = embed
+        self.cache = cache
+        self.max_size = max_size
+        self.max_wait_ms = max_wait_ms
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Batches are keyed by (model, phase, dim) and hold (cache key, text)
+        self._queues: dict[tuple, list[tuple[str, str]]] = {}
+        self._timers: dict[tuple, asyncio.TimerHandle] = {}
+        self._futures: dict[str, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def embed(
+        self, model: str, phase: str, dim: int, items: list[tuple[str, str]]
+    ) -> list[EmbeddedText]:
+        """Embed the (cache key, text) `items`, in order."""
+        loop = asyncio.get_running_loop()
+        batch_key = (model, phase, dim)
+        futures = []
+        for key, text in items:
+            vector = self.cache.get_local(key)
+            if vector is not None:
+                futures.append(_done(loop, EmbeddedText(vector, 0, 0)))
+                continue
+            future = self._futures.get(key)
+            if future is None:
+                future = self._futures[key] = loop.create_future()
+                queue = self._queues.setdefault(batch_key, [])
+                queue.append((key, text))
+                if len(queue) >= self.max_size:
+                    self._flush(batch_key)
+                elif batch_key not in self._timers:
+                    self._timers[batch_key] = loop.call_later(
+                        self.max_wait_ms / 1000, self._flush, batch_key
+                    )
+            futures.append(future)
+        # Shielded, a cancelled request must not cancel the texts of the others
+        return list(await asyncio.gather(*[asyncio.shield(f) for f in futures]))
+
+    def _flush(self, batch_key: tuple) -> None:
+        timer = self._timers.pop(batch_key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._queues.pop(batch_key, [])
+        if not items:
+            return
+        task = asyncio.create_task(self._run(batch_key, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch_key: tuple, items: list[tuple[str, str]]) -> None:
+        model, phase, dim = batch_key
+        results: dict[str, EmbeddedText] = {}
+        try:
+            cached = await self.cache.get_many([key for key, _ in items])
+            for key, vector in cached.items():
+                results[key] = EmbeddedText(vector, 0, 0)
+            missing = [(key, text) for key, text in items if key not in cached]
+            if missing:
+                texts = [text for _, text in missing]
+                async with self._semaphore:
+                    result = await self._embed(model, texts, phase)
+                if result.embedding.shape != (len(texts), dim):
+                    raise ValueError(
+                        f"Embedding dimension mismatch! Expected {len(texts)}x{dim}, got {'x'.join(map(str, result.embedding.shape))}."
+                    )
+                lengths = np.array([max(len(t), 1) for t in texts], dtype=np.float64)
+                shares = lengths / lengths.sum()
+                for (key, _), vector, share in zip(missing, result.embedding, shares):
+                    results[key] = EmbeddedText(
+                        vector=vector.astype(np.float32),
+                        prompt_tokens=float((result.prompt_tokens or 0) * share),
+                        total_tokens=float((result.total_tokens or 0) * share),
+                    )
+                await self.cache.set_many(
+                    {key: results[key].vector for key, _ in missing}
+                )
+        except Exception as e:
+            LOG.error(f"Embedding batch of {len(items)} texts failed: {e}")
+            for key, _ in items:
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # From here on the texts are served by the local cache
+        for key, _ in items:
+            future = self._futures.pop(key)
+            if not future.done():
+                future.set_result(results[key])
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(q) for q in self._queues.values()),
+            "in_flight_batches": len(self._tasks),
+        }
+
+
+def _done(loop: asyncio.AbstractEventLoop, value) -> asyncio.Future:
+    future = loop.create_future()
+    future.set_result(value)
+    return future
@@ -0,0 +1,85 @@
+"""
+Content-hash cache of embeddings, so identical texts are embedded once.
+
+Vectors are kept in an in-process LRU and in Redis (``embedding.{hash}``, the
+float32 bytes base64 encoded). Redis is optional: every Redis error is logged
+and the cache falls back to the local LRU.
+"""
+
+import base64
+import hashlib
+import numpy as np
+from typing import Optional
+from ...env import LOG, DEFAULT_CORE_CONFIG
+from ...infra.redis import REDIS_CLIENT
+from ...util.ttl_cache import TTLCache
+
+
+def embedding_key(provider: str, model: str, dim: int, phase: str, text: str) -> str:
+    digest = hashlib.sha256(
+        f"{provider}\0{model}\0{dim}\0{phase}\0{text}".encode("utf-8")
+    ).hexdigest()
+    return f"embedding.{digest}"
+
+
+def _encode(vector: np.ndarray) -> str:
+    return base64.b64encode(vector.astype(np.float32).tobytes()).decode("ascii")
+
+
+def _decode(raw: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(raw), dtype=np.float32)
+
+
+class EmbeddingCache:
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._local: TTLCache[np.ndarray] = TTLCache(maxsize, ttl_seconds)
+
+    def get_local(self, key: str) -> Optional[np.ndarray]:
+        return self._local.get(key)
+
+    async def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        for key in keys:
+            vector = self._local.get(key)
+            if vector is not None:
+                found[key] = vector
+        missing = [key for key in keys if key not in found]
+        if not missing:
+            return found
+        try:
+            async with REDIS_CLIENT.get_client_context() as client:
+                raws = await client.mget(missing)
+        except Exception as e:
+            LOG.warning(f"Embedding cache unavailable: {e}")
+            return found
+        for key, raw in zip(missing, raws):
+            if raw is None:
+                continue
+            vector = _decode(raw)
+            self._local.set(key, vector)
+            found[key] = vector
+        return found
+
+    async def set_many(self, vectors: dict[str, np.ndarray]) -> None:
+        for key, vector in vectors.items():
+            self._local.set(key, vector)
+        if not vectors:
+            return
+        try:
+            async with REDIS_CLIENT.get_client_context() as client:
+                async with client.pipeline(transaction=False) as pipe:
+                    for key, vector in vectors.items():
+                        pipe.set(key, _encode(vector), ex=self.ttl_seconds)
+                    await pipe.execute()
+        except Exception as e:
+            LOG.warning(f"Failed to cache embeddings: {e}")
+
+    def stats(self) -> dict:
+        return {"local_hits": self._local.hits, "local_misses": self._local.misses}
+
+
+EMBEDDING_CACHE = EmbeddingCache(
+    maxsize=DEFAULT_CORE_CONFIG.block_embedding_cache_size,
+    ttl_seconds=DEFAULT_CORE_CONFIG.block_embedding_cache_ttl_seconds,
+)
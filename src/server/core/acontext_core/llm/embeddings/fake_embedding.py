@@ -0,0 +1,29 @@
+import hashlib
+import numpy as np
+from typing import Literal
+from ...env import DEFAULT_CORE_CONFIG
+from ...schema.embedding import EmbeddingReturn
+
+
+def fake_vector(text: str, dim: int) -> np.ndarray:
+    """A unit vector seeded by the text, identical texts get identical vectors."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+async def fake_embedding(
+    model: str, texts: list[str], phase: Literal["query", "document"] = "document"
+) -> EmbeddingReturn:
+    """Deterministic local provider for tests and offline development."""
+    tokens = sum(len(text.split()) for text in texts)
+    return EmbeddingReturn(
+        embedding=np.stack(
+            [
+                fake_vector(text, DEFAULT_CORE_CONFIG.block_embedding_dim)
+                for text in texts
+            ]
+        ),
+        prompt_tokens=tokens,
+        total_tokens=tokens,
+    )
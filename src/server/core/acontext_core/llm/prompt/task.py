@@ -71,20 +71,43 @@ Before calling `finish`, verify all actions are covered.
 """
 
     @classmethod
-    def pack_task_input(
+    def pack_task_input_blocks(
         cls, previous_progress: str, current_message_with_ids: str, current_tasks: str
-    ) -> str:
-        return f"""## Current Existing Tasks:
+    ) -> list[dict]:
+        """
+        The task input as text blocks. The task list changes least between runs, so
+        it comes first and ends the cacheable prompt prefix.
+        """
+        return [
+            {
+                "type": "text",
+                "text": f"""## Current Existing Tasks:
 {current_tasks}
 
-## Previous Progress:
+""",
+                "cache_control": {"type": "ephemeral"},
+            },
+            {
+                "type": "text",
+                "text": f"""## Previous Progress:
 {previous_progress}
 
 ## Current Message with IDs:
 {current_message_with_ids}
 
 Please analyze the above information and determine the actions.
-"""
+""",
+            },
+        ]
+
+    @classmethod
+    def pack_task_input(
+        cls, previous_progress: str, current_message_with_ids: str, current_tasks: str
+    ) -> str:
+        blocks = cls.pack_task_input_blocks(
+            previous_progress, current_message_with_ids, current_tasks
+        )
+        return "".join(b["text"] for b in blocks)
 
     @classmethod
     def prompt_kwargs(cls) -> str:
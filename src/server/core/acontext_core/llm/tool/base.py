@@ -1,13 +1,28 @@
-from dataclasses import dataclass
-from typing import Callable, Awaitable
+from dataclasses import dataclass, field
+from typing import Callable, Awaitable, Optional
 from ...schema.llm import ToolSchema
 from ...schema.result import Result
 
 
+@dataclass(frozen=True)
+class ToolAccess:
+    """Resources a tool call reads and writes, used to decide what may run concurrently."""
+
+    reads: frozenset[str] = field(default_factory=frozenset)
+    writes: frozenset[str] = field(default_factory=frozenset)
+
+    def conflicts_with(self, other: "ToolAccess") -> bool:
+        return bool(
+            self.writes & (other.reads | other.writes) or self.reads & other.writes
+        )
+
+
 @dataclass
 class Tool:
     schema: ToolSchema = None
     handler: Callable[..., Awaitable[Result[str]]] = None
+    # None means the call may conflict with any other call
+    access: Optional[Callable[[dict], ToolAccess]] = None
 
     def use_schema(self, schema: ToolSchema) -> "Tool":
         self.schema = schema
@@ -17,5 +32,9 @@ class Tool:
         self.handler = handler
         return self
 
+    def use_access(self, access: Callable[[dict], ToolAccess]) -> "Tool":
+        self.access = access
+        return self
+
 
 ToolPool = dict[str, Tool]
@@ -0,0 +1,78 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Optional, Sequence, TypeVar
+from ...schema.result import Result
+from .base import ToolAccess
+
+T = TypeVar("T")
+
+
+def _conflicts(a: Optional[ToolAccess], b: Optional[ToolAccess]) -> bool:
+    if a is None or b is None:
+        return True
+    return a.conflicts_with(b)
+
+
+class ToolCallRunner(Generic[T]):
+    """
+    Starts tool calls as they are submitted, e.g. while the LLM is still
+    streaming the later ones, with the ordering rules of run_tool_calls.
+    """
+
+    def __init__(
+        self,
+        access: Callable[[T], Optional[ToolAccess]],
+        run: Callable[[T], Awaitable[Result[str]]],
+    ):
+        self._access = access
+        self._run_call = run
+        self._accesses: list[Optional[ToolAccess]] = []
+        self._tasks: list[asyncio.Task] = []
+        self._failed: Optional[int] = None
+
+    def submit(self, call: T) -> None:
+        self._accesses.append(self._access(call))
+        self._tasks.append(asyncio.create_task(self._run(len(self._tasks), call)))
+
+    async def _run(self, i: int, call: T) -> Result[str]:
+        for j in range(i):
+            if not _conflicts(self._accesses[i], self._accesses[j]):
+                continue
+            if not (await self._tasks[j]).ok():
+                return Result.reject(
+                    f"Tool call {i} skipped, it depends on the failed tool call {j}"
+                )
+        if self._failed is not None:
+            return Result.reject(
+                f"Tool call {i} skipped, the tool call {self._failed} failed"
+            )
+        try:
+            r = await self._run_call(call)
+        except Exception as e:
+            r = Result.reject(f"Tool call {i} error: {str(e)}")
+        if not r.ok() and self._failed is None:
+            self._failed = i
+        return r
+
+    async def results(self) -> list[Result[str]]:
+        """Wait for every submitted call, the results are in submission order."""
+        return list(await asyncio.gather(*self._tasks))
+
+
+async def run_tool_calls(
+    calls: Sequence[T],
+    access: Callable[[T], Optional[ToolAccess]],
+    run: Callable[[T], Awaitable[Result[str]]],
+) -> list[Result[str]]:
+    """
+    Run tool calls concurrently, except that a call waits for every earlier call
+    it conflicts with, so conflicting calls keep the order the LLM gave them.
+    Once a call fails, the calls that haven't started yet are skipped. The
+    calls already running still finish and commit their changes.
+
+    Returns:
+        The results in the order of `calls`
+    """
+    runner = ToolCallRunner(access, run)
+    for call in calls:
+        runner.submit(call)
+    return await runner.results()
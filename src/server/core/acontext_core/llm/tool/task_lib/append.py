@@ -1,9 +1,9 @@
-from ..base import Tool
+from ..base import Tool, ToolAccess
 from ....schema.llm import ToolSchema
 from ....schema.result import Result
 from ....service.data import task as TD
 from ....schema.session.task import TaskStatus
-from .ctx import TaskCtx
+from .ctx import TaskCtx, TASK_ORDERING, task_key, message_key
 
 
 async def _append_messages_to_task_handler(
@@ -45,23 +45,38 @@ async def _append_messages_to_task_handler(
     )
     if not r.ok():
         return r
+    ctx.apply_messages_moved(actually_message_ids, actually_task_id)
     if progress_note is not None:
         r = await TD.append_progress_to_task(
             ctx.db_session, actually_task_id, progress_note, user_preference or None
         )
         if not r.ok():
             return r
+        ctx.apply_progress(actually_task_id, progress_note, user_preference or None)
     if actually_task.status != TaskStatus.RUNNING:
         r = await TD.update_task(
             ctx.db_session,
             actually_task_id,
             status="running",
         )
+        if not r.ok():
+            return r
+        ctx.apply_update(actually_task_id, status=TaskStatus.RUNNING)
     return Result.resolve(
         f"Messages {message_order_indexes} and progress are appended to task {task_order}"
     )
 
 
+def _append_messages_to_task_access(llm_arguments: dict) -> ToolAccess:
+    return ToolAccess(
+        reads=frozenset({TASK_ORDERING}),
+        writes=frozenset(
+            [task_key(llm_arguments.get("task_order"))]
+            + [message_key(i) for i in llm_arguments.get("message_ids", [])]
+        ),
+    )
+
+
 _append_messages_to_task_tool = (
     Tool()
     .use_schema(
@@ -99,4 +114,5 @@ _append_messages_to_task_tool = (
         )
     )
     .use_handler(_append_messages_to_task_handler)
+    .use_access(_append_messages_to_task_access)
 )
@@ -1,8 +1,8 @@
-from ..base import Tool
+from ..base import Tool, ToolAccess
 from ....schema.llm import ToolSchema
 from ....schema.result import Result
 from ....service.data import task as TD
-from .ctx import TaskCtx
+from .ctx import TaskCtx, PLANNING_SECTION, message_key
 
 
 async def _append_messages_to_planning_section_handler(
@@ -25,10 +25,21 @@ async def _append_messages_to_planning_section_handler(
         ctx.session_id,
         actually_message_ids,
     )
-    return (
-        Result.resolve(f"Messages {message_order_indexes} appended to planning section")
-        if r.ok()
-        else r
+    if not r.ok():
+        return r
+    ctx.apply_messages_moved(actually_message_ids, None)
+    return Result.resolve(
+        f"Messages {message_order_indexes} appended to planning section"
+    )
+
+
+def _append_messages_to_planning_section_access(llm_arguments: dict) -> ToolAccess:
+    # The first append creates the planning section
+    return ToolAccess(
+        writes=frozenset(
+            [PLANNING_SECTION]
+            + [message_key(i) for i in llm_arguments.get("message_ids", [])]
+        ),
     )
 
 
@@ -55,4 +66,5 @@ Use this when messages are about the agent/user is planning general plan, and th
         )
     )
     .use_handler(_append_messages_to_planning_section_handler)
+    .use_access(_append_messages_to_planning_section_access)
 )
@@ -1,14 +1,111 @@
 from dataclasses import dataclass
+from typing import Optional
 from ....infra.db import AsyncSession
 from ....schema.utils import asUUID
-from ....schema.session.task import TaskSchema
+from ....schema.session.task import TaskSchema, TaskStatus, TaskMutation
+from ....service.data.task import replay_task_mutations
+
+# Access keys of task tool calls, see ToolAccess
+TASK_ORDERING = "task.ordering"
+PLANNING_SECTION = "task.planning"
+
+
+def task_key(task_order: int) -> str:
+    return f"task.{task_order}"
+
+
+def message_key(message_index: int) -> str:
+    return f"message.{message_index}"
 
 
 @dataclass
 class TaskCtx:
+    """
+    Snapshot of the session's tasks shared by the tool calls of one agent run.
+
+    Mutating tools apply their change here right after it is flushed to the DB,
+    so the snapshot stays in sync without re-querying the tasks.
+    """
+
     db_session: AsyncSession
     project_id: asUUID
     session_id: asUUID
     task_ids_index: list[asUUID]
     task_index: list[TaskSchema]
     message_ids_index: list[asUUID]
+
+    def reset_tasks(self, tasks: list[TaskSchema]) -> None:
+        # In place, copies of this ctx made for concurrent tool calls share the lists
+        self.task_index[:] = tasks
+        self.task_ids_index[:] = [t.id for t in tasks]
+
+    def apply_insert(self, task: TaskSchema, after_order: int) -> None:
+        # Mirror TD.insert_task: orders after `after_order` shift by one
+        position = 0
+        for t in self.task_index:
+            if t.order > after_order:
+                t.order += 1
+            else:
+                position += 1
+        self.task_index.insert(position, task)
+        self.task_ids_index.insert(position, task.id)
+
+    def apply_mutations(
+        self, mutations: list[TaskMutation], inserted: list[TaskSchema]
+    ) -> None:
+        # Mirror TD.apply_task_mutations, which renumbers the tasks to 1..n
+        by_id = {t.id: t for t in self.task_index + inserted}
+        sequence = replay_task_mutations(
+            self.task_ids_index, mutations, [t.id for t in inserted]
+        )
+        tasks = [by_id[task_id] for task_id in sequence]
+        for order, t in enumerate(tasks, start=1):
+            t.order = order
+        self.reset_tasks(tasks)
+
+    def apply_update(
+        self,
+        task_id: asUUID,
+        status: Optional[TaskStatus] = None,
+        description: Optional[str] = None,
+    ) -> None:
+        task = self.task_index[self.task_ids_index.index(task_id)]
+        if status is not None:
+            task.status = TaskStatus(status)
+        if description is not None:
+            task.data.task_description = description
+
+    def apply_progress(
+        self, task_id: asUUID, progress: str, user_preference: Optional[str] = None
+    ) -> None:
+        task = self.task_index[self.task_ids_index.index(task_id)]
+        task.data.progresses = (task.data.progresses or []) + [progress]
+        if user_preference is not None:
+            task.data.user_preferences = (task.data.user_preferences or []) + [
+                user_preference
+            ]
+
+    def apply_messages_moved(
+        self, message_ids: list[asUUID], task_id: Optional[asUUID]
+    ) -> None:
+        """
+        Mirror TD.append_messages_to_task: the messages leave their current task
+        and join `task_id`, which is None for tasks outside the snapshot
+        (e.g. the planning section).
+        """
+        moved = set(message_ids)
+        for t in self.task_index:
+            if t.id == task_id:
+                continue
+            if moved.intersection(t.raw_message_ids):
+                t.raw_message_ids = [m for m in t.raw_message_ids if m not in moved]
+        if task_id is None or task_id not in self.task_ids_index:
+            return
+        task = self.task_index[self.task_ids_index.index(task_id)]
+        # Messages of this run are newer than the already linked ones,
+        # and message_ids_index keeps them in created_at order
+        current = set(self.message_ids_index)
+        linked = moved.union(m for m in task.raw_message_ids if m in current)
+        task.raw_message_ids = [m for m in task.raw_message_ids if m not in current] + [
+            m for m in self.message_ids_index if m in linked
+        ]
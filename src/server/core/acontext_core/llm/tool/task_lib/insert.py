@@ -1,11 +1,26 @@
-import asyncio
-from ..base import Tool
+from ..base import Tool, ToolAccess
 from ....schema.llm import ToolSchema
 from ....schema.result import Result
 from ....service.data import task as TD
+from ....schema.session.task import TaskInsertOp
 from ....constants import MetricTags
 from ....telemetry.capture_metrics import capture_increment
-from .ctx import TaskCtx
+from .ctx import TaskCtx, TASK_ORDERING
+
+
+def _new_task_data(llm_arguments: dict) -> dict:
+    return {
+        "task_description": llm_arguments["task_description"],
+        "user_preferences": [],
+        "progresses": [],
+    }
+
+
+def _capture_new_task(ctx: TaskCtx) -> None:
+    capture_increment(
+        project_id=ctx.project_id,
+        tag=MetricTags.new_task_created,
+    )
 
 
 async def insert_task_handler(ctx: TaskCtx, llm_arguments: dict) -> Result[str]:
@@ -14,22 +29,42 @@ async def insert_task_handler(ctx: TaskCtx, llm_arguments: dict) -> Result[str]:
         ctx.project_id,
         ctx.session_id,
         after_order=llm_arguments["after_task_order"],
-        data={
-            "task_description": llm_arguments["task_description"],
-            "user_preferences": [],
-            "progresses": [],
-        },
+        data=_new_task_data(llm_arguments),
     )
     t, eil = r.unpack()
     if eil:
         return r
-    asyncio.create_task(
-        capture_increment(
-            project_id=ctx.project_id,
-            tag=MetricTags.new_task_created,
+    ctx.apply_insert(t, after_order=llm_arguments["after_task_order"])
+    _capture_new_task(ctx)
+    return Result.resolve(f"Task {t.order} created")
+
+
+async def insert_tasks_handler(
+    ctx: TaskCtx, llm_arguments_list: list[dict]
+) -> Result[list[str]]:
+    """Apply several insert_task calls as one batch of task mutations."""
+    mutations = [
+        TaskInsertOp(
+            after_order=llm_arguments["after_task_order"],
+            data=_new_task_data(llm_arguments),
         )
+        for llm_arguments in llm_arguments_list
+    ]
+    r = await TD.apply_task_mutations(
+        ctx.db_session, ctx.project_id, ctx.session_id, mutations
     )
-    return Result.resolve(f"Task {t.order} created")
+    tasks, eil = r.unpack()
+    if eil:
+        return r
+    ctx.apply_mutations(mutations, tasks)
+    for _ in tasks:
+        _capture_new_task(ctx)
+    return Result.resolve([f"Task {t.order} created" for t in tasks])
+
+
+def _insert_task_access(llm_arguments: dict) -> ToolAccess:
+    # Shifts the order of the following tasks
+    return ToolAccess(writes=frozenset({TASK_ORDERING}))
 
 
 _insert_task_tool = (
@@ -57,4 +92,5 @@ _insert_task_tool = (
         )
     )
     .use_handler(insert_task_handler)
+    .use_access(_insert_task_access)
 )
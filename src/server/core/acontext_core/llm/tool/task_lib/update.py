@@ -1,8 +1,8 @@
-from ..base import Tool
+from ..base import Tool, ToolAccess
 from ....schema.llm import ToolSchema
 from ....schema.result import Result
 from ....service.data import task as TD
-from .ctx import TaskCtx
+from .ctx import TaskCtx, TASK_ORDERING, task_key
 
 
 async def update_task_handler(
@@ -33,10 +33,21 @@ async def update_task_handler(
             else None
         ),
     )
-    t, eil = r.unpack()
+    _, eil = r.unpack()
     if eil:
         return r
-    return Result.resolve(f"Task {t.order} updated")
+    ctx.apply_update(
+        actually_task_id, status=task_status, description=task_description or None
+    )
+    # The returned row has the raw sort key, reply with the order the LLM used
+    return Result.resolve(f"Task {task_order} updated")
+
+
+def _update_task_access(llm_arguments: dict) -> ToolAccess:
+    return ToolAccess(
+        reads=frozenset({TASK_ORDERING}),
+        writes=frozenset({task_key(llm_arguments.get("task_order"))}),
+    )
 
 
 _update_task_tool = (
@@ -72,4 +83,5 @@ Only when the conversation explicitly mention certain task's purpose should be m
         )
     )
     .use_handler(update_task_handler)
+    .use_access(_update_task_access)
 )
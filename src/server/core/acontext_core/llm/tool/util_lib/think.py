@@ -1,5 +1,5 @@
 from typing import Any
-from ..base import Tool
+from ..base import Tool, ToolAccess
 from ....schema.llm import ToolSchema
 from ....schema.result import Result
 from ....env import LOG
@@ -34,4 +34,5 @@ _thinking_tool = (
         )
     )
     .use_handler(_thinking_handler)
+    .use_access(lambda llm_arguments: ToolAccess())
 )
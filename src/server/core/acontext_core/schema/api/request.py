@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Literal
-
+from typing import Literal, Optional
+from ..session.task import TaskStatus, TaskTextKind
+from ..utils import asUUID
 
 SearchMode = Literal["fast", "agentic"]
 
@@ -30,3 +31,17 @@ class SandboxUploadRequest(BaseModel):
     upload_to_sandbox_file: str = Field(
         ..., description="The full path in the sandbox to upload the file to"
     )
+
+
+class TaskSearchRequest(BaseModel):
+    query: str = Field(..., description="What to look for in the project's tasks")
+    top_k: int = Field(10, ge=1, le=100, description="Number of hits to return")
+    session_ids: Optional[list[asUUID]] = Field(
+        None, description="Only search the tasks of these sessions"
+    )
+    kinds: Optional[list[TaskTextKind]] = Field(
+        None, description="Only search these task texts"
+    )
+    statuses: Optional[list[TaskStatus]] = Field(
+        None, description="Only search the tasks in these statuses"
+    )
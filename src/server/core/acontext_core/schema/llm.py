@@ -56,6 +56,13 @@ class LLMToolCall(BaseModel):
     type: Literal["function"]
 
 
+class LLMUsage(BaseModel):
+    # Prompt tokens, including the cached ones
+    input_tokens: int
+    output_tokens: int
+    cached_tokens: int = 0
+
+
 class LLMResponse(BaseModel):
     role: Literal["user", "assistant", "tool"]
     raw_response: BaseModel
@@ -63,3 +70,7 @@ class LLMResponse(BaseModel):
     content: Optional[str] = None
     json_content: Optional[dict] = None
     tool_calls: Optional[list[LLMToolCall]] = None
+    usage: Optional[LLMUsage] = None
+    # The sdk and model that answered, may be a fallback route
+    sdk: Optional[str] = None
+    model: Optional[str] = None
@@ -3,8 +3,10 @@ from .project import Project
 from .session import Session
 from .message import Message, Part, Asset, ToolCallMeta, ToolResultMeta
 from .task import Task
+from .task_embedding import TaskEmbedding
 from .tool_reference import ToolReference
 from .sandbox_log import SandboxLog
+from .sandbox_event import SandboxEvent
 from .metric import Metric
 
 __all__ = [
@@ -17,7 +19,9 @@ __all__ = [
     "ToolResultMeta",
     "Asset",
     "Task",
+    "TaskEmbedding",
     "ToolReference",
     "Metric",
     "SandboxLog",
+    "SandboxEvent",
 ]
@@ -68,6 +68,7 @@ class Message(CommonMixin):
         Index("ix_message_session_id", "session_id"),
         Index("ix_message_parent_id", "parent_id"),
         Index("idx_session_created", "session_id", "created_at"),
+        Index("idx_messages_task_id", "task_id"),
     )
 
     session_id: asUUID = field(
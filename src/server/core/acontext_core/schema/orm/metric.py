@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from sqlalchemy import Column, ForeignKey, Index, BigInteger, String
+from sqlalchemy import Column, ForeignKey, Index, BigInteger, String, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from typing import TYPE_CHECKING
@@ -9,6 +9,9 @@ from ..utils import asUUID
 if TYPE_CHECKING:
     from .project import Project
 
+# UTC day of a metric row, there is one row per project, tag and day
+METRIC_DAY = text("(timezone('UTC', created_at)::date)")
+
 
 @ORM_BASE.mapped
 @dataclass
@@ -19,6 +22,9 @@ class Metric(CommonMixin):
         Index(
             "idx_metric_project_id_tag_created_at", "project_id", "tag", "created_at"
         ),
+        Index(
+            "uq_metric_project_id_tag_day", "project_id", "tag", METRIC_DAY, unique=True
+        ),
     )
 
     project_id: asUUID = field(
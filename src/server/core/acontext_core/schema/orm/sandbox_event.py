@@ -0,0 +1,39 @@
+from dataclasses import dataclass, field
+from sqlalchemy import BigInteger, Column, ForeignKey, Identity, Index, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from .base import ORM_BASE, CommonMixin
+from ..utils import asUUID
+
+
+@ORM_BASE.mapped
+@dataclass
+class SandboxEvent(CommonMixin):
+    """One command run or file generated in a sandbox, appended in batches."""
+
+    __tablename__ = "sandbox_events"
+
+    __table_args__ = (
+        Index("ix_sandbox_event_sandbox_log_id_seq", "sandbox_log_id", "seq"),
+    )
+
+    sandbox_log_id: asUUID = field(
+        metadata={
+            "db": Column(
+                UUID(as_uuid=True),
+                ForeignKey("sandbox_logs.id", ondelete="CASCADE"),
+                nullable=False,
+            )
+        }
+    )
+
+    # command or file
+    kind: str = field(metadata={"db": Column(String, nullable=False)})
+
+    # {"command", "exit_code"} for a command, {"sandbox_path"} for a file
+    payload: dict = field(metadata={"db": Column(JSONB, nullable=False)})
+
+    # Insertion order, events are paged by it
+    seq: int = field(
+        init=False,
+        metadata={"db": Column(BigInteger, Identity(), nullable=False, unique=True)},
+    )
@@ -64,6 +64,7 @@ class Task(CommonMixin):
         }
     )
 
+    # Sparse sort key, the task order shown to users is its dense rank in the session
     order: int = field(metadata={"db": Column(Integer, nullable=False)})
 
     data: dict = field(metadata={"db": Column(JSONB, nullable=False)})
@@ -0,0 +1,78 @@
+from dataclasses import dataclass, field
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from pgvector.sqlalchemy import Vector
+from .base import ORM_BASE, CommonMixin
+from ..utils import asUUID
+from ...env import DEFAULT_CORE_CONFIG
+
+
+@ORM_BASE.mapped
+@dataclass
+class TaskEmbedding(CommonMixin):
+    """One embedded text of a task: its description, a progress or a user preference."""
+
+    __tablename__ = "task_embeddings"
+
+    __table_args__ = (
+        UniqueConstraint(
+            "task_id",
+            "kind",
+            "position",
+            name="uq_task_embedding_task_id_kind_position",
+        ),
+        Index("ix_task_embedding_project_id", "project_id"),
+        Index("ix_task_embedding_session_id", "session_id"),
+        Index(
+            "ix_task_embedding_embedding",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
+
+    project_id: asUUID = field(
+        metadata={
+            "db": Column(
+                UUID(as_uuid=True),
+                ForeignKey("projects.id", ondelete="CASCADE"),
+                nullable=False,
+            )
+        }
+    )
+
+    session_id: asUUID = field(
+        metadata={
+            "db": Column(
+                UUID(as_uuid=True),
+                ForeignKey("sessions.id", ondelete="CASCADE"),
+                nullable=False,
+            )
+        }
+    )
+
+    task_id: asUUID = field(
+        metadata={
+            "db": Column(
+                UUID(as_uuid=True),
+                ForeignKey("tasks.id", ondelete="CASCADE"),
+                nullable=False,
+            )
+        }
+    )
+
+    # task_description, progress or user_preference
+    kind: str = field(metadata={"db": Column(String, nullable=False)})
+
+    # Index in the task's progresses/user_preferences, 0 for the description
+    position: int = field(metadata={"db": Column(Integer, nullable=False)})
+
+    text: str = field(metadata={"db": Column(String, nullable=False)})
+
+    embedding: list[float] = field(
+        metadata={
+            "db": Column(
+                Vector(DEFAULT_CORE_CONFIG.block_embedding_dim), nullable=False
+            )
+        }
+    )
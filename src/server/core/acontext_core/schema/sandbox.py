@@ -1,6 +1,8 @@
 from enum import StrEnum
 from datetime import datetime
+from typing import Literal, Optional
 from pydantic import BaseModel, Field
+from .utils import asUUID
 
 
 class SandboxStatus(StrEnum):
@@ -30,3 +32,31 @@ class SandboxCommandOutput(BaseModel):
     stdout: str
     stderr: str
     exit_code: int
+
+
+class SandboxRef(BaseModel):
+    """Where a unified sandbox id lives, fixed from creation until the sandbox is killed."""
+
+    backend_type: str
+    backend_sandbox_id: str
+    project_id: asUUID
+
+
+class SandboxEventData(BaseModel):
+    seq: int
+    kind: Literal["command", "file"]
+    payload: dict
+    created_at: datetime
+
+
+class SandboxLogPage(BaseModel):
+    """A sandbox log with one page of its events, oldest first."""
+
+    sandbox_id: asUUID
+    project_id: asUUID
+    backend_type: str
+    backend_sandbox_id: Optional[str]
+    will_total_alive_seconds: int
+    events: list[SandboxEventData]
+    # Pass as `after_seq` to get the next page, None on the last page
+    next_after_seq: Optional[int]
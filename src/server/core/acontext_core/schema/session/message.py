@@ -2,13 +2,20 @@ import json
 from pydantic import BaseModel
 from typing import List, Optional
 from ..orm import Part, ToolCallMeta, ToolResultMeta
-from ...env import LOG
+from ...env import LOG, DEFAULT_CORE_CONFIG
+from ...util.ttl_cache import TTLCache
 from ..utils import asUUID
 
 STRING_TYPES = {"text", "tool-call", "tool-result"}
 
 ROLE_REPLACE_NAME = {"assistant": "agent"}
 
+# Rendered messages with the tool calls they register, weighted by their length.
+# Messages are immutable, so the rendering only depends on the key.
+MESSAGE_RENDER_CACHE: TTLCache[tuple[str, list[ToolCallMeta]]] = TTLCache(
+    maxsize=DEFAULT_CORE_CONFIG.message_render_cache_max_chars, ttl_seconds=None
+)
+
 
 def pack_part_line(
     role: str,
@@ -72,16 +79,47 @@ class MessageBlob(BaseModel):
     parts: List[Part]
     task_id: Optional[asUUID] = None
 
+    def _render_key(
+        self, tool_mapping: dict[str, ToolCallMeta], truncate_chars: int = None
+    ) -> tuple:
+        # Tool results render the name of their tool call, which may come from
+        # a previous message
+        result_tool_names = tuple(
+            (
+                tool_mapping[call_id].name
+                if (call_id := (p.meta or {}).get("tool_call_id")) in tool_mapping
+                else None
+            )
+            for p in self.parts
+            if p.type == "tool-result"
+        )
+        return (self.message_id, self.role, truncate_chars, result_tool_names)
+
     def to_string(
         self,
         tool_mapping: dict[str, ToolCallMeta],
         truncate_chars: int = None,
         **kwargs,
     ) -> str:
+        key = self._render_key(tool_mapping, truncate_chars)
+        cached = MESSAGE_RENDER_CACHE.get(key)
+        if cached is not None:
+            r, tool_calls = cached
+            for tool_call_meta in tool_calls:
+                tool_mapping[tool_call_meta.id] = tool_call_meta
+            return r
+
         lines = [
             pack_part_line(
                 self.role, p, tool_mapping, truncate_chars=truncate_chars, **kwargs
             )
             for p in self.parts
         ]
-        return "\n".join(lines)
+        r = "\n".join(lines)
+        tool_calls = [
+            tool_mapping[p.meta["id"]]
+            for p in self.parts
+            if p.type == "tool-call" and (p.meta or {}).get("id") is not None
+        ]
+        MESSAGE_RENDER_CACHE.set(key, (r, tool_calls), weight=max(len(r), 1))
+        return r
@@ -1,6 +1,6 @@
 from enum import StrEnum
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional, Union
 from ..utils import asUUID
 
 
@@ -30,3 +30,35 @@ class TaskSchema(BaseModel):
         return (
             f"Task {self.order}: {self.data.task_description} (Status: {self.status})"
         )
+
+
+class TaskInsertOp(BaseModel):
+    after_order: int
+    data: dict
+    status: TaskStatus = TaskStatus.PENDING
+
+
+class TaskDeleteOp(BaseModel):
+    order: int
+
+
+class TaskMoveOp(BaseModel):
+    order: int
+    after_order: int
+
+
+TaskMutation = Union[TaskInsertOp, TaskDeleteOp, TaskMoveOp]
+
+
+TaskTextKind = Literal["task_description", "progress", "user_preference"]
+
+
+class TaskSearchHit(BaseModel):
+    task_id: asUUID
+    session_id: asUUID
+    kind: TaskTextKind
+    text: str
+    # Cosine similarity to the query
+    score: float
+    task_status: TaskStatus
+    task_description: str
@@ -0,0 +1,167 @@
+"""
+Debounced session buffer flush scheduler.
+
+Every non-full buffer used to spawn a sleeping task per message. Instead, each
+session keeps a single deadline in a Redis sorted set: a new message only
+pushes the deadline forward, and one polling loop per process pops the due
+sessions and publishes them to the buffer process queue. Deadlines live in
+Redis, so they survive process restarts and are shared by all replicas.
+"""
+
+import asyncio
+import time
+from typing import List, Optional, Tuple
+from ..env import LOG, DEFAULT_CORE_CONFIG
+from ..infra.redis import REDIS_CLIENT
+from ..infra.async_mq import publish_mq
+from ..schema.mq.session import InsertNewMessage
+from .constants import EX, RK
+
+BUFFER_TIMER_KEY = "session.message.buffer.timer"
+BUFFER_TIMER_PAYLOAD_KEY = "session.message.buffer.timer.payload"
+
+# Due sessions are leased instead of removed: their deadline is moved to
+# now + lease until the notify is published and acked, so a crash between the
+# pop and the publish doesn't lose the flush.
+# KEYS: timer zset, payload hash
+# ARGV: now, limit, lease seconds
+_LEASE_DUE_SCRIPT = """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local leased = tonumber(ARGV[1]) + tonumber(ARGV[3])
+local result = {}
+for _, member in ipairs(members) do
+    redis.call('ZADD', KEYS[1], leased, member)
+    local score = redis.call('ZSCORE', KEYS[1], member)
+    table.insert(result, member)
+    table.insert(result, score)
+    table.insert(result, redis.call('HGET', KEYS[2], member) or '')
+end
+return result
+"""
+
+# Remove the deadline only if it wasn't pushed forward by a new message meanwhile
+# KEYS: timer zset, payload hash
+# ARGV: member, leased score
+_ACK_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if score and tonumber(score) == tonumber(ARGV[2]) then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+_TIMER_LOOP_TASK: Optional[asyncio.Task] = None
+
+
+def _member(body: InsertNewMessage) -> str:
+    return f"{body.project_id}.{body.session_id}"
+
+
+async def schedule_buffer_flush(body: InsertNewMessage, delay_seconds: float) -> bool:
+    """
+    Set (or push forward) the buffer flush deadline of the message's session.
+
+    Returns False if the deadline couldn't be stored in Redis.
+    """
+    member = _member(body)
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(BUFFER_TIMER_PAYLOAD_KEY, member, body.model_dump_json())
+                pipe.zadd(BUFFER_TIMER_KEY, {member: time.time() + delay_seconds})
+                await pipe.execute()
+    except Exception as e:
+        LOG.warning(f"Failed to schedule buffer flush for {member}: {e}")
+        return False
+    return True
+
+
+async def lease_due_buffer_flushes(
+    now: Optional[float] = None, limit: Optional[int] = None
+) -> List[Tuple[str, str, Optional[InsertNewMessage]]]:
+    """
+    Lease the sessions whose deadline has passed.
+
+    Returns ``(member, leased_score, body)`` tuples, call ``ack_buffer_flush``
+    once the session has been notified.
+    """
+    async with REDIS_CLIENT.get_client_context() as client:
+        raw = await client.eval(
+            _LEASE_DUE_SCRIPT,
+            2,
+            BUFFER_TIMER_KEY,
+            BUFFER_TIMER_PAYLOAD_KEY,
+            now if now is not None else time.time(),
+            limit or DEFAULT_CORE_CONFIG.session_message_buffer_timer_batch_size,
+            DEFAULT_CORE_CONFIG.session_message_buffer_timer_lease_seconds,
+        )
+    leases = []
+    for i in range(0, len(raw), 3):
+        member, score, payload = raw[i : i + 3]
+        body = InsertNewMessage.model_validate_json(payload) if payload else None
+        leases.append((member, score, body))
+    return leases
+
+
+async def ack_buffer_flush(member: str, leased_score: str) -> bool:
+    async with REDIS_CLIENT.get_client_context() as client:
+        r = await client.eval(
+            _ACK_SCRIPT,
+            2,
+            BUFFER_TIMER_KEY,
+            BUFFER_TIMER_PAYLOAD_KEY,
+            member,
+            leased_score,
+        )
+    return bool(r)
+
+
+async def buffer_timer_loop() -> None:
+    poll_interval = DEFAULT_CORE_CONFIG.session_message_buffer_timer_poll_seconds
+    batch_size = DEFAULT_CORE_CONFIG.session_message_buffer_timer_batch_size
+    while True:
+        try:
+            leases = await lease_due_buffer_flushes()
+            for member, leased_score, body in leases:
+                if body is not None:
+                    LOG.debug(
+                        f"Session {body.session_id} buffer is idle, notify message {body.message_id}"
+                    )
+                    await publish_mq(
+                        exchange_name=EX.session_message,
+                        routing_key=RK.session_message_buffer_process,
+                        body=body.model_dump_json(),
+                    )
+                await ack_buffer_flush(member, leased_score)
+            if len(leases) == batch_size:
+                # More sessions may be due, don't wait for the next tick
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Un-acked leases expire and are notified again
+            LOG.warning(f"Buffer timer loop error: {e}")
+        await asyncio.sleep(poll_interval)
+
+
+async def start_buffer_timer() -> None:
+    global _TIMER_LOOP_TASK
+    if _TIMER_LOOP_TASK is not None and not _TIMER_LOOP_TASK.done():
+        return
+    _TIMER_LOOP_TASK = asyncio.create_task(buffer_timer_loop())
+    LOG.info("Session buffer timer started")
+
+
+async def stop_buffer_timer() -> None:
+    global _TIMER_LOOP_TASK
+    if _TIMER_LOOP_TASK is None:
+        return
+    _TIMER_LOOP_TASK.cancel()
+    try:
+        await _TIMER_LOOP_TASK
+    except asyncio.CancelledError:
+        pass
+    _TIMER_LOOP_TASK = None
+    LOG.info("Session buffer timer stopped")
@@ -32,6 +32,8 @@ async def process_session_pending_message(
             if eil:
                 return r
             if not pending_message_ids:
+                # The pending index said the buffer needs processing, fix its drift
+                await MD.reconcile_pending_index(session, session_id)
                 return Result.resolve(None)
             if disabled:
                 LOG.warning(
@@ -1,6 +1,7 @@
 import asyncio
 import json
-from typing import List
+from functools import partial
+from typing import List, Optional, Sequence, Tuple
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import ValidationError
@@ -11,13 +12,32 @@ from ...schema.orm import Message, Part, Asset
 from ...schema.result import Result
 from ...schema.utils import asUUID
 from ...infra.s3 import S3_CLIENT
-from ...env import LOG
+from ...infra.db import after_commit
+from ...env import LOG, DEFAULT_CORE_CONFIG
+from ...util.ttl_cache import TTLCache, SingleFlight
+from . import message_index as MI
+
+# Parsed parts keyed by the content hash of their S3 object, shared across runs
+PARTS_CACHE: TTLCache[List[Part]] = TTLCache(
+    maxsize=DEFAULT_CORE_CONFIG.message_parts_cache_max_bytes, ttl_seconds=None
+)
+_PARTS_SINGLE_FLIGHT: SingleFlight[List[Part]] = SingleFlight()
+
+
+async def _download_message_parts(s3_key: str) -> List[Part]:
+    parts_json_bytes = await S3_CLIENT.download_object(s3_key)
+    parts_json = json.loads(parts_json_bytes.decode("utf-8"))
+    assert isinstance(parts_json, list), "Parts Json must be a list"
+    return [Part(**pj) for pj in parts_json]
 
 
 async def _fetch_message_parts(parts_meta: dict) -> Result[List[Part]]:
     """
     Helper function to fetch parts for a single message from S3.
 
+    Parts are served from an in-process LRU keyed by the asset's sha256, and
+    concurrent fetches of the same asset share one download.
+
     Args:
         message: Message object with parts_meta containing S3 information
 
@@ -30,16 +50,18 @@ async def _fetch_message_parts(parts_meta: dict) -> Result[List[Part]]:
             asset = Asset(**parts_meta)
         except ValidationError as e:
             return Result.reject(f"Failed to validate parts asset {parts_meta}: {e}")
-        s3_key = asset.s3_key
-        # Download parts JSON from S3
-        parts_json_bytes = await S3_CLIENT.download_object(s3_key)
-        parts_json = json.loads(parts_json_bytes.decode("utf-8"))
-        assert isinstance(parts_json, list), "Parts Json must be a list"
-        try:
-            parts = [Part(**pj) for pj in parts_json]
-        except ValidationError as e:
-            return Result.reject(f"Failed to validate parts {parts_json}: {e}")
-        return Result.resolve(parts)
+        cache_key = asset.sha256 or asset.s3_key
+        parts = PARTS_CACHE.get(cache_key)
+        if parts is None:
+            try:
+                parts = await _PARTS_SINGLE_FLIGHT.do(
+                    cache_key, partial(_download_message_parts, asset.s3_key)
+                )
+            except ValidationError as e:
+                return Result.reject(f"Failed to validate parts {asset.s3_key}: {e}")
+            PARTS_CACHE.set(cache_key, parts, weight=max(asset.size_b, 1))
+        # Callers may edit their parts, the cached ones must stay as downloaded
+        return Result.resolve([p.model_copy(deep=True) for p in parts])
     except Exception as e:
         return Result.reject(f"Unknown error to fetch parts {parts_meta}: {e}")
 
@@ -106,7 +128,8 @@ async def fetch_messages_data_by_ids(
         if not ordered_messages:
             return Result.resolve([])
 
-        # Fetch parts concurrently for all messages
+        # Fetch parts concurrently for all messages, S3_CLIENT's scheduler
+        # bounds how many downloads actually run at once
         parts_tasks = [
             _fetch_message_parts(message.parts_asset_meta)
             for message in ordered_messages
@@ -163,7 +186,7 @@ async def get_message_ids(
     db_session: AsyncSession,
     session_id: asUUID,
     status: str = "pending",
-    limit: int = 1,
+    limit: Optional[int] = 1,
     asc: bool = False,
 ) -> Result[List[asUUID]]:
     query = (
@@ -181,6 +204,70 @@ async def get_message_ids(
     return Result.resolve(message_ids)
 
 
+async def get_pending_message_summary(
+    db_session: AsyncSession,
+    session_id: asUUID,
+    new_message_ids: Sequence[asUUID] = (),
+) -> Result[Tuple[int, Optional[asUUID]]]:
+    """
+    Get the pending message count and the latest pending message id of a session.
+
+    Served from the Redis pending index in the common case. On an index miss the
+    pending ids are loaded from the DB and the index is rebuilt; if Redis is
+    unavailable the DB result is returned directly.
+
+    Args:
+        db_session: Database session, only used on an index miss
+        session_id: UUID of the session
+        new_message_ids: Newly stored messages to record in the index first, oldest first
+
+    Returns:
+        Result containing (pending_message_count, latest_pending_message_id)
+    """
+    summary = await MI.record_pending_messages(session_id, new_message_ids)
+    if summary is not None:
+        return Result.resolve(summary)
+
+    try:
+        r = await get_message_ids(db_session, session_id, limit=None)
+        message_ids, eil = r.unpack()
+        if eil:
+            return r
+    except Exception as e:
+        return Result.reject(
+            f"Error loading pending messages for session {session_id}: {e}"
+        )
+    summary = await MI.rebuild_pending_index(session_id, message_ids)
+    if summary is not None:
+        return Result.resolve(summary)
+    return Result.resolve((len(message_ids), message_ids[0] if message_ids else None))
+
+
+async def reconcile_pending_index(
+    db_session: AsyncSession, session_id: asUUID
+) -> Result[int]:
+    """
+    Remove the messages that are no longer pending in the DB from the Redis index.
+
+    Only stale entries are removed, so messages recorded concurrently are kept.
+
+    Returns:
+        Result containing the number of stale entries removed
+    """
+    indexed_ids = await MI.get_indexed_message_ids(session_id)
+    if not indexed_ids:
+        return Result.resolve(0)
+    query = select(Message.id).where(
+        Message.id.in_(indexed_ids),
+        Message.session_task_process_status == TaskStatus.PENDING.value,
+    )
+    result = await db_session.execute(query)
+    pending_ids = set(result.scalars().all())
+    stale_ids = [mid for mid in indexed_ids if mid not in pending_ids]
+    await MI.mark_messages_not_pending(session_id, stale_ids)
+    return Result.resolve(len(stale_ids))
+
+
 async def unpending_session_messages_to_running(
     db_session: AsyncSession, session_id: asUUID, limit: int
 ) -> Result[List[asUUID]]:
@@ -197,6 +284,9 @@ async def unpending_session_messages_to_running(
     rdp = sorted(result.mappings().all(), key=lambda x: x["created_at"])
     message_ids = [rdp["id"] for rdp in rdp]
     await db_session.flush()
+    after_commit(
+        db_session, partial(MI.mark_messages_not_pending, session_id, message_ids)
+    )
     return Result.resolve(message_ids)
 
 
@@ -252,9 +342,20 @@ async def update_message_status_to(
         update(Message)
         .where(Message.id.in_(message_ids))
         .values(session_task_process_status=status.value)
+        .returning(Message.id, Message.session_id)
     )
 
-    await db_session.execute(stmt)
+    result = await db_session.execute(stmt)
     await db_session.flush()
 
+    # Keep the pending index of the touched sessions consistent, once committed
+    session_message_ids: dict[asUUID, List[asUUID]] = {}
+    for mid, sid in result.all():
+        session_message_ids.setdefault(sid, []).append(mid)
+    for sid, mids in session_message_ids.items():
+        if status == TaskStatus.PENDING:
+            after_commit(db_session, partial(MI.drop_pending_index, sid))
+        else:
+            after_commit(db_session, partial(MI.mark_messages_not_pending, sid, mids))
+
     return Result.resolve(True)
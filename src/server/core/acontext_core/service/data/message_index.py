@@ -0,0 +1,177 @@
+"""
+Redis index of the pending messages of a session.
+
+The index lets the insert/buffer consumers learn "how many messages are pending
+and which one is the latest" with a single Redis call instead of querying the
+``messages`` table on every event. Postgres stays the source of truth: a
+missing index is rebuilt from the DB, and every helper here returns ``None``
+when Redis is unavailable so callers can fall back to the DB.
+
+Layout per session:
+- ``session.pending.{session_id}`` (HASH): one field per pending message id,
+  plus the ``__latest__`` field holding the latest pending message id.
+- ``session.pending.done.{session_id}`` (ZSET): recently processed message ids
+  scored by time, so that retried deliveries of an already processed message
+  are not counted as pending again.
+"""
+
+import time
+from typing import List, Optional, Sequence, Tuple
+from ...infra.redis import REDIS_CLIENT
+from ...env import LOG, DEFAULT_CORE_CONFIG
+from ...schema.utils import asUUID
+
+# KEYS: pending hash, done zset
+# ARGV: now, index ttl, tombstone ttl, new message ids (oldest first)...
+_RECORD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[3]))
+for i = 4, #ARGV do
+    if not redis.call('ZSCORE', KEYS[2], ARGV[i]) then
+        if redis.call('HSETNX', KEYS[1], ARGV[i], '1') == 1 then
+            redis.call('HSET', KEYS[1], '__latest__', ARGV[i])
+        end
+    end
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+return {redis.call('HLEN', KEYS[1]) - 1, redis.call('HGET', KEYS[1], '__latest__')}
+"""
+
+# KEYS: pending hash, done zset
+# ARGV: now, tombstone ttl, message_ids...
+_DONE_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i = 3, #ARGV do
+    redis.call('HDEL', KEYS[1], ARGV[i])
+    redis.call('ZADD', KEYS[2], now, ARGV[i])
+end
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[2]))
+return 1
+"""
+
+# KEYS: pending hash, done zset
+# ARGV: now, index ttl, tombstone ttl, latest message id, pending message ids...
+_REBUILD_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[3]))
+for i = 5, #ARGV do
+    if not redis.call('ZSCORE', KEYS[2], ARGV[i]) then
+        redis.call('HSETNX', KEYS[1], ARGV[i], '1')
+    end
+end
+local latest = redis.call('HGET', KEYS[1], '__latest__')
+if not latest or latest == '' or redis.call('HEXISTS', KEYS[1], latest) == 0 then
+    redis.call('HSET', KEYS[1], '__latest__', ARGV[4])
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+return {redis.call('HLEN', KEYS[1]) - 1, redis.call('HGET', KEYS[1], '__latest__')}
+"""
+
+
+def _keys(session_id: asUUID) -> List[str]:
+    return [f"session.pending.{session_id}", f"session.pending.done.{session_id}"]
+
+
+def _unpack_summary(raw) -> Tuple[int, Optional[asUUID]]:
+    count, latest = raw
+    return max(int(count), 0), (asUUID(latest) if latest else None)
+
+
+async def record_pending_messages(
+    session_id: asUUID, message_ids: Sequence[asUUID] = ()
+) -> Optional[Tuple[int, Optional[asUUID]]]:
+    """
+    Record new pending messages, oldest first (or only peek when ``message_ids`` is empty).
+
+    Returns ``(pending_count, latest_pending_message_id)``, or ``None`` when the
+    index doesn't exist yet or Redis is unavailable.
+    """
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            raw = await client.eval(
+                _RECORD_SCRIPT,
+                2,
+                *_keys(session_id),
+                time.time(),
+                DEFAULT_CORE_CONFIG.session_message_pending_index_ttl_seconds,
+                DEFAULT_CORE_CONFIG.session_message_pending_index_tombstone_seconds,
+                *[str(mid) for mid in message_ids],
+            )
+    except Exception as e:
+        LOG.warning(f"Pending message index unavailable for {session_id}: {e}")
+        return None
+    if raw is None:
+        return None
+    return _unpack_summary(raw)
+
+
+async def rebuild_pending_index(
+    session_id: asUUID, pending_message_ids: List[asUUID]
+) -> Optional[Tuple[int, Optional[asUUID]]]:
+    """
+    Reconcile the index with the pending message ids loaded from the DB.
+
+    ``pending_message_ids`` must be ordered from the latest to the oldest.
+    Messages recorded concurrently by other consumers are kept.
+    """
+    latest = str(pending_message_ids[0]) if pending_message_ids else ""
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            raw = await client.eval(
+                _REBUILD_SCRIPT,
+                2,
+                *_keys(session_id),
+                time.time(),
+                DEFAULT_CORE_CONFIG.session_message_pending_index_ttl_seconds,
+                DEFAULT_CORE_CONFIG.session_message_pending_index_tombstone_seconds,
+                latest,
+                *[str(mid) for mid in pending_message_ids],
+            )
+    except Exception as e:
+        LOG.warning(f"Failed to rebuild pending message index for {session_id}: {e}")
+        return None
+    return _unpack_summary(raw)
+
+
+async def mark_messages_not_pending(
+    session_id: asUUID, message_ids: List[asUUID]
+) -> None:
+    """Remove messages that left the ``pending`` status from the index."""
+    if not message_ids:
+        return
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            await client.eval(
+                _DONE_SCRIPT,
+                2,
+                *_keys(session_id),
+                time.time(),
+                DEFAULT_CORE_CONFIG.session_message_pending_index_tombstone_seconds,
+                *[str(mid) for mid in message_ids],
+            )
+    except Exception as e:
+        # A stale entry only makes the buffer flush earlier, the DB stays the truth.
+        LOG.warning(f"Failed to update pending message index for {session_id}: {e}")
+
+
+async def get_indexed_message_ids(session_id: asUUID) -> Optional[List[asUUID]]:
+    """Message ids currently counted as pending by the index."""
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            fields = await client.hkeys(_keys(session_id)[0])
+    except Exception as e:
+        LOG.warning(f"Pending message index unavailable for {session_id}: {e}")
+        return None
+    return [asUUID(f) for f in fields if f != "__latest__"]
+
+
+async def drop_pending_index(session_id: asUUID) -> None:
+    """Forget the index of a session, the next read rebuilds it from the DB."""
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            await client.delete(*_keys(session_id))
+    except Exception as e:
+        LOG.warning(f"Failed to drop pending message index for {session_id}: {e}")
@@ -1,25 +1,107 @@
+import asyncio
+from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...schema.orm import Project
 from ...schema.config import ProjectConfig, filter_value_from_json
 from ...schema.result import Result
 from ...schema.utils import asUUID
-from ...env import DEFAULT_PROJECT_CONFIG
+from ...infra.redis import REDIS_CLIENT
+from ...util.ttl_cache import TTLCache
+from ...env import DEFAULT_PROJECT_CONFIG, DEFAULT_CORE_CONFIG, LOG
+
+# Publish a project id to this channel after changing `project.configs`
+PROJECT_CONFIG_INVALIDATE_CHANNEL = "project.config.invalidate"
+
+PROJECT_CONFIG_CACHE: TTLCache[ProjectConfig] = TTLCache(
+    maxsize=DEFAULT_CORE_CONFIG.project_config_cache_size,
+    ttl_seconds=DEFAULT_CORE_CONFIG.project_config_cache_ttl_seconds,
+)
+
+_LISTENER_TASK: Optional[asyncio.Task] = None
 
 
 async def get_project_config(
     db_session: AsyncSession, project_id: asUUID
 ) -> Result[ProjectConfig]:
-    query = select(Project).where(Project.id == project_id)
+    cached = PROJECT_CONFIG_CACHE.get(project_id)
+    if cached is not None:
+        return Result.resolve(cached)
+
+    query = select(Project.configs).where(Project.id == project_id)
     result = await db_session.execute(query)
-    project = result.scalars().first()
-    if project is None:
+    row = result.first()
+    if row is None:
         return Result.reject(f"Project not found: {project_id}")
-    if not project.configs or "project_config" not in project.configs:
-        return Result.resolve(DEFAULT_PROJECT_CONFIG)
-
-    project_config = {
-        **DEFAULT_PROJECT_CONFIG.model_dump(),
-        **filter_value_from_json(project.configs["project_config"], ProjectConfig),
-    }
-    return Result.resolve(ProjectConfig(**project_config))
+    configs = row[0]
+    if not configs or "project_config" not in configs:
+        project_config = DEFAULT_PROJECT_CONFIG
+    else:
+        project_config = ProjectConfig(
+            **{
+                **DEFAULT_PROJECT_CONFIG.model_dump(),
+                **filter_value_from_json(configs["project_config"], ProjectConfig),
+            }
+        )
+    PROJECT_CONFIG_CACHE.set(project_id, project_config)
+    return Result.resolve(project_config)
+
+
+async def invalidate_project_config(project_id: asUUID) -> None:
+    """Drop the cached config of a project in this process and in all replicas."""
+    PROJECT_CONFIG_CACHE.pop(project_id)
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            await client.publish(PROJECT_CONFIG_INVALIDATE_CHANNEL, str(project_id))
+    except Exception as e:
+        LOG.warning(f"Failed to broadcast project config invalidation: {e}")
+
+
+async def listen_project_config_invalidation() -> None:
+    while True:
+        try:
+            async with REDIS_CLIENT.get_client_context() as client:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(PROJECT_CONFIG_INVALIDATE_CHANNEL)
+                try:
+                    # Invalidations may have been missed while unsubscribed
+                    PROJECT_CONFIG_CACHE.clear()
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is None:
+                            continue
+                        try:
+                            PROJECT_CONFIG_CACHE.pop(asUUID(message["data"]))
+                        except ValueError:
+                            LOG.warning(
+                                f"Invalid project config invalidation: {message['data']}"
+                            )
+                finally:
+                    await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOG.warning(f"Project config invalidation listener error: {e}")
+            await asyncio.sleep(DEFAULT_CORE_CONFIG.mq_reconnect_delay)
+
+
+async def start_project_config_listener() -> None:
+    global _LISTENER_TASK
+    if _LISTENER_TASK is not None and not _LISTENER_TASK.done():
+        return
+    _LISTENER_TASK = asyncio.create_task(listen_project_config_invalidation())
+
+
+async def stop_project_config_listener() -> None:
+    global _LISTENER_TASK
+    if _LISTENER_TASK is None:
+        return
+    _LISTENER_TASK.cancel()
+    try:
+        await _LISTENER_TASK
+    except asyncio.CancelledError:
+        pass
+    _LISTENER_TASK = None
+    LOG.info(f"Project config cache stopped: {PROJECT_CONFIG_CACHE.stats()}")
@@ -1,86 +1,157 @@
 import asyncio
-from sqlalchemy import select, update, type_coerce, func, extract, Integer
+from functools import partial
+from typing import Optional
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.dialects.postgresql import JSONB
 from ...schema.sandbox import (
     SandboxCreateConfig,
     SandboxUpdateConfig,
     SandboxRuntimeInfo,
     SandboxCommandOutput,
+    SandboxRef,
+    SandboxEventData,
+    SandboxLogPage,
 )
 from ...schema.result import Result
-from ...schema.orm import SandboxLog
+from ...schema.orm import SandboxLog, SandboxEvent
 from ...schema.utils import asUUID
+from ...infra.db import after_commit
+from ...infra.redis import REDIS_CLIENT
 from ...infra.sandbox.client import SANDBOX_CLIENT
+from ...util.ttl_cache import TTLCache
 from ...env import LOG, DEFAULT_CORE_CONFIG
 from ...constants import MetricTags
 from ...telemetry.capture_metrics import capture_increment
+from .sandbox_events import record_sandbox_event, touch_sandbox_keepalive
 
+# Unified sandbox id -> SandboxRef. Also kept in Redis as `sandbox.ref.{id}`,
+# both are dropped when the kill commits
+SANDBOX_REF_CACHE: TTLCache[SandboxRef] = TTLCache(
+    maxsize=DEFAULT_CORE_CONFIG.sandbox_ref_cache_size,
+    ttl_seconds=DEFAULT_CORE_CONFIG.sandbox_ref_cache_ttl_seconds,
+)
+# Killed sandbox ids are published here, to drop their ref in all replicas
+SANDBOX_REF_INVALIDATE_CHANNEL = "sandbox.ref.invalidate"
 
-async def _update_will_total_alive_seconds(
-    db_session: AsyncSession,
-    sandbox_id: asUUID,
-    reset_alive_seconds: int = DEFAULT_CORE_CONFIG.sandbox_default_keepalive_seconds,
-) -> None:
-    """
-    Update the will_total_alive_seconds field based on how long the sandbox has been alive.
-    Formula: reset_alive_seconds + (current_time - created_at)
-    
-    Args:
-        db_session: Database session.
-        sandbox_id: The sandbox ID.
-        reset_alive_seconds: The seconds to extend from current time (default: DEFAULT_KEEPALIVE_SECONDS).
-                            This is the remaining alive time from now, not a reset value.
-    """
-    sandbox_log = await db_session.get(SandboxLog, sandbox_id)
-    if not sandbox_log:
-        return
+_LISTENER_TASK: Optional[asyncio.Task] = None
 
-    old_will_total_alive_seconds = sandbox_log.will_total_alive_seconds
-    project_id = sandbox_log.project_id
 
-    stmt = (
-        update(SandboxLog)
-        .where(SandboxLog.id == sandbox_id)
-        .values(
-            will_total_alive_seconds=reset_alive_seconds
-            + func.cast(extract("epoch", func.now() - SandboxLog.created_at), Integer)
-        )
-    )
-    await db_session.execute(stmt)
-    await db_session.flush()
-    await db_session.refresh(sandbox_log)
-
-    increment_seconds = sandbox_log.will_total_alive_seconds - old_will_total_alive_seconds
-    if increment_seconds != 0:
-        asyncio.create_task(
-            capture_increment(
-                project_id=project_id,
-                tag=MetricTags.new_sandbox_alive,
-                increment=increment_seconds,
+def _sandbox_ref_key(sandbox_id: asUUID) -> str:
+    return f"sandbox.ref.{sandbox_id}"
+
+
+async def _cache_sandbox_ref(sandbox_id: asUUID, ref: SandboxRef) -> None:
+    SANDBOX_REF_CACHE.set(sandbox_id, ref)
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            await client.set(
+                _sandbox_ref_key(sandbox_id),
+                ref.model_dump_json(),
+                ex=DEFAULT_CORE_CONFIG.sandbox_ref_cache_ttl_seconds,
             )
-        )
+    except Exception as e:
+        LOG.warning(f"Failed to cache sandbox {sandbox_id} ref: {e}")
+
+
+async def _evict_sandbox_ref(sandbox_id: asUUID) -> None:
+    SANDBOX_REF_CACHE.pop(sandbox_id)
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            await client.delete(_sandbox_ref_key(sandbox_id))
+            await client.publish(SANDBOX_REF_INVALIDATE_CHANNEL, str(sandbox_id))
+    except Exception as e:
+        LOG.warning(f"Failed to evict sandbox {sandbox_id} ref: {e}")
+
+
+async def listen_sandbox_ref_invalidation() -> None:
+    while True:
+        try:
+            async with REDIS_CLIENT.get_client_context() as client:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(SANDBOX_REF_INVALIDATE_CHANNEL)
+                try:
+                    # Kills may have been missed while unsubscribed
+                    SANDBOX_REF_CACHE.clear()
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is None:
+                            continue
+                        try:
+                            SANDBOX_REF_CACHE.pop(asUUID(message["data"]))
+                        except ValueError:
+                            LOG.warning(
+                                f"Invalid sandbox ref invalidation: {message['data']}"
+                            )
+                finally:
+                    await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOG.warning(f"Sandbox ref invalidation listener error: {e}")
+            await asyncio.sleep(DEFAULT_CORE_CONFIG.mq_reconnect_delay)
+
+
+async def start_sandbox_ref_listener() -> None:
+    global _LISTENER_TASK
+    if _LISTENER_TASK is not None and not _LISTENER_TASK.done():
+        return
+    _LISTENER_TASK = asyncio.create_task(listen_sandbox_ref_invalidation())
+
+
+async def stop_sandbox_ref_listener() -> None:
+    global _LISTENER_TASK
+    if _LISTENER_TASK is None:
+        return
+    _LISTENER_TASK.cancel()
+    try:
+        await _LISTENER_TASK
+    except asyncio.CancelledError:
+        pass
+    _LISTENER_TASK = None
+    LOG.info(f"Sandbox ref cache stopped: {SANDBOX_REF_CACHE.stats()}")
 
 
-async def _get_backend_sandbox_id(
+async def _get_sandbox_ref(
     db_session: AsyncSession, sandbox_id: asUUID
-) -> Result[str]:
+) -> Result[SandboxRef]:
     """
-    Get the backend sandbox ID by unified sandbox ID.
+    Get the backend of a sandbox by unified sandbox ID, from the caches or the SandboxLog.
 
     Args:
         db_session: Database session.
         sandbox_id: The unified sandbox ID (UUID).
 
     Returns:
-        Result containing the backend sandbox ID string.
+        Result containing the backend type, backend sandbox ID and project ID.
     """
-    stmt = select(SandboxLog.backend_sandbox_id).where(SandboxLog.id == sandbox_id)
-    result = await db_session.execute(stmt)
-    backend_id = result.scalar_one_or_none()
-    if backend_id is None:
+    ref = SANDBOX_REF_CACHE.get(sandbox_id)
+    if ref is not None:
+        return Result.resolve(ref)
+    try:
+        async with REDIS_CLIENT.get_client_context() as client:
+            raw = await client.get(_sandbox_ref_key(sandbox_id))
+        if raw is not None:
+            ref = SandboxRef.model_validate_json(raw)
+            SANDBOX_REF_CACHE.set(sandbox_id, ref)
+            return Result.resolve(ref)
+    except Exception as e:
+        LOG.warning(f"Sandbox ref cache unavailable: {e}")
+
+    stmt = select(
+        SandboxLog.backend_type, SandboxLog.backend_sandbox_id, SandboxLog.project_id
+    ).where(SandboxLog.id == sandbox_id)
+    row = (await db_session.execute(stmt)).first()
+    if row is None or row.backend_sandbox_id is None:
         return Result.reject(f"Sandbox {sandbox_id} not found or was killed.")
-    return Result.resolve(backend_id)
+    ref = SandboxRef(
+        backend_type=row.backend_type,
+        backend_sandbox_id=row.backend_sandbox_id,
+        project_id=row.project_id,
+    )
+    await _cache_sandbox_ref(sandbox_id, ref)
+    return Result.resolve(ref)
 
 
 async def create_sandbox(
@@ -118,12 +189,23 @@ async def create_sandbox(
         await db_session.flush()
 
         # Record the initial alive seconds to Metric
-        asyncio.create_task(
-            capture_increment(
-                project_id=project_id,
-                tag=MetricTags.new_sandbox_alive,
-                increment=DEFAULT_CORE_CONFIG.sandbox_default_keepalive_seconds,
-            )
+        capture_increment(
+            project_id=project_id,
+            tag=MetricTags.new_sandbox_alive,
+            increment=DEFAULT_CORE_CONFIG.sandbox_default_keepalive_seconds,
+        )
+
+        after_commit(
+            db_session,
+            partial(
+                _cache_sandbox_ref,
+                sandbox_log.id,
+                SandboxRef(
+                    backend_type=backend.type,
+                    backend_sandbox_id=info.sandbox_id,
+                    project_id=project_id,
+                ),
+            ),
         )
 
         LOG.debug(
@@ -153,11 +235,11 @@ async def kill_sandbox(db_session: AsyncSession, sandbox_id: asUUID) -> Result[b
     """
     try:
         # Look up the backend sandbox ID
-        result = await _get_backend_sandbox_id(db_session, sandbox_id)
+        result = await _get_sandbox_ref(db_session, sandbox_id)
         if not result.ok():
             return Result.reject(result.error.errmsg)
 
-        backend_sandbox_id = result.data
+        backend_sandbox_id = result.data.backend_sandbox_id
         backend = SANDBOX_CLIENT.use_backend()
         success = await backend.kill_sandbox(backend_sandbox_id)
 
@@ -168,11 +250,11 @@ async def kill_sandbox(db_session: AsyncSession, sandbox_id: asUUID) -> Result[b
             .values(backend_sandbox_id=None)
         )
         await db_session.execute(stmt)
+        # Until the commit, other requests still read the ref from the row
+        after_commit(db_session, partial(_evict_sandbox_ref, sandbox_id))
 
         LOG.info(f"Killed sandbox {sandbox_id} (backend: {backend_sandbox_id})")
-        await _update_will_total_alive_seconds(
-            db_session, sandbox_id, reset_alive_seconds=0
-        )
+        touch_sandbox_keepalive(sandbox_id, reset_alive_seconds=0)
         return Result.resolve(success)
     except ValueError as e:
         return Result.reject(f"Sandbox backend not available: {e}")
@@ -196,16 +278,16 @@ async def get_sandbox(
     """
     try:
         # Look up the backend sandbox ID
-        result = await _get_backend_sandbox_id(db_session, sandbox_id)
+        result = await _get_sandbox_ref(db_session, sandbox_id)
         if not result.ok():
             return Result.reject(result.error.errmsg)
 
-        backend_sandbox_id = result.data
+        backend_sandbox_id = result.data.backend_sandbox_id
         backend = SANDBOX_CLIENT.use_backend()
         info = await backend.get_sandbox(backend_sandbox_id)
 
         # Update will_total_alive_seconds
-        await _update_will_total_alive_seconds(db_session, sandbox_id)
+        touch_sandbox_keepalive(sandbox_id)
 
         # Replace the backend sandbox ID with the unified ID
         info.sandbox_id = str(sandbox_id)
@@ -235,18 +317,16 @@ async def update_sandbox(
     """
     try:
         # Look up the backend sandbox ID
-        result = await _get_backend_sandbox_id(db_session, sandbox_id)
+        result = await _get_sandbox_ref(db_session, sandbox_id)
         if not result.ok():
             return Result.reject(result.error.errmsg)
 
-        backend_sandbox_id = result.data
+        backend_sandbox_id = result.data.backend_sandbox_id
         backend = SANDBOX_CLIENT.use_backend()
         info = await backend.update_sandbox(backend_sandbox_id, config)
 
         # Update will_total_alive_seconds
-        await _update_will_total_alive_seconds(
-            db_session, sandbox_id, config.keepalive_longer_by_seconds
-        )
+        touch_sandbox_keepalive(sandbox_id, config.keepalive_longer_by_seconds)
 
         # Replace the backend sandbox ID with the unified ID
         info.sandbox_id = str(sandbox_id)
@@ -277,31 +357,21 @@ async def exec_command(
     """
     try:
         # Look up the backend sandbox ID
-        result = await _get_backend_sandbox_id(db_session, sandbox_id)
+        result = await _get_sandbox_ref(db_session, sandbox_id)
         if not result.ok():
             return Result.reject(result.error.errmsg)
 
-        backend_sandbox_id = result.data
+        backend_sandbox_id = result.data.backend_sandbox_id
         backend = SANDBOX_CLIENT.use_backend()
         output = await backend.exec_command(backend_sandbox_id, command)
 
-        # Append to history_commands using PostgreSQL JSONB || operator
-        # Use COALESCE to handle NULL values
-        new_entry = [{"command": command, "exit_code": output.exit_code}]
-        stmt = (
-            update(SandboxLog)
-            .where(SandboxLog.id == sandbox_id)
-            .values(
-                history_commands=func.coalesce(
-                    SandboxLog.history_commands, type_coerce([], JSONB)
-                )
-                + type_coerce(new_entry, JSONB)
-            )
+        # Written behind, with the sandbox_logs history mirror
+        record_sandbox_event(
+            sandbox_id, "command", {"command": command, "exit_code": output.exit_code}
         )
-        await db_session.execute(stmt)
 
         # Update will_total_alive_seconds
-        await _update_will_total_alive_seconds(db_session, sandbox_id)
+        touch_sandbox_keepalive(sandbox_id)
 
         return Result.resolve(output)
     except ValueError as e:
@@ -331,34 +401,23 @@ async def download_file(
     """
     try:
         # Look up the backend sandbox ID
-        result = await _get_backend_sandbox_id(db_session, sandbox_id)
+        result = await _get_sandbox_ref(db_session, sandbox_id)
         if not result.ok():
             return Result.reject(result.error.errmsg)
 
-        backend_sandbox_id = result.data
+        backend_sandbox_id = result.data.backend_sandbox_id
         backend = SANDBOX_CLIENT.use_backend()
         success = await backend.download_file(
             backend_sandbox_id, from_sandbox_file, download_to_s3_key
         )
 
         if success:
-            # Append to generated_files using PostgreSQL JSONB || operator
-            # Use COALESCE to handle NULL values
-            new_entry = [{"sandbox_path": from_sandbox_file}]
-            stmt = (
-                update(SandboxLog)
-                .where(SandboxLog.id == sandbox_id)
-                .values(
-                    generated_files=func.coalesce(
-                        SandboxLog.generated_files, type_coerce([], JSONB)
-                    )
-                    + type_coerce(new_entry, JSONB)
-                )
+            record_sandbox_event(
+                sandbox_id, "file", {"sandbox_path": from_sandbox_file}
             )
-            await db_session.execute(stmt)
 
         # Update will_total_alive_seconds
-        await _update_will_total_alive_seconds(db_session, sandbox_id)
+        touch_sandbox_keepalive(sandbox_id)
 
         return Result.resolve(success)
     except ValueError as e:
@@ -388,18 +447,18 @@ async def upload_file(
     """
     try:
         # Look up the backend sandbox ID
-        result = await _get_backend_sandbox_id(db_session, sandbox_id)
+        result = await _get_sandbox_ref(db_session, sandbox_id)
         if not result.ok():
             return Result.reject(result.error.errmsg)
 
-        backend_sandbox_id = result.data
+        backend_sandbox_id = result.data.backend_sandbox_id
         backend = SANDBOX_CLIENT.use_backend()
         success = await backend.upload_file(
             backend_sandbox_id, from_s3_key, upload_to_sandbox_file
         )
 
         # Update will_total_alive_seconds
-        await _update_will_total_alive_seconds(db_session, sandbox_id)
+        touch_sandbox_keepalive(sandbox_id)
 
         return Result.resolve(success)
     except ValueError as e:
@@ -410,26 +469,72 @@ async def upload_file(
 
 
 async def get_sandbox_log(
-    db_session: AsyncSession, sandbox_id: asUUID
-) -> Result[SandboxLog]:
+    db_session: AsyncSession,
+    sandbox_id: asUUID,
+    limit: int = 100,
+    after_seq: Optional[int] = None,
+) -> Result[SandboxLogPage]:
     """
-    Get the full SandboxLog record by unified sandbox ID.
+    Get a SandboxLog record with one page of its events by unified sandbox ID.
+
+    Events are written behind, the ones of the last flush window may be missing.
 
     Args:
         db_session: Database session.
         sandbox_id: The unified sandbox ID (UUID).
+        limit: The maximum number of events to return.
+        after_seq: Return the events after this one, `next_after_seq` of the previous page.
 
     Returns:
-        Result containing the SandboxLog record.
+        Result containing the SandboxLog fields and the events, oldest first.
     """
-    sandbox_log = await db_session.get(SandboxLog, sandbox_id)
-    if sandbox_log is None:
+    stmt = select(
+        SandboxLog.project_id,
+        SandboxLog.backend_type,
+        SandboxLog.backend_sandbox_id,
+        SandboxLog.will_total_alive_seconds,
+    ).where(SandboxLog.id == sandbox_id)
+    row = (await db_session.execute(stmt)).first()
+    if row is None:
         return Result.reject(f"Sandbox {sandbox_id} not found")
 
-    # Update will_total_alive_seconds
-    await _update_will_total_alive_seconds(db_session, sandbox_id)
-
-    return Result.resolve(sandbox_log)
+    stmt = (
+        select(
+            SandboxEvent.seq,
+            SandboxEvent.kind,
+            SandboxEvent.payload,
+            SandboxEvent.created_at,
+        )
+        .where(SandboxEvent.sandbox_log_id == sandbox_id)
+        .order_by(SandboxEvent.seq)
+        .limit(limit + 1)
+    )
+    if after_seq is not None:
+        stmt = stmt.where(SandboxEvent.seq > after_seq)
+    events = [
+        SandboxEventData.model_validate(e, from_attributes=True)
+        for e in await db_session.execute(stmt)
+    ]
+    next_after_seq = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_after_seq = events[-1].seq
+
+    # Update will_total_alive_seconds, unless the sandbox is already killed
+    if row.backend_sandbox_id is not None:
+        touch_sandbox_keepalive(sandbox_id)
+
+    return Result.resolve(
+        SandboxLogPage(
+            sandbox_id=sandbox_id,
+            project_id=row.project_id,
+            backend_type=row.backend_type,
+            backend_sandbox_id=row.backend_sandbox_id,
+            will_total_alive_seconds=row.will_total_alive_seconds,
+            events=events,
+            next_after_seq=next_after_seq,
+        )
+    )
 
 
 async def list_project_sandboxes(
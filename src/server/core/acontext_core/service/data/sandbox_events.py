@@ -0,0 +1,266 @@
+"""
+Write-behind buffer of sandbox activity.
+
+Commands and generated files are queued as ``sandbox_events`` rows, and every
+call that keeps a sandbox alive only records the sandbox's latest keepalive.
+A background loop writes them every ``sandbox_event_flush_interval_ms``: all
+events in one insert, the ``sandbox_logs`` history mirrors once per sandbox,
+and the keepalives of all sandboxes in one update.
+"""
+
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+from sqlalchemy import (
+    Integer,
+    cast,
+    column,
+    extract,
+    func,
+    insert,
+    or_,
+    select,
+    type_coerce,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH, UUID, TIMESTAMP
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...constants import MetricTags
+from ...env import LOG, DEFAULT_CORE_CONFIG
+from ...infra.db import DB_CLIENT
+from ...schema.orm import SandboxEvent, SandboxLog
+from ...schema.result import Result
+from ...schema.utils import asUUID
+from ...telemetry.capture_metrics import capture_increment
+
+
+class _PendingEvent(NamedTuple):
+    sandbox_id: asUUID
+    kind: str
+    payload: dict
+
+
+class _Keepalive(NamedTuple):
+    reset_alive_seconds: int
+    touched_at: datetime
+
+
+_PENDING_EVENTS: list[_PendingEvent] = []
+_PENDING_KEEPALIVES: dict[asUUID, _Keepalive] = {}
+_FLUSH_LOCK = asyncio.Lock()
+_FLUSH_NOW = asyncio.Event()
+_WRITER_TASK: Optional[asyncio.Task] = None
+
+# The history mirrors of sandbox_logs fed by each event kind
+_MIRROR_COLUMNS = {"command": "history_commands", "file": "generated_files"}
+
+
+def record_sandbox_event(sandbox_id: asUUID, kind: str, payload: dict) -> None:
+    _PENDING_EVENTS.append(_PendingEvent(sandbox_id, kind, payload))
+    if len(_PENDING_EVENTS) >= DEFAULT_CORE_CONFIG.sandbox_event_buffer_max_size:
+        _FLUSH_NOW.set()
+
+
+def touch_sandbox_keepalive(
+    sandbox_id: asUUID,
+    reset_alive_seconds: int = DEFAULT_CORE_CONFIG.sandbox_default_keepalive_seconds,
+) -> None:
+    """
+    Record that the sandbox is expected to live `reset_alive_seconds` from now.
+    Only the latest call of a flush window is written, as
+    will_total_alive_seconds = reset_alive_seconds + (now - created_at).
+    A kill (reset to 0) is final, later calls of the window don't replace it.
+    """
+    pending = _PENDING_KEEPALIVES.get(sandbox_id)
+    if pending is not None and pending.reset_alive_seconds == 0:
+        return
+    _PENDING_KEEPALIVES[sandbox_id] = _Keepalive(
+        reset_alive_seconds, datetime.now(timezone.utc)
+    )
+
+
+def pending_stats() -> dict:
+    return {
+        "events": len(_PENDING_EVENTS),
+        "keepalives": len(_PENDING_KEEPALIVES),
+    }
+
+
+def _tail(array, max_size: int):
+    return func.jsonb_path_query_array(
+        array,
+        cast("$[last - $n + 1 to last]", JSONPATH),
+        func.jsonb_build_object("n", max_size),
+    )
+
+
+async def _write_events(db_session: AsyncSession, events: list[_PendingEvent]) -> None:
+    await db_session.execute(
+        insert(SandboxEvent),
+        [
+            {"sandbox_log_id": e.sandbox_id, "kind": e.kind, "payload": e.payload}
+            for e in events
+        ],
+    )
+    mirrors: dict[asUUID, dict[str, list]] = defaultdict(lambda: defaultdict(list))
+    for e in events:
+        mirrors[e.sandbox_id][_MIRROR_COLUMNS[e.kind]].append(e.payload)
+    max_size = DEFAULT_CORE_CONFIG.sandbox_log_inline_history_max
+    for sandbox_id, entries in mirrors.items():
+        await db_session.execute(
+            update(SandboxLog)
+            .where(SandboxLog.id == sandbox_id)
+            .values(
+                {
+                    name: _tail(
+                        func.coalesce(getattr(SandboxLog, name), type_coerce([], JSONB))
+                        + type_coerce(new_entries, JSONB),
+                        max_size,
+                    )
+                    for name, new_entries in entries.items()
+                }
+            )
+        )
+
+
+async def _write_keepalives(
+    db_session: AsyncSession, keepalives: dict[asUUID, _Keepalive]
+) -> dict[asUUID, int]:
+    """Returns the increments of will_total_alive_seconds by project."""
+    pending = values(
+        column("id", UUID(as_uuid=True)),
+        column("reset_alive_seconds", Integer),
+        column("touched_at", TIMESTAMP(timezone=True)),
+        name="pending",
+    ).data([(sandbox_id, *k) for sandbox_id, k in keepalives.items()])
+    # Read the old values in the same statement, for the metric increments
+    old = (
+        select(SandboxLog.id, SandboxLog.will_total_alive_seconds.label("old_seconds"))
+        .where(SandboxLog.id.in_(list(keepalives)))
+        .with_for_update()
+        .cte("old")
+    )
+    stmt = (
+        update(SandboxLog)
+        .where(SandboxLog.id == pending.c.id)
+        .where(SandboxLog.id == old.c.id)
+        # A replica may still touch a sandbox killed elsewhere, only a kill
+        # (reset to 0) applies then
+        .where(
+            or_(
+                SandboxLog.backend_sandbox_id.is_not(None),
+                pending.c.reset_alive_seconds == 0,
+            )
+        )
+        .values(
+            will_total_alive_seconds=pending.c.reset_alive_seconds
+            + func.cast(
+                extract("epoch", pending.c.touched_at - SandboxLog.created_at),
+                Integer,
+            )
+        )
+        .returning(
+            SandboxLog.project_id,
+            SandboxLog.will_total_alive_seconds - old.c.old_seconds,
+        )
+    )
+    increments: dict[asUUID, int] = defaultdict(int)
+    for project_id, increment in await db_session.execute(stmt):
+        increments[project_id] += increment
+    return increments
+
+
+async def flush_sandbox_events() -> Result[int]:
+    """
+    Write the pending events and keepalives, they are re-queued on failure.
+
+    Returns:
+        The number of events written
+    """
+    async with _FLUSH_LOCK:
+        _FLUSH_NOW.clear()
+        events = _PENDING_EVENTS[:]
+        keepalives = dict(_PENDING_KEEPALIVES)
+        del _PENDING_EVENTS[: len(events)]
+        for sandbox_id, k in keepalives.items():
+            if _PENDING_KEEPALIVES.get(sandbox_id) is k:
+                del _PENDING_KEEPALIVES[sandbox_id]
+        if not events and not keepalives:
+            return Result.resolve(0)
+
+        try:
+            async with DB_CLIENT.get_session_context() as db_session:
+                sandbox_ids = {e.sandbox_id for e in events} | set(keepalives)
+                result = await db_session.execute(
+                    select(SandboxLog.id).where(SandboxLog.id.in_(sandbox_ids))
+                )
+                existing = set(result.scalars())
+                if len(existing) < len(sandbox_ids):
+                    LOG.warning(
+                        f"Dropping activity of {len(sandbox_ids) - len(existing)} unknown sandboxes"
+                    )
+                    events = [e for e in events if e.sandbox_id in existing]
+                    keepalives = {i: k for i, k in keepalives.items() if i in existing}
+                if events:
+                    await _write_events(db_session, events)
+                increments = (
+                    await _write_keepalives(db_session, keepalives)
+                    if keepalives
+                    else {}
+                )
+        except Exception as e:
+            _PENDING_EVENTS[:0] = events
+            for sandbox_id, k in keepalives.items():
+                # A newer keepalive wins over the failed one, unless it was a kill
+                if k.reset_alive_seconds == 0:
+                    _PENDING_KEEPALIVES[sandbox_id] = k
+                else:
+                    _PENDING_KEEPALIVES.setdefault(sandbox_id, k)
+            LOG.warning(f"Sandbox activity flush failed: {e}")
+            return Result.reject(f"Sandbox activity flush failed: {e}")
+
+    for project_id, increment in increments.items():
+        if increment != 0:
+            capture_increment(
+                project_id=project_id,
+                tag=MetricTags.new_sandbox_alive,
+                increment=increment,
+            )
+    return Result.resolve(len(events))
+
+
+async def sandbox_event_writer_loop() -> None:
+    interval = DEFAULT_CORE_CONFIG.sandbox_event_flush_interval_ms / 1000
+    while True:
+        try:
+            await asyncio.wait_for(_FLUSH_NOW.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await flush_sandbox_events()
+        except Exception as e:
+            LOG.warning(f"Sandbox activity flush error: {e}")
+
+
+async def start_sandbox_event_writer() -> None:
+    global _WRITER_TASK
+    if _WRITER_TASK is not None and not _WRITER_TASK.done():
+        return
+    _WRITER_TASK = asyncio.create_task(sandbox_event_writer_loop())
+    LOG.info("Sandbox event writer started")
+
+
+async def stop_sandbox_event_writer() -> None:
+    global _WRITER_TASK
+    if _WRITER_TASK is None:
+        return
+    _WRITER_TASK.cancel()
+    try:
+        await _WRITER_TASK
+    except asyncio.CancelledError:
+        pass
+    _WRITER_TASK = None
+    await flush_sandbox_events()
+    LOG.info(f"Sandbox event writer stopped: {pending_stats()}")
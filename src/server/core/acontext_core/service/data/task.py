@@ -1,90 +1,148 @@
-from typing import List
-from sqlalchemy import select, delete, update
-from sqlalchemy.orm import selectinload
-from sqlalchemy.orm.attributes import flag_modified
+from bisect import bisect_left
+from typing import Hashable, List, Optional, Sequence
+from sqlalchemy import (
+    select,
+    delete,
+    update,
+    func,
+    values,
+    column,
+    case,
+    type_coerce,
+    Integer,
+    Text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID, aggregate_order_by, array
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...env import LOG
 from ...schema.orm import Task, Message
 from ...schema.result import Result
 from ...schema.utils import asUUID
-from ...schema.session.task import TaskSchema
+from ...schema.session.task import (
+    TaskSchema,
+    TaskMutation,
+    TaskInsertOp,
+    TaskDeleteOp,
+    TaskMoveOp,
+)
+from .task_index import mark_tasks_dirty
+
+# Task.order is a sparse sort key, new keys are spaced by this gap so that
+# inserts and moves take a key between their neighbours without renumbering
+TASK_ORDER_GAP = 1024
+
+
+def _ranked_tasks(session_id):
+    """
+    Tasks of a session with their dense 1..n order, ranked by their sort key.
+    The planning task keeps order 0.
+    """
+    dense_order = case(
+        (Task.is_planning, 0),
+        else_=func.row_number().over(
+            partition_by=Task.is_planning, order_by=Task.order.asc()
+        ),
+    )
+    return (
+        select(
+            Task.id,
+            Task.session_id,
+            Task.order.label("sort_key"),
+            dense_order.label("order"),
+            Task.status,
+            Task.data,
+            Task.is_planning,
+        )
+        .where(Task.session_id == session_id)
+        .subquery("ranked_tasks")
+    )
+
+
+def _select_task_schema(tasks):
+    """Select ranked task columns with their message ids aggregated in created_at order."""
+    raw_message_ids = (
+        select(
+            func.array_agg(
+                aggregate_order_by(Message.id, Message.created_at.asc()),
+                type_=ARRAY(UUID(as_uuid=True)),
+            )
+        )
+        .where(Message.task_id == tasks.c.id)
+        .scalar_subquery()
+    )
+    return select(
+        tasks.c.id,
+        tasks.c.session_id,
+        tasks.c.order,
+        tasks.c.status,
+        tasks.c.data,
+        raw_message_ids.label("raw_message_ids"),
+    )
+
+
+def _row_to_task_schema(row) -> TaskSchema:
+    return TaskSchema(
+        id=row.id,
+        session_id=row.session_id,
+        order=row.order,
+        status=row.status,
+        data=row.data,
+        raw_message_ids=row.raw_message_ids or [],
+    )
 
 
 async def fetch_planning_task(
     db_session: AsyncSession, session_id: asUUID
 ) -> Result[TaskSchema | None]:
-    query = (
-        select(Task)
-        .where(Task.session_id == session_id)
-        .options(selectinload(Task.messages))
-        .where(Task.is_planning == True)  # noqa: E712
-    )
+    tasks = _ranked_tasks(session_id)
+    query = _select_task_schema(tasks).where(tasks.c.is_planning == True)  # noqa: E712
     result = await db_session.execute(query)
-    planning = result.scalars().first()
+    planning = result.first()
     if planning is None:
         return Result.resolve(None)
-    return Result.resolve(
-        TaskSchema(
-            id=planning.id,
-            session_id=planning.session_id,
-            order=planning.order,
-            status=planning.status,
-            data=planning.data,
-            raw_message_ids=[
-                msg.id for msg in sorted(planning.messages, key=lambda m: m.created_at)
-            ],
-        )
-    )
+    return Result.resolve(_row_to_task_schema(planning))
 
 
 async def fetch_task(db_session: AsyncSession, task_id: asUUID) -> Result[TaskSchema]:
-    query = select(Task).where(Task.id == task_id).options(selectinload(Task.messages))
+    # Rank the task among the tasks of its own session
+    tasks = _ranked_tasks(
+        select(Task.session_id).where(Task.id == task_id).scalar_subquery()
+    )
+    query = _select_task_schema(tasks).where(tasks.c.id == task_id)
     result = await db_session.execute(query)
-    task = result.scalars().first()
+    task = result.first()
     if task is None:
         return Result.reject(f"Task {task_id} not found")
-    return Result.resolve(
-        TaskSchema(
-            id=task.id,
-            session_id=task.session_id,
-            order=task.order,
-            status=task.status,
-            data=task.data,
-            raw_message_ids=[
-                msg.id for msg in sorted(task.messages, key=lambda m: m.created_at)
-            ],
-        )
-    )
+    return Result.resolve(_row_to_task_schema(task))
 
 
 async def fetch_current_tasks(
     db_session: AsyncSession, session_id: asUUID, status: str = None
 ) -> Result[List[TaskSchema]]:
+    tasks = _ranked_tasks(session_id)
     query = (
-        select(Task)
-        .where(Task.session_id == session_id)
-        .where(Task.is_planning == False)  # noqa: E712
-        .options(selectinload(Task.messages))  # Eagerly load related messages
-        .order_by(Task.order.asc())
+        _select_task_schema(tasks)
+        .where(tasks.c.is_planning == False)  # noqa: E712
+        .order_by(tasks.c.order.asc())
     )
     if status:
-        query = query.where(Task.status == status)
+        query = query.where(tasks.c.status == status)
     result = await db_session.execute(query)
-    tasks = list(result.scalars().all())
-    tasks_d = [
-        TaskSchema(
-            id=t.id,
-            session_id=t.session_id,
-            order=t.order,
-            status=t.status,
-            data=t.data,
-            raw_message_ids=[
-                msg.id for msg in sorted(t.messages, key=lambda m: m.created_at)
-            ],
-        )
-        for t in tasks
-    ]
-    return Result.resolve(tasks_d)
+    return Result.resolve([_row_to_task_schema(row) for row in result.all()])
+
+
+def _jsonb_list_append(data, key: str, item):
+    """`data` with `item` appended to its `key` list, a missing or null list is created."""
+    current = case(
+        (func.jsonb_typeof(data[key]) == "array", data[key]),
+        else_=type_coerce([], JSONB),
+    )
+    return func.jsonb_set(
+        data,
+        array([key], type_=Text),
+        current + type_coerce([item], JSONB),
+        type_=JSONB,
+    )
 
 
 async def update_task(
@@ -95,27 +153,31 @@ async def update_task(
     patch_data: dict = None,
     data: dict = None,
 ) -> Result[Task]:
-    # Fetch the task to update
-    query = select(Task).where(Task.id == task_id)
-    result = await db_session.execute(query)
-    task = result.scalars().first()
-
-    if task is None:
-        return Result.reject(f"Task {task_id} not found")
-
     # Update only the non-None parameters
+    updates = {}
     if status is not None:
-        task.status = status
+        updates["status"] = status
     if order is not None:
-        task.order = order
+        # A raw sort key, see TASK_ORDER_GAP
+        updates["order"] = order
 
     if data is not None:
-        task.data = data
+        updates["data"] = data
     elif patch_data is not None:
-        task.data.update(patch_data)
-        flag_modified(task, "data")
+        # Merge the top-level keys server-side with JSONB ||
+        updates["data"] = Task.data + type_coerce(patch_data, JSONB)
+
+    if updates:
+        query = update(Task).where(Task.id == task_id).values(**updates).returning(Task)
+    else:
+        query = select(Task).where(Task.id == task_id)
+    result = await db_session.execute(query.execution_options(populate_existing=True))
+    task = result.scalars().first()
 
-    await db_session.flush()
+    if task is None:
+        return Result.reject(f"Task {task_id} not found")
+    if "data" in updates:
+        mark_tasks_dirty(db_session, [task_id])
     # Changes will be committed when the session context exits
     return Result.resolve(task)
 
@@ -127,50 +189,225 @@ async def insert_task(
     after_order: int,
     data: dict,
     status: str = "pending",
-) -> Result[Task]:
+) -> Result[TaskSchema]:
     """This function will cause the session' tasks row be locked for update, make sure the DB session will be closed soonly after this function is called"""
-    # Lock all tasks in this session to prevent concurrent modifications
-    lock_query = (
-        select(Task.id)
-        .where(Task.session_id == session_id)
-        .with_for_update()  # This locks the rows
+    r = await apply_task_mutations(
+        db_session,
+        project_id,
+        session_id,
+        [TaskInsertOp(after_order=after_order, data=data, status=status)],
     )
-    await db_session.execute(lock_query)
+    tasks, eil = r.unpack()
+    if eil:
+        return r
+    return Result.resolve(tasks[0])
+
+
+def replay_task_mutations(
+    sequence: Sequence[Hashable],
+    mutations: Sequence[TaskMutation],
+    new_keys: Sequence[Hashable],
+) -> list[Hashable]:
+    """
+    Apply task mutations to an ordered sequence of task keys, in order.
+    Orders are 1-based positions in the sequence as left by the previous mutations,
+    the k-th insert adds `new_keys[k]`.
+
+    Raises:
+        ValueError: If a mutation refers to a task order out of range
+    """
+    sequence = list(sequence)
+    new_keys = iter(new_keys)
+    for m in mutations:
+        if isinstance(m, TaskInsertOp):
+            if m.after_order < 0:
+                raise ValueError(f"Invalid after_order {m.after_order}")
+            sequence.insert(min(m.after_order, len(sequence)), next(new_keys))
+        elif isinstance(m, TaskDeleteOp):
+            if not 1 <= m.order <= len(sequence):
+                raise ValueError(f"Task order {m.order} is out of range")
+            sequence.pop(m.order - 1)
+        elif isinstance(m, TaskMoveOp):
+            if not 1 <= m.order <= len(sequence):
+                raise ValueError(f"Task order {m.order} is out of range")
+            if not 0 <= m.after_order <= len(sequence):
+                raise ValueError(f"Task order {m.after_order} is out of range")
+            key = sequence[m.order - 1]
+            anchor = sequence[m.after_order - 1] if m.after_order else None
+            if anchor == key:
+                continue
+            sequence.remove(key)
+            sequence.insert(
+                sequence.index(anchor) + 1 if anchor is not None else 0, key
+            )
+        else:
+            raise ValueError(f"Unknown task mutation {m}")
+    return sequence
+
+
+def _stable_positions(keys: Sequence[int]) -> set[int]:
+    """Positions of a longest increasing subsequence of keys, which can keep their keys."""
+    tails: list[int] = []
+    tail_positions: list[int] = []
+    previous: list[Optional[int]] = []
+    for i, key in enumerate(keys):
+        n = bisect_left(tails, key)
+        if n == len(tails):
+            tails.append(key)
+            tail_positions.append(i)
+        else:
+            tails[n] = key
+            tail_positions[n] = i
+        previous.append(tail_positions[n - 1] if n else None)
+    positions = set()
+    i = tail_positions[-1] if tail_positions else None
+    while i is not None:
+        positions.add(i)
+        i = previous[i]
+    return positions
+
+
+def assign_sort_keys(keys: Sequence[Optional[int]]) -> Optional[list[int]]:
+    """
+    Fill the missing (None) sort keys of an ordered sequence with keys between their
+    neighbours, the given keys must be positive and increasing.
+
+    Returns:
+        The sort keys, or None if there is no room left between two neighbours
+    """
+    result = list(keys)
+    previous = 0
+    i = 0
+    while i < len(result):
+        if result[i] is not None:
+            previous = result[i]
+            i += 1
+            continue
+        j = i
+        while j < len(result) and result[j] is None:
+            j += 1
+        if j == len(result):
+            step = TASK_ORDER_GAP
+        else:
+            step = (result[j] - previous) // (j - i + 1)
+            if step < 1:
+                return None
+        for k in range(i, j):
+            previous += step
+            result[k] = previous
+        i = j
+    return result
+
+
+async def apply_task_mutations(
+    db_session: AsyncSession,
+    project_id: asUUID,
+    session_id: asUUID,
+    mutations: Sequence[TaskMutation],
+) -> Result[list[TaskSchema]]:
+    """
+    Apply task inserts, deletes and moves in one pass, see `replay_task_mutations`.
+    Inserted and moved tasks take a sort key between their neighbours, so the other
+    tasks are left untouched. All the keys are spread again by TASK_ORDER_GAP only
+    when two neighbours have no room left between them.
+
+    This function will cause the session' tasks row be locked for update, make sure the DB session will be closed soonly after this function is called
+
+    Returns:
+        The inserted tasks with their dense order, in the order of their insert mutations
+    """
+    rows = (
+        await db_session.execute(
+            select(Task.id, Task.order)
+            .where(Task.session_id == session_id)
+            .where(Task.is_planning == False)  # noqa: E712
+            .order_by(Task.order.asc())
+            .with_for_update()
+        )
+    ).all()
+    current_keys = {row.id: row.order for row in rows}
+    inserts = [m for m in mutations if isinstance(m, TaskInsertOp)]
+    try:
+        sequence = replay_task_mutations(
+            [row.id for row in rows], mutations, list(range(len(inserts)))
+        )
+    except ValueError as e:
+        return Result.reject(str(e))
 
-    # Step 1: Move all tasks that need to be shifted to temporary negative values
-    assert after_order >= 0
-    temp_update_stmt = (
-        update(Task)
-        .where(Task.session_id == session_id)
-        .where(Task.order > after_order)
-        .values(order=-Task.order)
-    )
-    await db_session.execute(temp_update_stmt)
-    await db_session.flush()
+    existing = [
+        (i, current_keys[key]) for i, key in enumerate(sequence) if key in current_keys
+    ]
+    stable = _stable_positions([k for _, k in existing])
+    keys = [None] * len(sequence)
+    for n, (i, k) in enumerate(existing):
+        if n in stable:
+            keys[i] = k
+    final_keys = assign_sort_keys(keys)
+    if final_keys is None:
+        LOG.info(f"Rebalance the task sort keys of session {session_id}")
+        final_keys = [TASK_ORDER_GAP * n for n in range(1, len(sequence) + 1)]
+    sort_keys = dict(zip(sequence, final_keys))
+    dense_orders = {key: n for n, key in enumerate(sequence, start=1)}
+
+    deleted_ids = [tid for tid in current_keys if tid not in sort_keys]
+    if deleted_ids:
+        await db_session.execute(delete(Task).where(Task.id.in_(deleted_ids)))
+
+    rekeyed = [
+        (tid, sort_keys[tid])
+        for tid, key in current_keys.items()
+        if tid in sort_keys and sort_keys[tid] != key
+    ]
+    if rekeyed:
+        # Park the rekeyed tasks at their negated final keys, which can't
+        # collide with uq_session_id_order while other rows still hold theirs
+        new_keys = values(
+            column("id", UUID(as_uuid=True)), column("new_order", Integer), name="v"
+        ).data(rekeyed)
+        await db_session.execute(
+            update(Task)
+            .where(Task.id == new_keys.c.id)
+            .values(order=-new_keys.c.new_order)
+            .execution_options(synchronize_session=False)
+        )
 
-    # Step 2: Update them back to positive values, incremented by 1
-    final_update_stmt = (
-        update(Task)
-        .where(Task.session_id == session_id)
-        .where(Task.order < 0)
-        .values(order=-Task.order + 1)
-    )
-    await db_session.execute(final_update_stmt)
+    inserted = [
+        Task(
+            session_id=session_id,
+            project_id=project_id,
+            order=sort_keys[k],
+            data=m.data,
+            status=m.status.value,
+        )
+        for k, m in enumerate(inserts)
+    ]
+    db_session.add_all(inserted)
     await db_session.flush()
-
-    # Step 3: Create new task
-    task = Task(
-        session_id=session_id,
-        project_id=project_id,
-        order=after_order + 1,
-        data=data,
-        status=status,
+    mark_tasks_dirty(db_session, [t.id for t in inserted])
+
+    if rekeyed:
+        await db_session.execute(
+            update(Task)
+            .where(Task.session_id == session_id)
+            .where(Task.order < 0)
+            .values(order=-Task.order)
+            .execution_options(synchronize_session=False)
+        )
+        await db_session.flush()
+    return Result.resolve(
+        [
+            TaskSchema(
+                id=t.id,
+                session_id=t.session_id,
+                order=dense_orders[k],
+                status=t.status,
+                data=t.data,
+                raw_message_ids=[],
+            )
+            for k, t in enumerate(inserted)
+        ]
     )
 
-    db_session.add(task)
-    await db_session.flush()
-    return Result.resolve(task)
-
 
 async def delete_task(db_session: AsyncSession, task_id: asUUID) -> Result[None]:
     # Fetch the task to delete
@@ -197,31 +434,23 @@ async def append_progress_to_task(
     progress: str,
     user_preference: str = None,
 ) -> Result[None]:
-    # append the progress to the task
-    # Use coalesce to handle NULL, then append to the array
+    # Append in place with jsonb_set, without reading and rewriting the task data
     assert progress is not None
 
-    # Fetch the task
-    query = select(Task).where(Task.id == task_id)
-    result = await db_session.execute(query)
-    task = result.scalars().first()
-
-    if task is None:
-        return Result.reject(f"Task {task_id} not found")
-
-    # Get current data and append progress
-    if "progresses" not in task.data:
-        task.data["progresses"] = []
-    task.data["progresses"].append(progress)
-
+    new_data = _jsonb_list_append(Task.data, "progresses", progress)
     if user_preference is not None:
-        if "user_preferences" not in task.data:
-            task.data["user_preferences"] = []
-        task.data["user_preferences"].append(user_preference)
+        new_data = _jsonb_list_append(new_data, "user_preferences", user_preference)
 
-    flag_modified(task, "data")
-
-    await db_session.flush()
+    result = await db_session.execute(
+        update(Task)
+        .where(Task.id == task_id)
+        .values(data=new_data)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.first() is None:
+        return Result.reject(f"Task {task_id} not found")
+    mark_tasks_dirty(db_session, [task_id])
     return Result.resolve(None)
 
 
@@ -259,27 +488,28 @@ async def append_messages_to_planning_section(
 async def fetch_previous_tasks_without_message_ids(
     db_session: AsyncSession, session_id: asUUID, st_order: int, limit: int = 10
 ) -> Result[List[TaskSchema]]:
+    tasks = _ranked_tasks(session_id)
     query = (
-        select(Task)
-        .where(Task.session_id == session_id)
-        .where(Task.is_planning == False)  # noqa: E712
-        .where(Task.order < st_order)
-        .order_by(Task.order.desc())
+        select(
+            tasks.c.id, tasks.c.session_id, tasks.c.order, tasks.c.status, tasks.c.data
+        )
+        .where(tasks.c.is_planning == False)  # noqa: E712
+        .where(tasks.c.order < st_order)
+        .order_by(tasks.c.order.desc())
         .limit(limit)
     )
     result = await db_session.execute(query)
-    tasks = list(result.scalars().all())
-    tasks = sorted(tasks, key=lambda t: t.order)
+    rows = sorted(result.all(), key=lambda row: row.order)
     return Result.resolve(
         [
             TaskSchema(
-                id=t.id,
-                session_id=t.session_id,
-                order=t.order,
-                status=t.status,
-                data=t.data,
+                id=row.id,
+                session_id=row.session_id,
+                order=row.order,
+                status=row.status,
+                data=row.data,
                 raw_message_ids=[],
             )
-            for t in tasks
+            for row in rows
         ]
     )
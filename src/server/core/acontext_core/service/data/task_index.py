@@ -0,0 +1,415 @@
+"""
+Semantic index of the task texts of a project, for searches like "how did an
+agent previously handle X" across sessions.
+
+Each task description, progress and user preference is embedded into a
+``task_embeddings`` row. The functions of ``service/data/task.py`` mark the
+tasks they change; once their DB session commits, the tasks are queued and a
+background loop re-syncs their rows. A sync only embeds the texts that
+changed, and the embedding layer caches texts by content hash.
+
+Rows are stamped with the ``updated_at`` of the task they were synced from. A
+slower reconcile pass re-syncs the tasks changed since, or never indexed.
+
+Search runs on pgvector, or in process with NumPy (``task_search_backend``).
+"""
+
+import asyncio
+import numpy as np
+from functools import partial
+from typing import Iterable, Optional
+from sqlalchemy import (
+    and_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONPATH
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...env import LOG, DEFAULT_CORE_CONFIG
+from ...infra.db import DB_CLIENT, after_commit
+from ...llm.embeddings import get_embedding
+from ...schema.orm import Task, TaskEmbedding
+from ...schema.result import Result
+from ...schema.session.task import TaskSearchHit, TaskStatus, TaskTextKind
+from ...schema.utils import asUUID
+from ...util.ttl_cache import TTLCache
+from ...util.vector_index import VectorIndex
+
+_DIRTY_TASK_IDS: set[asUUID] = set()
+_INDEX_LOOP_TASK: Optional[asyncio.Task] = None
+_RECONCILE_LOOP_TASK: Optional[asyncio.Task] = None
+
+# project_id -> (VectorIndex, rows), for the numpy backend
+_NUMPY_INDEXES: TTLCache[tuple[VectorIndex, list]] = TTLCache(
+    maxsize=64, ttl_seconds=DEFAULT_CORE_CONFIG.task_search_numpy_cache_ttl_seconds
+)
+
+
+def mark_tasks_dirty(db_session: AsyncSession, task_ids: Iterable[asUUID]) -> None:
+    """Re-index `task_ids` once `db_session` commits."""
+    task_ids = set(task_ids)
+    if task_ids:
+        after_commit(db_session, partial(_queue_tasks, task_ids))
+
+
+async def _queue_tasks(task_ids: set[asUUID]) -> None:
+    _DIRTY_TASK_IDS.update(task_ids)
+
+
+def task_texts(data: dict) -> dict[tuple[TaskTextKind, int], str]:
+    """The indexed texts of a task's data, by (kind, position)."""
+    texts = {}
+    if data.get("task_description"):
+        texts[("task_description", 0)] = data["task_description"]
+    for kind, key in (
+        ("progress", "progresses"),
+        ("user_preference", "user_preferences"),
+    ):
+        for position, text in enumerate(data.get(key) or []):
+            if text:
+                texts[(kind, position)] = text
+    return texts
+
+
+async def sync_task_index(
+    db_session: AsyncSession, task_ids: Iterable[asUUID]
+) -> Result[int]:
+    """
+    Bring the rows of `task_ids` in line with their current data.
+
+    Returns:
+        The number of texts embedded
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return Result.resolve(0)
+    result = await db_session.execute(
+        select(Task.id, Task.project_id, Task.session_id, Task.data, Task.updated_at)
+        .where(Task.id.in_(task_ids))
+        .where(Task.is_planning == False)  # noqa: E712
+    )
+    tasks = {row.id: row for row in result}
+    result = await db_session.execute(
+        select(
+            TaskEmbedding.task_id,
+            TaskEmbedding.kind,
+            TaskEmbedding.position,
+            TaskEmbedding.text,
+        ).where(TaskEmbedding.task_id.in_(task_ids))
+    )
+    indexed = {(row.task_id, row.kind, row.position): row.text for row in result}
+
+    wanted = {
+        (task_id, kind, position): text
+        for task_id, row in tasks.items()
+        for (kind, position), text in task_texts(row.data).items()
+    }
+    stale = [key for key, text in indexed.items() if wanted.get(key) != text]
+    new = [key for key, text in wanted.items() if indexed.get(key) != text]
+    if stale:
+        await db_session.execute(
+            delete(TaskEmbedding).where(
+                tuple_(
+                    TaskEmbedding.task_id, TaskEmbedding.kind, TaskEmbedding.position
+                ).in_(stale)
+            )
+        )
+    if new:
+        r = await get_embedding([wanted[key] for key in new], phase="document")
+        embeddings, eil = r.unpack()
+        if eil:
+            return r
+        db_session.add_all(
+            [
+                TaskEmbedding(
+                    project_id=tasks[task_id].project_id,
+                    session_id=tasks[task_id].session_id,
+                    task_id=task_id,
+                    kind=kind,
+                    position=position,
+                    text=wanted[(task_id, kind, position)],
+                    embedding=vector,
+                )
+                for (task_id, kind, position), vector in zip(new, embeddings.embedding)
+            ]
+        )
+    await db_session.flush()
+    if tasks:
+        # The reconcile pass re-syncs the tasks updated after this
+        await db_session.execute(
+            update(TaskEmbedding.__table__)
+            .where(TaskEmbedding.__table__.c.task_id == bindparam("b_task_id"))
+            .values(updated_at=bindparam("b_synced_at")),
+            [
+                {"b_task_id": task_id, "b_synced_at": row.updated_at}
+                for task_id, row in tasks.items()
+            ],
+        )
+    for project_id in {row.project_id for row in tasks.values()}:
+        _NUMPY_INDEXES.pop(project_id)
+    return Result.resolve(len(new))
+
+
+async def flush_task_index() -> Result[int]:
+    """Sync the committed changes queued so far, they are re-queued on failure."""
+    task_ids = set(_DIRTY_TASK_IDS)
+    _DIRTY_TASK_IDS.difference_update(task_ids)
+    if not task_ids:
+        return Result.resolve(0)
+    try:
+        async with DB_CLIENT.get_session_context() as db_session:
+            r = await sync_task_index(db_session, task_ids)
+            if not r.ok():
+                raise RuntimeError(r.error.errmsg)
+    except Exception as e:
+        _DIRTY_TASK_IDS.update(task_ids)
+        LOG.warning(f"Task index sync of {len(task_ids)} tasks failed: {e}")
+        return Result.reject(f"Task index sync failed: {e}")
+    return r
+
+
+def _has_texts(key: str):
+    return func.jsonb_path_exists(
+        Task.data,
+        cast(f'$.{key} ? (@.type() == "string" && @ != "")', JSONPATH),
+    )
+
+
+async def reconcile_task_index(after_id: Optional[asUUID] = None) -> Result[int]:
+    """
+    Sync the tasks whose rows are missing or older than the task, from `after_id`
+    on, in batches of ``task_index_reconcile_batch_size``.
+
+    Returns:
+        The number of texts embedded
+    """
+    synced_at = (
+        select(func.max(TaskEmbedding.updated_at))
+        .where(TaskEmbedding.task_id == Task.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(Task.id)
+        .where(Task.is_planning == False)  # noqa: E712
+        .where(
+            or_(
+                Task.updated_at > synced_at,
+                and_(
+                    synced_at.is_(None),
+                    or_(
+                        _has_texts("task_description"),
+                        _has_texts("progresses[*]"),
+                        _has_texts("user_preferences[*]"),
+                    ),
+                ),
+            )
+        )
+        .order_by(Task.id)
+        .limit(DEFAULT_CORE_CONFIG.task_index_reconcile_batch_size)
+    )
+    embedded = 0
+    while True:
+        try:
+            async with DB_CLIENT.get_session_context() as db_session:
+                page = stmt if after_id is None else stmt.where(Task.id > after_id)
+                task_ids = (await db_session.execute(page)).scalars().all()
+                if not task_ids:
+                    return Result.resolve(embedded)
+                r = await sync_task_index(db_session, task_ids)
+                if not r.ok():
+                    raise RuntimeError(r.error.errmsg)
+        except Exception as e:
+            LOG.warning(f"Task index reconcile failed after {after_id}: {e}")
+            return Result.reject(f"Task index reconcile failed: {e}")
+        embedded += r.data
+        after_id = task_ids[-1]
+
+
+async def task_index_reconcile_loop() -> None:
+    while True:
+        r = await reconcile_task_index()
+        if r.ok() and r.data:
+            LOG.info(f"Task index reconciled, {r.data} texts embedded")
+        await asyncio.sleep(DEFAULT_CORE_CONFIG.task_index_reconcile_interval_seconds)
+
+
+async def task_index_loop() -> None:
+    while True:
+        await asyncio.sleep(DEFAULT_CORE_CONFIG.task_index_sync_interval_seconds)
+        await flush_task_index()
+
+
+async def start_task_indexer() -> None:
+    global _INDEX_LOOP_TASK, _RECONCILE_LOOP_TASK
+    if _INDEX_LOOP_TASK is not None and not _INDEX_LOOP_TASK.done():
+        return
+    _INDEX_LOOP_TASK = asyncio.create_task(task_index_loop())
+    # Its first pass backfills the tasks written before the index existed
+    _RECONCILE_LOOP_TASK = asyncio.create_task(task_index_reconcile_loop())
+    LOG.info("Task indexer started")
+
+
+async def stop_task_indexer() -> None:
+    global _INDEX_LOOP_TASK, _RECONCILE_LOOP_TASK
+    if _INDEX_LOOP_TASK is None:
+        return
+    for task in (_INDEX_LOOP_TASK, _RECONCILE_LOOP_TASK):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _INDEX_LOOP_TASK = _RECONCILE_LOOP_TASK = None
+    await flush_task_index()
+    LOG.info("Task indexer stopped")
+
+
+async def search_tasks(
+    db_session: AsyncSession,
+    project_id: asUUID,
+    query: str,
+    top_k: int = 10,
+    session_ids: Optional[list[asUUID]] = None,
+    kinds: Optional[list[TaskTextKind]] = None,
+    statuses: Optional[list[TaskStatus]] = None,
+) -> Result[list[TaskSearchHit]]:
+    """The `top_k` task texts of the project closest to `query`, best first."""
+    r = await get_embedding([query], phase="query")
+    embedding, eil = r.unpack()
+    if eil:
+        return r
+    query_vector = embedding.embedding[0]
+    if DEFAULT_CORE_CONFIG.task_search_backend == "numpy":
+        return await _search_numpy(
+            db_session, project_id, query_vector, top_k, session_ids, kinds, statuses
+        )
+
+    distance = TaskEmbedding.embedding.cosine_distance(query_vector)
+    stmt = (
+        select(
+            TaskEmbedding.task_id,
+            TaskEmbedding.session_id,
+            TaskEmbedding.kind,
+            TaskEmbedding.text,
+            (1 - distance).label("score"),
+            Task.status,
+            Task.data["task_description"].astext.label("task_description"),
+        )
+        .join(Task, Task.id == TaskEmbedding.task_id)
+        .where(TaskEmbedding.project_id == project_id)
+    )
+    if session_ids:
+        stmt = stmt.where(TaskEmbedding.session_id.in_(session_ids))
+    if kinds:
+        stmt = stmt.where(TaskEmbedding.kind.in_(kinds))
+    if statuses:
+        stmt = stmt.where(Task.status.in_([s.value for s in statuses]))
+    result = await db_session.execute(stmt.order_by(distance).limit(top_k))
+    return Result.resolve(
+        [
+            TaskSearchHit(
+                task_id=row.task_id,
+                session_id=row.session_id,
+                kind=row.kind,
+                text=row.text,
+                score=row.score,
+                task_status=row.status,
+                task_description=row.task_description,
+            )
+            for row in result
+        ]
+    )
+
+
+async def _project_numpy_index(
+    db_session: AsyncSession, project_id: asUUID
+) -> tuple[VectorIndex, list]:
+    cached = _NUMPY_INDEXES.get(project_id)
+    if cached is not None:
+        return cached
+    result = await db_session.execute(
+        select(
+            TaskEmbedding.task_id,
+            TaskEmbedding.session_id,
+            TaskEmbedding.kind,
+            TaskEmbedding.text,
+            TaskEmbedding.embedding,
+        ).where(TaskEmbedding.project_id == project_id)
+    )
+    rows = result.all()
+    vectors = (
+        np.stack([np.asarray(row.embedding, dtype=np.float32) for row in rows])
+        if rows
+        else np.empty((0, DEFAULT_CORE_CONFIG.block_embedding_dim), dtype=np.float32)
+    )
+    nlist = 0
+    if len(rows) >= DEFAULT_CORE_CONFIG.task_search_numpy_ivf_min_rows:
+        nlist = int(np.sqrt(len(rows)))
+    cached = (VectorIndex(vectors, nlist=nlist), rows)
+    _NUMPY_INDEXES.set(project_id, cached)
+    return cached
+
+
+async def _search_numpy(
+    db_session: AsyncSession,
+    project_id: asUUID,
+    query_vector: np.ndarray,
+    top_k: int,
+    session_ids: Optional[list[asUUID]],
+    kinds: Optional[list[TaskTextKind]],
+    statuses: Optional[list[TaskStatus]],
+) -> Result[list[TaskSearchHit]]:
+    index, rows = await _project_numpy_index(db_session, project_id)
+    allowed_tasks = None
+    if statuses:
+        # Statuses change without re-indexing, filter them on the live tasks
+        result = await db_session.execute(
+            select(Task.id)
+            .where(Task.project_id == project_id)
+            .where(Task.status.in_([s.value for s in statuses]))
+        )
+        allowed_tasks = set(result.scalars())
+    mask = np.array(
+        [
+            (not session_ids or row.session_id in session_ids)
+            and (not kinds or row.kind in kinds)
+            and (allowed_tasks is None or row.task_id in allowed_tasks)
+            for row in rows
+        ],
+        dtype=bool,
+    )
+    positions, scores = index.search(
+        query_vector,
+        top_k,
+        nprobe=DEFAULT_CORE_CONFIG.task_search_numpy_ivf_nprobe,
+        mask=mask,
+    )
+    hit_rows = [rows[p] for p in positions]
+    result = await db_session.execute(
+        select(Task.id, Task.status, Task.data).where(
+            Task.id.in_({row.task_id for row in hit_rows})
+        )
+    )
+    tasks = {row.id: row for row in result}
+    return Result.resolve(
+        [
+            TaskSearchHit(
+                task_id=row.task_id,
+                session_id=row.session_id,
+                kind=row.kind,
+                text=row.text,
+                score=float(score),
+                task_status=tasks[row.task_id].status,
+                task_description=tasks[row.task_id].data.get("task_description", ""),
+            )
+            for row, score in zip(hit_rows, scores)
+            # Deleted since the index was cached
+            if row.task_id in tasks
+        ]
+    )
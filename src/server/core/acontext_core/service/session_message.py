@@ -15,6 +15,7 @@ from .constants import EX, RK
 from .data import message as MD
 from .data import project as PD
 from .controller import message as MC
+from . import buffer_timer as BT
 from .utils import check_redis_lock_or_set, release_redis_lock
 
 
@@ -35,22 +36,31 @@ async def waiting_for_message_notify(wait_for_seconds: int, body: InsertNewMessa
         exchange_name=EX.session_message,
         routing_key=RK.session_message_insert,
         queue_name="session.message.insert.entry",
+        batch_max_size=DEFAULT_CORE_CONFIG.session_message_insert_batch_max_size,
+        batch_max_wait_ms=DEFAULT_CORE_CONFIG.session_message_insert_batch_max_wait_ms,
     )
 )
-async def insert_new_message(body: InsertNewMessage, message: Message):
-    LOG.debug(f"Insert new message {body.message_id}")
+async def insert_new_message(bodies: list[InsertNewMessage], messages: list[Message]):
+    # All bodies of a batch belong to the same (project_id, session_id)
+    session_id = bodies[0].session_id
+    LOG.debug(f"Insert {len(bodies)} new messages to session {session_id}")
     async with DB_CLIENT.get_session_context() as read_session:
-        r = await MD.get_message_ids(read_session, body.session_id)
-        message_ids, eil = r.unpack()
+        r = await MD.get_pending_message_summary(
+            read_session, session_id, new_message_ids=[b.message_id for b in bodies]
+        )
+        summary, eil = r.unpack()
         if eil:
             return
-        if not len(message_ids):
-            LOG.debug(f"No pending message found for session {body.session_id}, ignore")
+        pending_message_length, latest_pending_message_id = summary
+        if not pending_message_length:
+            LOG.debug(f"No pending message found for session {session_id}, ignore")
             return
-        latest_pending_message_id = message_ids[0]
-        if body.message_id != latest_pending_message_id:
+        body = next(
+            (b for b in bodies if b.message_id == latest_pending_message_id), None
+        )
+        if body is None:
             LOG.debug(
-                f"Message {body.message_id} is not the latest pending message, ignore"
+                f"Messages {[b.message_id for b in bodies]} are not the latest pending message, ignore"
             )
             return
 
@@ -59,19 +69,20 @@ async def insert_new_message(body: InsertNewMessage, message: Message):
         if eil:
             return
 
-        r = await MD.session_message_length(read_session, body.session_id)
-        pending_message_length, eil = r.unpack()
-        if eil:
-            return
         if (
             pending_message_length
             < project_config.project_session_message_buffer_max_turns
         ):
-            asyncio.create_task(
-                waiting_for_message_notify(
-                    project_config.project_session_message_buffer_ttl_seconds, body
-                )
+            scheduled = await BT.schedule_buffer_flush(
+                body, project_config.project_session_message_buffer_ttl_seconds
             )
+            if not scheduled:
+                asyncio.create_task(
+                    waiting_for_message_notify(
+                        project_config.project_session_message_buffer_ttl_seconds,
+                        body,
+                    )
+                )
             return
 
     _l = await check_redis_lock_or_set(
@@ -134,18 +145,20 @@ register_consumer(
         exchange_name=EX.session_message,
         routing_key=RK.session_message_buffer_process,
         queue_name="session.message.buffer.process",
+        # Runs the task agent, the other consumers keep going under LLM load
+        wait_for_backpressure=True,
     )
 )
 async def buffer_new_message(body: InsertNewMessage, message: Message):
     async with DB_CLIENT.get_session_context() as session:
-        r = await MD.get_message_ids(session, body.session_id)
-        message_ids, eil = r.unpack()
+        r = await MD.get_pending_message_summary(session, body.session_id)
+        summary, eil = r.unpack()
         if eil:
             return
-        if not len(message_ids):
+        pending_message_length, latest_pending_message_id = summary
+        if not pending_message_length:
             LOG.debug(f"No pending message found for session {body.session_id}, ignore")
             return
-        latest_pending_message_id = message_ids[0]
         if body.message_id != latest_pending_message_id:
             LOG.debug(
                 f"Message {body.message_id} is not the latest pending message, ignore"
@@ -1,66 +1,202 @@
-from datetime import datetime, timezone
-import hashlib
+"""
+Process-local metric aggregation.
 
-from sqlalchemy import select, update, func, text
+`capture_increment` only adds to an in-memory counter of the project, tag and
+UTC day. A background loop writes all counters every
+``metric_flush_interval_seconds`` in one upsert on the unique
+(project_id, tag, day) index of ``metrics``.
+"""
 
+import asyncio
+from datetime import datetime, timezone, date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from ..env import LOG, DEFAULT_CORE_CONFIG
+from ..schema.result import Result
 from ..schema.utils import asUUID
 from ..infra.db import DatabaseClient, DB_CLIENT
-from ..schema.orm import Metric
+from ..schema.orm import Metric, Project
+from ..schema.orm.metric import METRIC_DAY
 
 
-async def capture_increment(
-    project_id: asUUID,
-    tag: str,
-    increment: int = 1,
-    db_client: DatabaseClient = DB_CLIENT,
-) -> None:
-    """
-    Fetch the latest metric row for the given project and tag.
-    - If no row exists for today, create a new one.
-    - Then increment the `increment` field on that row atomically on the DB server side.
+class _MetricKey(NamedTuple):
+    project_id: asUUID
+    tag: str
+    day: date
 
-    Uses PostgreSQL advisory locks to prevent race conditions when multiple
-    concurrent calls try to create the same row.
-    """
-    async with db_client.get_session_context() as session:
-        # Always compare dates in a consistent timezone (UTC)
-        today_utc = datetime.now(timezone.utc).date()
-
-        # Generate a unique lock key from project_id, tag, and date
-        # PostgreSQL advisory locks use bigint, so we hash the combination
-        lock_key_str = f"{project_id}:{tag}:{today_utc}"
-        lock_key = int(hashlib.md5(lock_key_str.encode()).hexdigest()[:15], 16)
-
-        # Acquire an advisory lock for this specific (project_id, tag, date) combination
-        # This ensures only one transaction can check/create at a time
-        await session.execute(
-            text("SELECT pg_advisory_xact_lock(:lock_key)"), {"lock_key": lock_key}
-        )
 
-        # Now check if any row exists for today (we hold the lock, so safe)
-        check_stmt = (
-            select(Metric)
-            .where(
-                Metric.project_id == project_id,
-                Metric.tag == tag,
-                func.date(Metric.created_at) == today_utc,
-            )
-            .order_by(Metric.created_at.desc())
-            .limit(1)
+class _Pending(NamedTuple):
+    increment: int
+    # Latest capture of the day, written as created_at of a new row
+    captured_at: datetime
+
+
+# Rows written before the unique index, in the same UTC day, are summed into the
+# first one. Older versions grouped days in the DB session's timezone.
+_MERGE_DUPLICATES_SQL = """
+WITH ranked AS (
+    SELECT id,
+           first_value(id) OVER w AS keep_id,
+           sum(increment) OVER w AS total
+    FROM metrics
+    WINDOW w AS (
+        PARTITION BY project_id, tag, timezone('UTC', created_at)::date
+        ORDER BY created_at, id
+        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+    )
+), kept AS (
+    UPDATE metrics SET increment = ranked.total, updated_at = now()
+    FROM ranked
+    WHERE metrics.id = ranked.id AND ranked.id = ranked.keep_id
+      AND metrics.increment <> ranked.total
+)
+DELETE FROM metrics USING ranked
+WHERE metrics.id = ranked.id AND ranked.id <> ranked.keep_id
+"""
+# Serializes the replicas creating the index
+_DAY_INDEX_LOCK_KEY = 0x6D6574726963  # "metric"
+
+_PENDING_METRICS: dict[_MetricKey, _Pending] = {}
+_FLUSH_LOCK = asyncio.Lock()
+_FLUSHER_TASK: Optional[asyncio.Task] = None
+
+
+def capture_increment(project_id: asUUID, tag: str, increment: int = 1) -> None:
+    """Add `increment` to today's (UTC) metric of the project and tag."""
+    now = datetime.now(timezone.utc)
+    key = _MetricKey(project_id, tag, now.date())
+    pending = _PENDING_METRICS.get(key)
+    _PENDING_METRICS[key] = _Pending(
+        increment + (pending.increment if pending else 0), now
+    )
+
+
+def pending_metric_stats() -> dict:
+    return {
+        "rows": len(_PENDING_METRICS),
+        "increment": sum(p.increment for p in _PENDING_METRICS.values()),
+    }
+
+
+async def ensure_metric_day_index(db_client: DatabaseClient = DB_CLIENT) -> None:
+    """
+    Create the unique (project_id, tag, day) index the upserts rely on, merging
+    the duplicate rows of older versions first. Raises if it can't be created.
+    """
+    index = next(
+        i for i in Metric.__table__.indexes if i.name == "uq_metric_project_id_tag_day"
+    )
+    async with db_client.get_session_context() as db_session:
+        await db_session.execute(
+            text("SELECT pg_advisory_xact_lock(:lock_key)"),
+            {"lock_key": _DAY_INDEX_LOCK_KEY},
         )
-        result = await session.scalars(check_stmt)
-        metric = result.first()
-
-        # If there is no metric yet for today, create a new row
-        if metric is None:
-            metric = Metric(project_id=project_id, tag=tag, increment=0)
-            session.add(metric)
-            # Flush so that metric.id is available for the UPDATE statement
-            await session.flush()
-
-        # Atomically increment the counter on the database server side to avoid data races
-        await session.execute(
-            update(Metric)
-            .where(Metric.id == metric.id)
-            .values(increment=Metric.increment + increment)
+        existing = await db_session.scalar(
+            text("SELECT to_regclass(:name)"), {"name": index.name}
         )
+        if existing is not None:
+            return
+        result = await db_session.execute(text(_MERGE_DUPLICATES_SQL))
+        if result.rowcount:
+            LOG.warning(f"Merged {result.rowcount} duplicate metric rows")
+        await db_session.run_sync(lambda s: index.create(s.connection()))
+    LOG.info(f"Created metric index {index.name}")
+
+
+def _requeue(metrics: dict[_MetricKey, _Pending]) -> None:
+    for key, p in metrics.items():
+        newer = _PENDING_METRICS.get(key)
+        if newer is not None:
+            p = _Pending(p.increment + newer.increment, newer.captured_at)
+        _PENDING_METRICS[key] = p
+
+
+async def flush_metrics(db_client: DatabaseClient = DB_CLIENT) -> Result[int]:
+    """
+    Upsert the pending metrics, they are re-queued on failure.
+
+    Returns:
+        The number of metric rows written
+    """
+    async with _FLUSH_LOCK:
+        metrics = dict(_PENDING_METRICS)
+        _PENDING_METRICS.clear()
+        if not metrics:
+            return Result.resolve(0)
+
+        try:
+            async with db_client.get_session_context() as db_session:
+                project_ids = {key.project_id for key in metrics}
+                result = await db_session.execute(
+                    select(Project.id).where(Project.id.in_(project_ids))
+                )
+                existing = set(result.scalars())
+                if len(existing) < len(project_ids):
+                    LOG.warning(
+                        f"Dropping metrics of {len(project_ids) - len(existing)} deleted projects"
+                    )
+                    metrics = {
+                        k: p for k, p in metrics.items() if k.project_id in existing
+                    }
+                if metrics:
+                    stmt = insert(Metric).values(
+                        [
+                            {
+                                "project_id": key.project_id,
+                                "tag": key.tag,
+                                "increment": p.increment,
+                                "created_at": p.captured_at,
+                            }
+                            for key, p in metrics.items()
+                        ]
+                    )
+                    await db_session.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=[Metric.project_id, Metric.tag, METRIC_DAY],
+                            set_={
+                                "increment": Metric.increment + stmt.excluded.increment,
+                                "updated_at": func.now(),
+                            },
+                        )
+                    )
+        except Exception as e:
+            _requeue(metrics)
+            LOG.warning(f"Metric flush failed: {e}")
+            return Result.reject(f"Metric flush failed: {e}")
+    return Result.resolve(len(metrics))
+
+
+async def metric_flusher_loop() -> None:
+    while True:
+        await asyncio.sleep(DEFAULT_CORE_CONFIG.metric_flush_interval_seconds)
+        try:
+            await flush_metrics()
+        except Exception as e:
+            LOG.warning(f"Metric flush error: {e}")
+
+
+async def start_metric_flusher() -> None:
+    global _FLUSHER_TASK
+    if _FLUSHER_TASK is not None and not _FLUSHER_TASK.done():
+        return
+    # Without the index every flush would fail, refuse to start instead
+    await ensure_metric_day_index()
+    _FLUSHER_TASK = asyncio.create_task(metric_flusher_loop())
+    LOG.info("Metric flusher started")
+
+
+async def stop_metric_flusher() -> None:
+    global _FLUSHER_TASK
+    if _FLUSHER_TASK is None:
+        return
+    _FLUSHER_TASK.cancel()
+    try:
+        await _FLUSHER_TASK
+    except asyncio.CancelledError:
+        pass
+    _FLUSHER_TASK = None
+    await flush_metrics()
+    LOG.info(f"Metric flusher stopped: {pending_metric_stats()}")
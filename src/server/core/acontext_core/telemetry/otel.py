@@ -2,7 +2,7 @@
 
 from typing import Optional
 
-from opentelemetry import trace, propagate
+from opentelemetry import trace, propagate, metrics
 from opentelemetry.propagators.composite import CompositePropagator
 from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
 from opentelemetry.baggage.propagation import W3CBaggagePropagator
@@ -10,6 +10,9 @@ from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.sdk.trace.sampling import TraceIdRatioBased
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.sdk.resources import Resource
 
@@ -98,6 +101,54 @@ def shutdown_otel_tracing() -> None:
         pass
 
 
+def setup_otel_metrics(
+    service_name: str = "acontext-core",
+    otlp_endpoint: Optional[str] = None,
+    service_version: str = "0.0.1",
+) -> Optional[MeterProvider]:
+    """Setup OpenTelemetry metrics export for Python Core
+
+    Instruments created through ``metrics.get_meter`` before this call
+    (e.g. the S3 histograms) are bound to the provider once it is set.
+
+    Args:
+        service_name: Service name for metrics
+        otlp_endpoint: OTLP endpoint URL (e.g., "http://localhost:4317")
+        service_version: Service version for metrics
+
+    Returns:
+        MeterProvider instance if metrics are enabled, None otherwise
+    """
+    if not otlp_endpoint:
+        return None
+
+    resource = Resource.create(
+        {
+            "service.name": service_name,
+            "service.version": service_version,
+        }
+    )
+    reader = PeriodicExportingMetricReader(
+        OTLPMetricExporter(endpoint=otlp_endpoint, insecure=True)
+    )
+    provider = MeterProvider(resource=resource, metric_readers=[reader])
+    metrics.set_meter_provider(provider)
+    return provider
+
+
+def shutdown_otel_metrics() -> None:
+    """Flush and shutdown OpenTelemetry metrics export
+
+    Safe to call even if metrics were not initialized.
+    """
+    try:
+        provider = metrics.get_meter_provider()
+        if hasattr(provider, "shutdown"):
+            provider.shutdown()
+    except Exception:
+        pass
+
+
 def instrument_fastapi(app):
     """Instrument FastAPI app with OpenTelemetry"""
     FastAPIInstrumentor.instrument_app(app, excluded_urls="/health")
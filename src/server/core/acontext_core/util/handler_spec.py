@@ -1,13 +1,15 @@
 import inspect
 from aio_pika import Message
 from pydantic import BaseModel
-from typing import Callable, get_type_hints
+from typing import Callable, get_type_hints, get_origin, get_args
 from ..schema.result import Result
 
 MUST_PARAM_ORDER_NAMES = ["body", "message"]
 MUST_PARAM_TYPES = {"message": Message}
 MUST_PARAM_SUB_TYPES = {"body": BaseModel}
 
+MUST_BATCH_PARAM_ORDER_NAMES = ["bodies", "messages"]
+
 
 def check_handler_function_sanity(func: Callable) -> Result[None]:
     type_hints = get_type_hints(func)
@@ -36,3 +38,34 @@ def check_handler_function_sanity(func: Callable) -> Result[None]:
 def get_handler_body_type(func: Callable) -> BaseModel | None:
     type_hints = get_type_hints(func)
     return type_hints["body"]
+
+
+def check_batch_handler_function_sanity(func: Callable) -> Result[None]:
+    type_hints = get_type_hints(func)
+
+    sig = inspect.signature(func)
+    params = list(sig.parameters.values())
+
+    for i, n in enumerate(MUST_BATCH_PARAM_ORDER_NAMES):
+        if params[i].name != n:
+            return Result.reject(
+                f"{i}th Parameter order mismatch: {params[i].name} != {n}"
+            )
+    for k in MUST_BATCH_PARAM_ORDER_NAMES:
+        if get_origin(type_hints[k]) is not list:
+            return Result.reject(f"Parameter type mismatch {k}:{type_hints[k]} != list")
+    if get_args(type_hints["messages"]) != (Message,):
+        return Result.reject(
+            f"Parameter type mismatch messages:{type_hints['messages']} != list[{Message}]"
+        )
+    (body_type,) = get_args(type_hints["bodies"])
+    if not issubclass(body_type, BaseModel):
+        return Result.reject(
+            f"Parameter sub type mismatch bodies:{body_type} is not subclass of {BaseModel}"
+        )
+    return Result.resolve(None)
+
+
+def get_batch_handler_body_type(func: Callable) -> BaseModel | None:
+    type_hints = get_type_hints(func)
+    return get_args(type_hints["bodies"])[0]
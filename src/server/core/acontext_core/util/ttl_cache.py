@@ -0,0 +1,121 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    Bounded in-process LRU cache whose entries expire after ``ttl_seconds``.
+
+    Entries weigh 1 unless a ``weight`` is given to ``set``, and the least
+    recently used entries are evicted once the total weight exceeds ``maxsize``.
+    ``ttl_seconds=None`` keeps entries until they are evicted.
+
+    Not thread-safe, meant to be used from the event loop only.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: Optional[float]):
+        assert maxsize > 0, "maxsize must be positive"
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Hashable, tuple[float, int, V]] = OrderedDict()
+        self._weight = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, _, value = item
+        if expires_at < time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V, weight: int = 1) -> None:
+        if weight > self.maxsize:
+            return
+        self.pop(key)
+        expires_at = (
+            time.monotonic() + self.ttl_seconds
+            if self.ttl_seconds is not None
+            else float("inf")
+        )
+        self._data[key] = (expires_at, weight, value)
+        self._weight += weight
+        while self._weight > self.maxsize:
+            _, (_, w, _) = self._data.popitem(last=False)
+            self._weight -= w
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self._weight -= item[1]
+        return item[2]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "weight": self._weight,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight(Generic[V]):
+    """
+    Deduplicate concurrent calls: callers of ``do`` with the same key while a
+    call is in flight share its result instead of starting another one.
+    If the caller running the call is cancelled, the waiting callers retry.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[V]]) -> V:
+        while (fut := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(fut)
+            except _LeaderCancelled:
+                continue
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await fn()
+        except BaseException as e:
+            # The leader's cancellation is not the followers' one
+            fut.set_exception(
+                _LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e
+            )
+            # Don't warn about an exception nobody else waited for
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,75 @@
+from typing import Optional
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """
+    In-memory cosine top-k search over a fixed set of vectors.
+
+    Exact brute force by default. With ``nlist``, the vectors are clustered by
+    k-means (IVF) and a query only scans the ``nprobe`` closest clusters,
+    trading a little recall for speed on large sets.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        nlist: int = 0,
+        kmeans_iterations: int = 10,
+        seed: int = 0,
+    ):
+        self.vectors = normalize_rows(vectors).reshape(len(vectors), -1)
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: list[np.ndarray] = []
+        if nlist and len(self.vectors) > nlist:
+            self._train(nlist, kmeans_iterations, seed)
+
+    def _train(self, nlist: int, iterations: int, seed: int) -> None:
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(len(self.vectors), nlist, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = self.vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+        assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignments == c) for c in range(nlist)]
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int = 8,
+        mask: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the indices and cosine similarities of the top `k` vectors,
+        best first. `mask` is a boolean array of the vectors to consider.
+        """
+        query = normalize_rows(query.reshape(1, -1))[0]
+        if self.centroids is None:
+            candidates = np.arange(len(self.vectors))
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            candidates = np.concatenate([self.lists[c] for c in probe])
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if k <= 0 or not len(candidates):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.vectors[candidates] @ query
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
@@ -7,12 +7,14 @@ from acontext_core.infra.async_mq import start_mq
 from acontext_core.env import LOG
 from acontext_core.telemetry.otel import (
     setup_otel_tracing,
+    setup_otel_metrics,
     instrument_fastapi,
     instrument_all_clients,
     shutdown_otel_tracing,
+    shutdown_otel_metrics,
 )
 from acontext_core.telemetry.config import TelemetryConfig
-from routers import session_router, tool_router, sandbox_router
+from routers import session_router, tool_router, sandbox_router, task_router
 
 
 # Filter to exclude /health endpoint from uvicorn access logs
@@ -39,6 +41,7 @@ logging.getLogger("uvicorn.access").addFilter(_HealthCheckFilter())
 # This ensures tracer provider is set up before instrumentation
 telemetry_config = TelemetryConfig.from_env()
 tracer_provider = None
+meter_provider = None
 if telemetry_config.enabled:
     try:
         tracer_provider = setup_otel_tracing(
@@ -47,6 +50,11 @@ if telemetry_config.enabled:
             sample_ratio=telemetry_config.sample_ratio,
             service_version=telemetry_config.service_version,
         )
+        meter_provider = setup_otel_metrics(
+            service_name=telemetry_config.service_name,
+            otlp_endpoint=telemetry_config.otlp_endpoint,
+            service_version=telemetry_config.service_version,
+        )
         # Instrument all clients (must be called before client creation)
         instrument_all_clients()
         LOG.info(
@@ -77,6 +85,11 @@ async def lifespan(app: FastAPI):
             LOG.info("OpenTelemetry tracing shutdown")
         except Exception as e:
             LOG.warning(f"Failed to shutdown OpenTelemetry tracing: {e}", exc_info=True)
+    if meter_provider:
+        try:
+            shutdown_otel_metrics()
+        except Exception as e:
+            LOG.warning(f"Failed to shutdown OpenTelemetry metrics: {e}", exc_info=True)
 
     await cleanup()
 
@@ -87,6 +100,7 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(session_router)
 app.include_router(tool_router)
 app.include_router(sandbox_router)
+app.include_router(task_router)
 
 # Instrument FastAPI app after creation and route registration
 # This is the recommended approach: instrument after app creation and route registration
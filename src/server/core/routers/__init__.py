@@ -1,9 +1,11 @@
 from .session import router as session_router
 from .tool import router as tool_router
 from .sandbox import router as sandbox_router
+from .task import router as task_router
 
 __all__ = [
     "session_router",
     "tool_router",
     "sandbox_router",
+    "task_router",
 ]
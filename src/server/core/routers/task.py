@@ -0,0 +1,34 @@
+from typing import List
+from fastapi import APIRouter, Path, Body
+from fastapi.exceptions import HTTPException
+from acontext_core.infra.db import DB_CLIENT
+from acontext_core.schema.api.request import TaskSearchRequest
+from acontext_core.schema.session.task import TaskSearchHit
+from acontext_core.schema.utils import asUUID
+from acontext_core.service.data import task_index as TI
+
+router = APIRouter(prefix="/api/v1/project/{project_id}/task", tags=["task"])
+
+
+@router.post("/search")
+async def search_project_tasks(
+    project_id: asUUID = Path(..., description="Project ID to search within"),
+    request: TaskSearchRequest = Body(..., description="Search query and filters"),
+) -> List[TaskSearchHit]:
+    """
+    Find the task descriptions, progresses and user preferences of the project
+    that are semantically closest to the query.
+    """
+    async with DB_CLIENT.get_session_context() as db_session:
+        r = await TI.search_tasks(
+            db_session,
+            project_id,
+            request.query,
+            top_k=request.top_k,
+            session_ids=request.session_ids,
+            kinds=request.kinds,
+            statuses=request.statuses,
+        )
+        if not r.ok():
+            raise HTTPException(status_code=500, detail=r.error)
+    return r.data
@@ -1,18 +1,30 @@
-import asyncio
-from datetime import date
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
 
 import pytest
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert, text
 
 from acontext_core.infra.db import DatabaseClient
 from acontext_core.schema.orm import Project, Metric
-from acontext_core.telemetry.capture_metrics import capture_increment
+from acontext_core.telemetry import capture_metrics as CM
+from acontext_core.telemetry.capture_metrics import (
+    capture_increment,
+    ensure_metric_day_index,
+    flush_metrics,
+    pending_metric_stats,
+)
 from acontext_core.telemetry.get_metrics import get_metrics
 
-
 FAKE_KEY = "b" * 32
 
 
+@pytest.fixture(autouse=True)
+def pending_metrics():
+    with patch.object(CM, "_PENDING_METRICS", {}):
+        yield
+
+
 @pytest.mark.asyncio
 async def test_capture_increment_creates_and_increments_metric():
     db_client = DatabaseClient()
@@ -35,16 +47,16 @@ async def test_capture_increment_creates_and_increments_metric():
 
     tag = "test-metric"
 
-    # Call capture_increment multiple times (including concurrently) to ensure atomicity
+    # Increments are summed in memory, then upserted across flushes
     increments = [1, 2, 3, 4]
-    await asyncio.gather(
-        *[
-            capture_increment(
-                project_id=project_id, tag=tag, increment=i, db_client=db_client
-            )
-            for i in increments
-        ]
-    )
+    for i in increments[:2]:
+        capture_increment(project_id=project_id, tag=tag, increment=i)
+    assert pending_metric_stats() == {"rows": 1, "increment": 3}
+    assert (await flush_metrics(db_client)).unpack() == (1, None)
+    assert pending_metric_stats() == {"rows": 0, "increment": 0}
+    for i in increments[2:]:
+        capture_increment(project_id=project_id, tag=tag, increment=i)
+    assert (await flush_metrics(db_client)).unpack() == (1, None)
 
     # Verify there is exactly one metric row for today and its increment is the sum
     async with db_client.get_session_context() as session:
@@ -88,12 +100,9 @@ async def test_get_metrics_returns_latest_increment():
     assert result is None
 
     # Capture some increments
-    await capture_increment(
-        project_id=project_id, tag=tag, increment=5, db_client=db_client
-    )
-    await capture_increment(
-        project_id=project_id, tag=tag, increment=10, db_client=db_client
-    )
+    capture_increment(project_id=project_id, tag=tag, increment=5)
+    capture_increment(project_id=project_id, tag=tag, increment=10)
+    await flush_metrics(db_client)
 
     # get_metrics should return the latest increment value (5 + 10 = 15)
     result = await get_metrics(project_id=project_id, tag=tag, db_client=db_client)
@@ -113,3 +122,86 @@ async def test_get_metrics_returns_latest_increment():
         project = proj_query.scalars().first()
         if project:
             await session.delete(project)
+
+
+@pytest.mark.asyncio
+async def test_flush_drops_deleted_projects_and_requeues_on_failure():
+    db_client = DatabaseClient()
+    await db_client.create_tables()
+
+    async with db_client.get_session_context() as session:
+        project = Project(
+            secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc=FAKE_KEY
+        )
+        session.add(project)
+        await session.flush()
+        project_id = project.id
+
+    tag = "test-flush-metric"
+    capture_increment(project_id=project_id, tag=tag, increment=2)
+    capture_increment(project_id=uuid.uuid4(), tag=tag, increment=7)
+
+    with patch.object(
+        db_client, "get_session_context", side_effect=RuntimeError("db down")
+    ):
+        r = await flush_metrics(db_client)
+    assert not r.ok()
+    assert pending_metric_stats() == {"rows": 2, "increment": 9}
+
+    capture_increment(project_id=project_id, tag=tag, increment=3)
+    assert (await flush_metrics(db_client)).unpack() == (1, None)
+    assert pending_metric_stats() == {"rows": 0, "increment": 0}
+    assert await get_metrics(project_id=project_id, tag=tag, db_client=db_client) == 5
+
+    async with db_client.get_session_context() as session:
+        project = await session.get(Project, project_id)
+        await session.delete(project)
+
+
+@pytest.mark.asyncio
+async def test_day_index_merges_duplicate_rows():
+    db_client = DatabaseClient()
+    await db_client.create_tables()
+
+    tag = "test-duplicate-metric"
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
+    async with db_client.get_session_context() as session:
+        project = Project(
+            secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc=FAKE_KEY
+        )
+        session.add(project)
+        await session.flush()
+        project_id = project.id
+        # Rows of older versions, which grouped days in the session timezone
+        await session.execute(text("DROP INDEX uq_metric_project_id_tag_day"))
+        await session.execute(
+            insert(Metric),
+            [
+                {"project_id": project_id, "tag": tag, "increment": i, "created_at": t}
+                for i, t in [
+                    (2, today + timedelta(hours=1)),
+                    (3, today + timedelta(hours=20)),
+                    (7, today - timedelta(hours=1)),
+                ]
+            ],
+        )
+
+    await ensure_metric_day_index(db_client)
+    # Already there, nothing to do
+    await ensure_metric_day_index(db_client)
+
+    async with db_client.get_session_context() as session:
+        result = await session.execute(
+            select(Metric.increment)
+            .where(Metric.project_id == project_id, Metric.tag == tag)
+            .order_by(Metric.created_at)
+        )
+        assert result.scalars().all() == [7, 5]
+
+    capture_increment(project_id=project_id, tag=tag, increment=1)
+    assert (await flush_metrics(db_client)).ok()
+    # Added to the merged row of today
+    assert await get_metrics(project_id=project_id, tag=tag, db_client=db_client) == 6
+
+    async with db_client.get_session_context() as session:
+        await session.delete(await session.get(Project, project_id))
@@ -0,0 +1,222 @@
+"""
+Tests for the batching mode of the MQ consumer, with fake deliveries.
+"""
+
+import asyncio
+import json
+import uuid
+import pytest
+from unittest.mock import AsyncMock
+
+from aio_pika import Message
+from acontext_core.infra.async_mq import (
+    AsyncSingleThreadMQConsumer,
+    ConnectionConfig,
+    ConsumerConfig,
+)
+from acontext_core.schema.mq.session import InsertNewMessage
+
+
+class FakeDelivery:
+    def __init__(self, body: dict):
+        self.body = json.dumps(body).encode("utf-8")
+        self.headers = {}
+        self.ack = AsyncMock()
+        self.reject = AsyncMock()
+
+
+class FakeQueueIterator:
+    def __init__(self, deliveries, delay: float, idle: float):
+        self._deliveries = list(deliveries)
+        self._delay = delay
+        self._idle = idle
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._deliveries:
+            # Stay idle for a while before the channel closes
+            await asyncio.sleep(self._idle)
+            raise StopAsyncIteration
+        await asyncio.sleep(self._delay)
+        return self._deliveries.pop(0)
+
+
+class FakeQueue:
+    def __init__(self, deliveries, delay: float = 0, idle: float = 0):
+        self._deliveries = deliveries
+        self._delay = delay
+        self._idle = idle
+
+    def iterator(self):
+        return FakeQueueIterator(self._deliveries, self._delay, self._idle)
+
+
+def _delivery(project_id, session_id) -> FakeDelivery:
+    return FakeDelivery(
+        {
+            "project_id": str(project_id),
+            "session_id": str(session_id),
+            "message_id": str(uuid.uuid4()),
+        }
+    )
+
+
+def _make_consumer(handler, **kwargs):
+    consumer = AsyncSingleThreadMQConsumer(ConnectionConfig(url="amqp://unused"))
+    config = ConsumerConfig(
+        exchange_name="ex",
+        routing_key="rk",
+        queue_name="q",
+        handler=handler,
+        max_retries=0,
+        **kwargs,
+    )
+    return consumer, config
+
+
+async def _drain(consumer: AsyncSingleThreadMQConsumer):
+    while consumer._processing_tasks:
+        await asyncio.gather(*list(consumer._processing_tasks))
+
+
+class TestBatchConsumer:
+    def test_batch_handler_signature_is_checked(self):
+        async def single(body: InsertNewMessage, message: Message):
+            pass
+
+        with pytest.raises(ValueError):
+            _make_consumer(single, batch_max_size=4)
+
+    @pytest.mark.asyncio
+    async def test_groups_by_session(self):
+        calls = []
+
+        async def handler(bodies: list[InsertNewMessage], messages: list[Message]):
+            calls.append([b.message_id for b in bodies])
+
+        project_id = uuid.uuid4()
+        s1, s2 = uuid.uuid4(), uuid.uuid4()
+        deliveries = [_delivery(project_id, s) for s in (s1, s2, s1, s1)]
+        consumer, config = _make_consumer(
+            handler, batch_max_size=4, batch_max_wait_ms=1000
+        )
+
+        await consumer._consume_batches(config, FakeQueue(deliveries))
+        await _drain(consumer)
+
+        assert sorted(len(c) for c in calls) == [1, 3]
+        for d in deliveries:
+            d.ack.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_flush_after_wait(self):
+        batches = []
+
+        async def handler(bodies: list[InsertNewMessage], messages: list[Message]):
+            batches.append(len(bodies))
+
+        project_id, session_id = uuid.uuid4(), uuid.uuid4()
+        deliveries = [_delivery(project_id, session_id) for _ in range(3)]
+        consumer, config = _make_consumer(
+            handler, batch_max_size=8, batch_max_wait_ms=30
+        )
+
+        # Deliveries arrive slower than the batch window
+        await consumer._consume_batches(
+            config, FakeQueue(deliveries, delay=0.05, idle=0.1)
+        )
+        await _drain(consumer)
+        assert batches == [1, 1, 1]
+
+    @pytest.mark.asyncio
+    async def test_failed_group_is_rejected(self):
+        async def handler(bodies: list[InsertNewMessage], messages: list[Message]):
+            raise RuntimeError("boom")
+
+        project_id, session_id = uuid.uuid4(), uuid.uuid4()
+        deliveries = [_delivery(project_id, session_id) for _ in range(2)]
+        deliveries.append(FakeDelivery({"invalid": True}))
+        consumer, config = _make_consumer(
+            handler, batch_max_size=3, batch_max_wait_ms=1000
+        )
+
+        await consumer._consume_batches(config, FakeQueue(deliveries))
+        await _drain(consumer)
+        for d in deliveries:
+            d.reject.assert_awaited_once_with(requeue=False)
+            d.ack.assert_not_awaited()
+
+
+class FakeBackpressure:
+    def __init__(self):
+        self._released = asyncio.Event()
+
+    @property
+    def saturated(self) -> bool:
+        return not self._released.is_set()
+
+    async def wait_until_unsaturated(self) -> None:
+        await self._released.wait()
+
+    def release(self) -> None:
+        self._released.set()
+
+
+class TestBackpressure:
+    @pytest.mark.asyncio
+    async def test_consumer_waits_while_saturated(self):
+        batches = []
+
+        async def handler(bodies: list[InsertNewMessage], messages: list[Message]):
+            batches.append(len(bodies))
+
+        project_id, session_id = uuid.uuid4(), uuid.uuid4()
+        deliveries = [_delivery(project_id, session_id) for _ in range(2)]
+        consumer, config = _make_consumer(
+            handler,
+            batch_max_size=2,
+            batch_max_wait_ms=1000,
+            wait_for_backpressure=True,
+        )
+        backpressure = FakeBackpressure()
+        consumer.set_backpressure(backpressure)
+
+        consuming = asyncio.create_task(
+            consumer._consume_batches(config, FakeQueue(deliveries))
+        )
+        await asyncio.sleep(0.05)
+        assert batches == []
+        assert not consumer._processing_tasks
+
+        backpressure.release()
+        await asyncio.wait_for(consuming, timeout=1)
+        await _drain(consumer)
+        assert batches == [2]
+
+    @pytest.mark.asyncio
+    async def test_other_consumers_ignore_backpressure(self):
+        batches = []
+
+        async def handler(bodies: list[InsertNewMessage], messages: list[Message]):
+            batches.append(len(bodies))
+
+        project_id, session_id = uuid.uuid4(), uuid.uuid4()
+        deliveries = [_delivery(project_id, session_id) for _ in range(2)]
+        consumer, config = _make_consumer(
+            handler, batch_max_size=2, batch_max_wait_ms=1000
+        )
+        consumer.set_backpressure(FakeBackpressure())
+
+        await asyncio.wait_for(
+            consumer._consume_batches(config, FakeQueue(deliveries)), timeout=1
+        )
+        await _drain(consumer)
+        assert batches == [2]
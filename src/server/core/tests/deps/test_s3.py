@@ -1,6 +1,7 @@
+import asyncio
 import pytest
 import json
-from acontext_core.infra.s3 import S3Client
+from acontext_core.infra.s3 import S3Client, S3IOScheduler, S3IOPriority
 
 FAKE_KEY = "a" * 32
 
@@ -26,3 +27,124 @@ async def test_s3():
 
     # await S3_CLIENT.delete_object("foo/ok.json")
     print("Upload successful!")
+
+
+async def _hold(scheduler: S3IOScheduler, priority, order: list, release):
+    async with scheduler.slot("get_object", priority):
+        order.append(priority)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_s3_scheduler_bounds_concurrency():
+    scheduler = S3IOScheduler(2)
+    running = 0
+    peak = 0
+
+    async def op():
+        nonlocal running, peak
+        async with scheduler.slot("get_object"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[op() for _ in range(10)])
+    assert peak == 2
+    assert scheduler.stats()["in_flight"] == {"ingest": 0, "sandbox": 0}
+
+
+@pytest.mark.asyncio
+async def test_s3_scheduler_serves_ingest_first():
+    scheduler = S3IOScheduler(1)
+    order = []
+    gate = asyncio.Event()
+    first = asyncio.create_task(_hold(scheduler, S3IOPriority.SANDBOX, order, gate))
+    await asyncio.sleep(0)
+    queued = [
+        asyncio.create_task(_hold(scheduler, p, order, gate))
+        for p in (S3IOPriority.SANDBOX, S3IOPriority.INGEST)
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.stats()["waiting"] == {"ingest": 1, "sandbox": 1}
+
+    gate.set()
+    await asyncio.gather(first, *queued)
+    assert order == [S3IOPriority.SANDBOX, S3IOPriority.INGEST, S3IOPriority.SANDBOX]
+
+
+@pytest.mark.asyncio
+async def test_s3_scheduler_class_limit_and_cancel():
+    scheduler = S3IOScheduler(3, class_limits={S3IOPriority.SANDBOX: 1})
+    order = []
+    gate = asyncio.Event()
+    sandbox = [
+        asyncio.create_task(_hold(scheduler, S3IOPriority.SANDBOX, order, gate))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+    # The capped class doesn't block other classes from the free slots
+    ingest = asyncio.create_task(_hold(scheduler, S3IOPriority.INGEST, order, gate))
+    await asyncio.sleep(0)
+    assert scheduler.stats()["in_flight"] == {"ingest": 1, "sandbox": 1}
+
+    # A cancelled waiter gives up its place without taking a slot
+    sandbox[1].cancel()
+    await asyncio.sleep(0)
+    assert scheduler.stats()["waiting"]["sandbox"] == 0
+
+    gate.set()
+    await asyncio.gather(sandbox[0], ingest)
+    assert scheduler.stats()["in_flight"] == {"ingest": 0, "sandbox": 0}
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+@pytest.mark.asyncio
+async def test_s3_stream_roundtrip():
+    S3_CLIENT = S3Client()
+    part_size = 5 * 1024 * 1024
+    payloads = {
+        "foo/stream-small.bin": b"x" * 1000,
+        "foo/stream-large.bin": bytes(range(256)) * (11 * 1024 * 1024 // 256),
+    }
+    try:
+        for key, data in payloads.items():
+            await S3_CLIENT.stream_upload(
+                key, _chunks(data, 1024 * 1024), part_size=part_size
+            )
+            received = []
+            async for chunk in S3_CLIENT.stream_download(key, chunk_size=1024 * 1024):
+                assert len(chunk) <= 1024 * 1024
+                received.append(chunk)
+            assert b"".join(received) == data
+        assert S3_CLIENT.scheduler.stats()["in_flight"] == {"ingest": 0, "sandbox": 0}
+    finally:
+        for key in payloads:
+            await S3_CLIENT.delete_object(key)
+        await S3_CLIENT.close()
+
+
+@pytest.mark.asyncio
+async def test_s3_stream_upload_aborts_on_failure():
+    S3_CLIENT = S3Client()
+    part_size = 5 * 1024 * 1024
+
+    async def broken():
+        yield b"x" * part_size
+        raise RuntimeError("source failed")
+
+    try:
+        with pytest.raises(RuntimeError):
+            await S3_CLIENT.stream_upload("foo/stream-broken.bin", broken())
+        assert (await S3_CLIENT.get_object_metadata("foo/stream-broken.bin")) is None
+        async with S3_CLIENT.get_client() as client:
+            uploads = await client.list_multipart_uploads(Bucket=S3_CLIENT.bucket)
+        assert not [
+            u for u in uploads.get("Uploads", []) if u["Key"] == "foo/stream-broken.bin"
+        ]
+    finally:
+        await S3_CLIENT.close()
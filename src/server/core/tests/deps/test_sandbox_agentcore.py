@@ -0,0 +1,108 @@
+"""
+Tests for the AWS AgentCore backend with a fake boto3 client that blocks.
+"""
+
+import asyncio
+import time
+import pytest
+from datetime import datetime, timezone
+
+from acontext_core.infra.sandbox.backend.aws_agentcore import (
+    AWSAgentCoreSandboxBackend,
+)
+
+
+class SleepingAgentCoreClient:
+    """Blocks like boto3 does: on the call, then between stream events."""
+
+    def __init__(self, call_delay: float, event_delay: float = 0):
+        self.call_delay = call_delay
+        self.event_delay = event_delay
+        self.events_read = 0
+
+    def get_code_interpreter_session(self, codeInterpreterIdentifier, sessionId):
+        time.sleep(self.call_delay)
+        return {
+            "status": "READY",
+            "createdAt": datetime.now(timezone.utc),
+            "sessionTimeoutSeconds": 600,
+        }
+
+    def invoke_code_interpreter(
+        self, codeInterpreterIdentifier, sessionId, name, arguments
+    ):
+        time.sleep(self.call_delay)
+        return {"stream": self._stream(arguments["command"])}
+
+    def _stream(self, command: str):
+        for line in ("a", "b", "c"):
+            time.sleep(self.event_delay)
+            self.events_read += 1
+            yield {
+                "result": {"content": [{"type": "text", "text": f"{command}:{line}\n"}]}
+            }
+        yield {"result": {"structuredContent": {"exitCode": 0}}}
+
+
+def _backend(client, **kwargs) -> AWSAgentCoreSandboxBackend:
+    return AWSAgentCoreSandboxBackend(region="us-west-2", client=client, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_blocking_calls_keep_the_loop_responsive():
+    backend = _backend(SleepingAgentCoreClient(0.3, event_delay=0.1), max_workers=4)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    outputs = await asyncio.gather(
+        *[backend.exec_command("s-1", f"echo {i}") for i in range(4)]
+    )
+    elapsed = time.perf_counter() - start
+    ticker_task.cancel()
+    await backend.close()
+
+    assert [o.stdout for o in outputs] == [
+        f"echo {i}:a\necho {i}:b\necho {i}:c\n" for i in range(4)
+    ]
+    assert all(o.exit_code == 0 for o in outputs)
+    # The four calls overlapped, and the loop kept ticking meanwhile
+    assert elapsed < 1.0
+    assert ticks >= 30
+
+
+@pytest.mark.asyncio
+async def test_calls_time_out_and_stop_reading_the_stream():
+    client = SleepingAgentCoreClient(0, event_delay=0.2)
+    backend = _backend(client, api_timeout=0.1, invoke_timeout=0.1)
+
+    start = time.perf_counter()
+    output = await backend.exec_command("s-1", "sleep")
+    assert time.perf_counter() - start < 0.2
+    assert output.exit_code == 1
+    assert "timed out" in output.stderr
+
+    # The worker drops the stream at its next event
+    await asyncio.sleep(0.5)
+    assert client.events_read <= 2
+
+    client.call_delay = 0.3
+    with pytest.raises(ValueError, match="timed out"):
+        await backend.get_sandbox("s-1")
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_bounds_concurrent_calls():
+    backend = _backend(SleepingAgentCoreClient(0.2), max_workers=2)
+    start = time.perf_counter()
+    infos = await asyncio.gather(*[backend.get_sandbox(f"s-{i}") for i in range(4)])
+    assert len(infos) == 4
+    assert time.perf_counter() - start >= 0.4
+    await backend.close()
@@ -0,0 +1,130 @@
+"""
+Tests for the cached E2B/Novita sandbox handles.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from acontext_core.infra.sandbox.backend import e2b as E2B
+from acontext_core.infra.sandbox.backend.e2b import E2BSandboxBackend
+from acontext_core.infra.sandbox.backend.handles import SandboxHandleCache
+
+
+class FakeCommandResult:
+    stdout = "ok"
+    stderr = ""
+    exit_code = 0
+
+
+class FakeSandbox:
+    def __init__(self, sandbox_id: str):
+        self.sandbox_id = sandbox_id
+        self.timeouts: list[int] = []
+        self.broken = False
+        self.commands = self
+
+    async def set_timeout(self, timeout: int):
+        self.timeouts.append(timeout)
+
+    async def run(self, cmd: str):
+        if self.broken:
+            raise RuntimeError("connection reset")
+        if cmd == "false":
+            raise E2B.CommandExitException(
+                stderr="", stdout="", exit_code=1, error=None
+            )
+        return FakeCommandResult()
+
+
+class FakeConnector:
+    def __init__(self):
+        self.connects = 0
+
+    async def __call__(self, sandbox_id: str, **kwargs) -> FakeSandbox:
+        self.connects += 1
+        await asyncio.sleep(0.01)
+        return FakeSandbox(sandbox_id)
+
+
+def _cache(connect, refresh_interval=60, keepalive=600) -> SandboxHandleCache:
+    return SandboxHandleCache(
+        connect=connect,
+        refresh=lambda sandbox, seconds: sandbox.set_timeout(seconds),
+        maxsize=2,
+        keepalive_seconds=keepalive,
+        refresh_interval_seconds=refresh_interval,
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_connects_are_shared_and_lru_bounded():
+    connect = FakeConnector()
+    cache = _cache(connect)
+    handles = await asyncio.gather(*[cache.get("a") for _ in range(5)])
+    assert connect.connects == 1
+    assert all(h is handles[0] for h in handles)
+
+    await cache.get("b")
+    await cache.get("c")
+    assert cache.stats()["size"] == 2
+    # "a" was least recently used
+    await cache.get("a")
+    assert connect.connects == 4
+
+
+@pytest.mark.asyncio
+async def test_keepalive_refresh_and_expiry():
+    connect = FakeConnector()
+    cache = _cache(connect, refresh_interval=0.05, keepalive=1)
+    sandbox = await cache.get("a")
+    assert await cache.get("a") is sandbox
+    assert sandbox.timeouts == []
+
+    await asyncio.sleep(0.06)
+    assert await cache.get("a") is sandbox
+    assert sandbox.timeouts == [1]
+
+    # Explicitly extended sandboxes are refreshed with their own timeout
+    cache.put("a", sandbox, keepalive_seconds=3)
+    await asyncio.sleep(0.06)
+    await cache.get("a")
+    assert sandbox.timeouts == [1, 3]
+    assert connect.connects == 1
+
+    with patch.object(cache, "refresh_interval_seconds", 10):
+        cache.put("a", sandbox, keepalive_seconds=0.05)
+        await asyncio.sleep(0.06)
+        # Past the sandbox keepalive, reconnect
+        assert await cache.get("a") is not sandbox
+    assert connect.connects == 2
+
+
+@pytest.mark.asyncio
+async def test_backend_reuses_handles_and_evicts_on_error():
+    connect = FakeConnector()
+    backend = E2BSandboxBackend(api_key="k", default_template="t")
+    with patch.object(E2B.AsyncSandbox, "connect", connect):
+        for _ in range(3):
+            output = await backend.exec_command("sb-1", "ls")
+            assert output.stdout == "ok"
+        assert connect.connects == 1
+
+        with pytest.raises(E2B.CommandExitException):
+            await backend.exec_command("sb-1", "false")
+        sandbox = await backend.connect_sandbox("sb-1")
+        assert connect.connects == 1
+
+        sandbox.broken = True
+        with pytest.raises(RuntimeError):
+            await backend.exec_command("sb-1", "ls")
+        await backend.exec_command("sb-1", "ls")
+        assert connect.connects == 2
+
+        with patch.object(
+            E2B.AsyncSandbox, "kill", AsyncMock(return_value=True)
+        ) as kill:
+            assert await backend.kill_sandbox("sb-1")
+            kill.assert_awaited_once()
+        await backend.connect_sandbox("sb-1")
+        assert connect.connects == 3
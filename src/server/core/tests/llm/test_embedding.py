@@ -0,0 +1,133 @@
+"""
+Tests for the embedding service: batching, the content-hash cache and dimension checks.
+"""
+
+import asyncio
+import uuid
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from acontext_core.env import DEFAULT_CORE_CONFIG
+from acontext_core.infra.redis import RedisClient
+from acontext_core.llm import embeddings as E
+from acontext_core.llm.embeddings import cache as embedding_cache
+from acontext_core.llm.embeddings.batcher import EmbeddingBatcher
+from acontext_core.llm.embeddings.cache import EmbeddingCache
+from acontext_core.llm.embeddings.fake_embedding import fake_embedding, fake_vector
+
+
+class CountingProvider:
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.batches: list[list[str]] = []
+
+    async def __call__(self, model, texts, phase):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        with patch.object(DEFAULT_CORE_CONFIG, "block_embedding_dim", self.dim):
+            return await fake_embedding(model, texts, phase)
+
+
+@pytest.fixture
+async def embedding_env():
+    redis_client = RedisClient()
+    provider = CountingProvider()
+    batcher = EmbeddingBatcher(
+        provider,
+        EmbeddingCache(1024, 60),
+        max_size=4,
+        max_wait_ms=5,
+        max_concurrency=2,
+    )
+    with (
+        patch.object(embedding_cache, "REDIS_CLIENT", redis_client),
+        patch.object(E, "EMBEDDING_BATCHER", batcher),
+        patch.multiple(
+            DEFAULT_CORE_CONFIG, block_embedding_provider="fake", block_embedding_dim=8
+        ),
+    ):
+        yield provider
+    await redis_client.close()
+
+
+def _texts(n: int) -> list[str]:
+    prefix = uuid.uuid4().hex
+    return [f"{prefix} text {i}" for i in range(n)]
+
+
+def test_fake_vectors_are_deterministic():
+    a = fake_vector("hello", 16)
+    assert np.array_equal(a, fake_vector("hello", 16))
+    assert not np.array_equal(a, fake_vector("world", 16))
+    assert np.linalg.norm(a) == pytest.approx(1, abs=1e-6)
+
+
+@pytest.mark.asyncio
+async def test_identical_texts_are_embedded_once(embedding_env):
+    texts = _texts(3)
+    r = await E.get_embedding(texts + texts[:1])
+    first, eil = r.unpack()
+    assert eil is None
+    assert first.embedding.shape == (4, 8)
+    assert np.array_equal(first.embedding[0], first.embedding[3])
+    assert embedding_env.batches == [texts]
+
+    r = await E.get_embedding(list(reversed(texts)))
+    second, _ = r.unpack()
+    assert embedding_env.batches == [texts]
+    assert np.array_equal(second.embedding, first.embedding[2::-1])
+    assert second.total_tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_batches(embedding_env):
+    texts = _texts(6)
+    results = await asyncio.gather(
+        E.get_embedding(texts[:2]),
+        E.get_embedding(texts[1:4]),
+        E.get_embedding(texts[4:]),
+    )
+    assert all(r.ok() for r in results)
+    # 6 unique texts in provider batches of at most 4
+    assert sorted(len(b) for b in embedding_env.batches) == [2, 4]
+    assert sorted(t for b in embedding_env.batches for t in b) == sorted(texts)
+    assert np.array_equal(results[0].data.embedding[1], results[1].data.embedding[0])
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_is_shared(embedding_env):
+    texts = _texts(2)
+    await E.get_embedding(texts)
+    # Another process: empty local cache, same Redis
+    with patch.object(E.EMBEDDING_BATCHER, "cache", EmbeddingCache(1024, 60)):
+        r = await E.get_embedding(texts)
+    assert r.ok()
+    assert len(embedding_env.batches) == 1
+
+
+@pytest.mark.asyncio
+async def test_dimension_mismatch_is_rejected(embedding_env):
+    embedding_env.dim = 4
+    r = await E.get_embedding(_texts(1))
+    _, eil = r.unpack()
+    assert "dimension mismatch" in str(eil)
+
+
+@pytest.mark.asyncio
+async def test_provider_errors_reach_every_request():
+    async def failing(model, texts, phase):
+        raise RuntimeError("provider down")
+
+    batcher = EmbeddingBatcher(
+        failing, EmbeddingCache(8, 60), max_size=8, max_wait_ms=5, max_concurrency=1
+    )
+    with patch.object(embedding_cache, "REDIS_CLIENT", None):
+        results = await asyncio.gather(
+            batcher.embed("m", "document", 8, [("k.a", "a")]),
+            batcher.embed("m", "document", 8, [("k.a", "a"), ("k.b", "b")]),
+            return_exceptions=True,
+        )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    await asyncio.sleep(0)
+    assert batcher.stats() == {"queued": 0, "in_flight_batches": 0}
@@ -0,0 +1,160 @@
+"""
+Tests for hedged and fallback LLM calls across configured routes.
+"""
+
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from acontext_core.env import DEFAULT_CORE_CONFIG
+from acontext_core.llm.complete import FACTORIES, llm_complete
+from acontext_core.llm.complete.anthropic_sdk import process_messages
+from acontext_core.llm.complete.hedge import LatencyTracker, race_routes
+from acontext_core.llm.complete.mock_sdk import mock_complete
+from acontext_core.llm.complete.scheduler import LLMScheduler
+from acontext_core.llm.complete.openai_sdk import convert_anthropic_assistant_message
+from acontext_core.schema.config import LLMRoute
+
+
+def _routes(*models: str) -> list[LLMRoute]:
+    return [LLMRoute(sdk="mock", model=m) for m in models]
+
+
+def _config(**overrides):
+    values = {"llm_sdk": "mock", "llm_hedge_min_delay_seconds": 0, **overrides}
+    return patch.multiple(DEFAULT_CORE_CONFIG, **values)
+
+
+def test_latency_quantile():
+    tracker = LatencyTracker(window=100)
+    route = LLMRoute(sdk="mock", model="m")
+    assert tracker.quantile(route, 0.95) is None
+    for i in range(1, 101):
+        tracker.observe(route, i / 100)
+    assert tracker.quantile(route, 0.95) == pytest.approx(0.95)
+    assert tracker.quantile(route, 0.95, min_samples=200) is None
+    # Routes are tracked separately
+    assert tracker.quantile(LLMRoute(sdk="mock", model="other"), 0.5) is None
+
+
+@pytest.mark.asyncio
+async def test_fallback_on_error():
+    with _config(llm_fallback_routes=_routes("mock-error", "mock-fallback")):
+        r = await llm_complete("Simple Hello", model="mock-error")
+    response, eil = r.unpack()
+    assert eil is None
+    assert response.content == "Hello World"
+    assert response.model == "mock-fallback"
+
+
+@pytest.mark.asyncio
+async def test_all_routes_fail():
+    with _config(llm_fallback_routes=_routes("mock-error")):
+        r = await llm_complete("Simple Hello", model="mock-error")
+    _, eil = r.unpack()
+    assert "Mock LLM error" in str(eil)
+
+
+@pytest.mark.asyncio
+async def test_hedge_slow_primary():
+    with _config(
+        llm_fallback_routes=_routes("mock-sleep-0"),
+        llm_hedge_enabled=True,
+        llm_hedge_initial_delay_seconds=0.05,
+    ):
+        r = await asyncio.wait_for(
+            llm_complete("Simple Hello", model="mock-sleep-10"), timeout=2
+        )
+    response, eil = r.unpack()
+    assert eil is None
+    assert response.model == "mock-sleep-0"
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_when_disabled():
+    with _config(
+        llm_fallback_routes=_routes("mock-sleep-0"),
+        llm_hedge_enabled=False,
+        llm_hedge_initial_delay_seconds=0,
+    ):
+        r = await llm_complete("Simple Hello", model="mock-sleep-0.05")
+    response, _ = r.unpack()
+    assert response.model == "mock-sleep-0.05"
+
+
+@pytest.mark.asyncio
+async def test_loser_is_cancelled():
+    cancelled = asyncio.Event()
+
+    async def attempt(route: LLMRoute):
+        if route.model == "slow":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return route.model
+
+    winner = await race_routes(
+        _routes("slow", "fast"), attempt, delay_of=lambda route: 0.01
+    )
+    assert winner == "fast"
+    assert cancelled.is_set()
+
+
+class _RateLimited(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={"retry-after": "0.3"})
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_pauses_before_releasing_slot():
+    started = {}
+
+    async def complete(prompt=None, model=None, **kwargs):
+        started[model] = time.monotonic()
+        if model == "rate-limited":
+            raise _RateLimited()
+        return await mock_complete(prompt, model=model, **kwargs)
+
+    scheduler = LLMScheduler(max_concurrency=1)
+    with _config(llm_fallback_routes=[]), patch(
+        "acontext_core.llm.complete.LLM_SCHEDULER", scheduler
+    ), patch.dict(FACTORIES, {"mock": complete}):
+        limited = asyncio.create_task(llm_complete("x", model="rate-limited"))
+        await asyncio.sleep(0)
+        # Queued behind the rate limited call, gets its slot once it fails
+        queued = asyncio.create_task(llm_complete("Simple Hello", model="next"))
+        _, eil = (await limited).unpack()
+        assert eil is not None
+        response, eil = (await queued).unpack()
+    assert eil is None
+    assert response.content == "Hello World"
+    assert started["next"] - started["rate-limited"] >= 0.25
+
+
+def test_history_converts_between_sdks():
+    openai_message = {
+        "role": "assistant",
+        "content": "thinking",
+        "refusal": None,
+        "tool_calls": [
+            {
+                "id": "call_1",
+                "type": "function",
+                "function": {"name": "search", "arguments": '{"q": "x"}'},
+            }
+        ],
+    }
+    anthropic_message = process_messages([openai_message])[0]
+    assert anthropic_message == {
+        "role": "assistant",
+        "content": [
+            {"type": "text", "text": "thinking"},
+            {"type": "tool_use", "id": "call_1", "name": "search", "input": {"q": "x"}},
+        ],
+    }
+    back = convert_anthropic_assistant_message(anthropic_message)
+    assert back == {k: v for k, v in openai_message.items() if k != "refusal"}
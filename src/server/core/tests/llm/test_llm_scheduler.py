@@ -0,0 +1,103 @@
+"""
+Tests for the LLM call scheduler: concurrency, fairness, budgets and saturation.
+"""
+
+import asyncio
+import pytest
+
+from acontext_core.llm.complete.scheduler import LLMScheduler, TokenBucket
+
+
+async def _hold(scheduler: LLMScheduler, project, log: list, release: asyncio.Event):
+    async with scheduler.slot(project, tokens=10):
+        log.append(project)
+        await release.wait()
+
+
+def test_token_bucket():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60, now=bucket._updated_at) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1, now=bucket._updated_at) == pytest.approx(1)
+    # Larger than the capacity only waits for a full bucket
+    assert bucket.wait_time(600, now=bucket._updated_at) == pytest.approx(60)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    scheduler = LLMScheduler(max_concurrency=2)
+    running = 0
+    max_running = 0
+
+    async def call():
+        nonlocal running, max_running
+        async with scheduler.slot("p", tokens=1):
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[call() for _ in range(6)])
+    assert max_running == 2
+    assert scheduler.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_round_robin_across_projects():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+    release = asyncio.Event()
+
+    # A burst from project a, then a single call from project b
+    tasks = [
+        asyncio.create_task(_hold(scheduler, "a", order, release)) for _ in range(3)
+    ]
+    await asyncio.sleep(0.01)
+    tasks.append(asyncio.create_task(_hold(scheduler, "b", order, release)))
+    await asyncio.sleep(0.01)
+    assert order == ["a"]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "a", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_project_budget_does_not_block_others():
+    scheduler = LLMScheduler(max_concurrency=8, project_requests_per_minute=2)
+    log = []
+    release = asyncio.Event()
+    tasks = [
+        asyncio.create_task(_hold(scheduler, p, log, release))
+        for p in ("a", "a", "a", "b")
+    ]
+    await asyncio.sleep(0.05)
+    # The third call of a waits for its budget to refill, b goes through
+    assert sorted(log) == ["a", "a", "b"]
+    assert scheduler.stats()["waiting"] == 1
+
+    release.set()
+    tasks[2].cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    stats = scheduler.stats()
+    assert (stats["in_flight"], stats["waiting"], stats["saturated"]) == (0, 0, False)
+
+
+@pytest.mark.asyncio
+async def test_saturation_signal():
+    scheduler = LLMScheduler(max_concurrency=1, saturation_queue_size=2)
+    log = []
+    release = asyncio.Event()
+    tasks = [asyncio.create_task(_hold(scheduler, "p", log, release)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert scheduler.saturated
+
+    unsaturated = asyncio.create_task(scheduler.wait_until_unsaturated())
+    await asyncio.sleep(0.01)
+    assert not unsaturated.done()
+
+    release.set()
+    await asyncio.gather(*tasks)
+    await asyncio.wait_for(unsaturated, timeout=1)
+    assert not scheduler.saturated
+    assert log == ["p", "p", "p"]
@@ -0,0 +1,223 @@
+"""
+Tests for the streaming completion path and the early tool-call dispatch.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from anthropic.types import RawMessageStreamEvent
+from openai.types.chat import ChatCompletionChunk
+from pydantic import TypeAdapter
+
+from acontext_core.env import DEFAULT_CORE_CONFIG
+from acontext_core.llm.agent import task as task_agent
+from acontext_core.llm.complete import anthropic_sdk, llm_complete_stream, openai_sdk
+from acontext_core.schema.config import LLMRoute
+from acontext_core.schema.llm import LLMToolCall
+from acontext_core.schema.result import Result
+
+
+def _stream_client(path: str, items: list, log: list) -> MagicMock:
+    async def stream():
+        for item in items:
+            log.append("chunk")
+            yield item
+
+    client = MagicMock()
+    obj = client
+    for attr in path.split("."):
+        obj = getattr(obj, attr)
+    obj.create = AsyncMock(return_value=stream())
+    return client
+
+
+def _openai_chunk(delta: dict, finish_reason=None, usage=None) -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "c",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "m",
+            "choices": (
+                [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                if delta is not None
+                else []
+            ),
+            "usage": usage,
+        }
+    )
+
+
+def _openai_tool_delta(index: int, call_id=None, name=None, arguments="") -> dict:
+    function = {"arguments": arguments}
+    if name:
+        function["name"] = name
+    return {
+        "tool_calls": [
+            {"index": index, "id": call_id, "type": "function", "function": function}
+        ]
+    }
+
+
+def _tool_call(call_id: str, name: str, arguments: dict) -> LLMToolCall:
+    return LLMToolCall(
+        id=call_id, type="function", function={"name": name, "arguments": arguments}
+    )
+
+
+@pytest.mark.asyncio
+async def test_openai_stream_hands_out_complete_tool_calls():
+    chunks = [
+        _openai_chunk({"role": "assistant", "content": "ok"}),
+        _openai_chunk(_openai_tool_delta(0, "call_0", "update_task", '{"task_')),
+        _openai_chunk(_openai_tool_delta(0, arguments='order": 1}')),
+        _openai_chunk(_openai_tool_delta(1, "call_1", "finish", "{}")),
+        _openai_chunk({}, finish_reason="tool_calls"),
+        _openai_chunk(
+            None,
+            usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        ),
+    ]
+    log = []
+    client = _stream_client("chat.completions", chunks, log)
+    with patch.object(
+        openai_sdk, "get_openai_async_client_instance", return_value=client
+    ):
+        r = await openai_sdk.openai_complete_stream(
+            prompt="hi",
+            model="m",
+            on_tool_call=lambda tc: log.append(tc.function.name),
+        )
+
+    # The first call is handed out as soon as the second one starts
+    assert log == ["chunk"] * 4 + ["update_task", "chunk", "finish", "chunk"]
+    assert [tc.function.arguments for tc in r.tool_calls] == [{"task_order": 1}, {}]
+    assert r.content == "ok"
+    assert r.usage.input_tokens == 10
+    message = r.raw_response.choices[0].message
+    assert message.tool_calls[0].function.arguments == '{"task_order": 1}'
+
+
+@pytest.mark.asyncio
+async def test_anthropic_stream_hands_out_complete_tool_calls():
+    events = TypeAdapter(list[RawMessageStreamEvent]).validate_python(
+        [
+            {
+                "type": "message_start",
+                "message": {
+                    "id": "m",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": "m",
+                    "content": [],
+                    "usage": {"input_tokens": 10, "output_tokens": 1},
+                },
+            },
+            {
+                "type": "content_block_start",
+                "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            },
+            {
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "text_delta", "text": "ok"},
+            },
+            {"type": "content_block_stop", "index": 0},
+            {
+                "type": "content_block_start",
+                "index": 1,
+                "content_block": {
+                    "type": "tool_use",
+                    "id": "call_0",
+                    "name": "update_task",
+                    "input": {},
+                },
+            },
+            {
+                "type": "content_block_delta",
+                "index": 1,
+                "delta": {"type": "input_json_delta", "partial_json": '{"task_order"'},
+            },
+            {
+                "type": "content_block_delta",
+                "index": 1,
+                "delta": {"type": "input_json_delta", "partial_json": ": 1}"},
+            },
+            {"type": "content_block_stop", "index": 1},
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "tool_use"},
+                "usage": {"output_tokens": 7},
+            },
+            {"type": "message_stop"},
+        ]
+    )
+    log = []
+    client = _stream_client("messages", events, log)
+    with patch.object(
+        anthropic_sdk, "get_anthropic_async_client_instance", return_value=client
+    ):
+        r = await anthropic_sdk.anthropic_complete_stream(
+            prompt="hi",
+            model="m",
+            on_tool_call=lambda tc: log.append(tc.function.arguments),
+        )
+
+    assert log == ["chunk"] * 8 + [{"task_order": 1}, "chunk", "chunk"]
+    assert r.content == "ok"
+    assert r.tool_calls[0].function.arguments == {"task_order": 1}
+    assert r.usage.output_tokens == 7
+
+
+@pytest.mark.asyncio
+async def test_stream_falls_back_before_any_tool_call():
+    calls = []
+    with patch.multiple(
+        DEFAULT_CORE_CONFIG,
+        llm_sdk="mock",
+        llm_fallback_routes=[LLMRoute(sdk="mock", model="mock-fallback")],
+    ):
+        r = await llm_complete_stream(
+            calls.append, "CALL_TOOL_DISK_LIST", model="mock-error"
+        )
+    response, eil = r.unpack()
+    assert eil is None
+    assert response.model == "mock-fallback"
+    assert [tc.function.name for tc in calls] == ["disk.list"]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_starts_groups_early():
+    started = []
+    release = asyncio.Event()
+
+    async def run_group(ctx, group):
+        started.append([tc.id for tc in group])
+        await release.wait()
+        return Result.resolve([f"done {tc.id}" for tc in group])
+
+    with patch.object(task_agent, "run_task_tool_group", run_group):
+        dispatcher = task_agent.TaskToolDispatcher(ctx=None)
+        dispatcher.add(_tool_call("0", "report_thinking", {"thinking": "x"}))
+        await asyncio.sleep(0)
+        assert started == [["0"]]
+
+        dispatcher.add(_tool_call("1", "insert_task", {"after_task_order": 0}))
+        dispatcher.add(_tool_call("2", "insert_task", {"after_task_order": 1}))
+        await asyncio.sleep(0)
+        # The insert batch stays open until another tool is called
+        assert started == [["0"]]
+
+        dispatcher.add(_tool_call("3", "finish", {}))
+        dispatcher.add(_tool_call("4", "unknown_tool", {}))
+        dispatcher.add(_tool_call("5", "report_thinking", {"thinking": "y"}))
+        release.set()
+        results = await dispatcher.results()
+
+    assert started == [["0"], ["1", "2"]]
+    assert [[tc.id for tc in g] for g in dispatcher.groups] == [["0"], ["1", "2"]]
+    assert [r.unpack()[0] for r in results] == [["done 0"], ["done 1", "done 2"]]
+    assert dispatcher.just_finish
+    assert dispatcher.unknown_tool == "unknown_tool"
@@ -0,0 +1,122 @@
+"""
+Tests for the prompt-cache friendly task input and the provider cache hints.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from anthropic.types import Message as AnthropicMessage
+from openai.types.chat import ChatCompletion
+
+from acontext_core.env import DEFAULT_CORE_CONFIG
+from acontext_core.llm.complete import anthropic_sdk, openai_sdk
+from acontext_core.llm.prompt.task import TaskPrompt
+
+
+def _fake_client(path: str, response) -> MagicMock:
+    client = MagicMock()
+    create = AsyncMock(return_value=response)
+    obj = client
+    for attr in path.split("."):
+        obj = getattr(obj, attr)
+    obj.create = create
+    return client
+
+
+def test_task_input_blocks_keep_the_prompt():
+    args = ("- progress", "<message id=0> hi </message>", "- Task 1: x")
+    blocks = TaskPrompt.pack_task_input_blocks(*args)
+    assert "".join(b["text"] for b in blocks) == TaskPrompt.pack_task_input(*args)
+    # Only the task list is in the cached prefix
+    assert blocks[0]["cache_control"] == {"type": "ephemeral"}
+    assert "- Task 1: x" in blocks[0]["text"]
+    assert "hi" not in blocks[0]["text"]
+    assert "cache_control" not in blocks[1]
+
+
+@pytest.mark.asyncio
+async def test_openai_prompt_cache_key_and_usage():
+    response = ChatCompletion.model_validate(
+        {
+            "id": "c",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "m",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "ok"},
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 2000,
+                "completion_tokens": 10,
+                "total_tokens": 2010,
+                "prompt_tokens_details": {"cached_tokens": 1536},
+            },
+        }
+    )
+    client = _fake_client("chat.completions", response)
+    blocks = TaskPrompt.pack_task_input_blocks("", "", "")
+    with (
+        patch.object(DEFAULT_CORE_CONFIG, "llm_prompt_cache_enabled", True),
+        patch.object(
+            openai_sdk, "get_openai_async_client_instance", return_value=client
+        ),
+    ):
+        r = await openai_sdk.openai_complete(
+            model="m",
+            system_prompt="system",
+            history_messages=[{"role": "user", "content": blocks}],
+            prompt_kwargs={"prompt_id": "agent.task"},
+        )
+
+    kwargs = client.chat.completions.create.await_args.kwargs
+    assert kwargs["prompt_cache_key"] == "agent.task"
+    sent_blocks = kwargs["messages"][1]["content"]
+    assert all("cache_control" not in b for b in sent_blocks)
+    assert [b["text"] for b in sent_blocks] == [b["text"] for b in blocks]
+    assert r.usage.cached_tokens == 1536
+    assert r.usage.input_tokens == 2000
+
+
+@pytest.mark.asyncio
+async def test_anthropic_cache_breakpoints_and_usage():
+    response = AnthropicMessage.model_validate(
+        {
+            "id": "m",
+            "type": "message",
+            "role": "assistant",
+            "model": "m",
+            "content": [{"type": "text", "text": "ok"}],
+            "stop_reason": "end_turn",
+            "usage": {
+                "input_tokens": 100,
+                "output_tokens": 10,
+                "cache_read_input_tokens": 1800,
+                "cache_creation_input_tokens": 50,
+            },
+        }
+    )
+    client = _fake_client("messages", response)
+    blocks = TaskPrompt.pack_task_input_blocks("", "", "")
+    with (
+        patch.object(DEFAULT_CORE_CONFIG, "llm_prompt_cache_enabled", True),
+        patch.object(
+            anthropic_sdk, "get_anthropic_async_client_instance", return_value=client
+        ),
+    ):
+        r = await anthropic_sdk.anthropic_complete(
+            model="m",
+            system_prompt="system",
+            history_messages=[{"role": "user", "content": blocks}],
+        )
+
+    kwargs = client.messages.create.await_args.kwargs
+    assert kwargs["system"] == [
+        {"type": "text", "text": "system", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert kwargs["messages"][0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert r.usage.cached_tokens == 1800
+    assert r.usage.input_tokens == 1950
@@ -0,0 +1,261 @@
+"""
+Tests that task tools keep TaskCtx in sync with the DB without re-querying.
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from acontext_core.llm.agent import task as task_agent
+from acontext_core.llm.agent.task import (
+    build_task_ctx,
+    group_tool_calls,
+    run_task_tool_call,
+    run_task_tool_group,
+    tool_call_access,
+)
+from acontext_core.llm.tool.executor import run_tool_calls
+from acontext_core.llm.tool.task_lib import insert as insert_tool
+from acontext_core.llm.tool.task_tools import TASK_TOOLS
+from acontext_core.schema.orm import Project, Session, Message, Task
+from acontext_core.schema.session.message import MessageBlob
+from acontext_core.schema.llm import LLMToolCall
+from acontext_core.service.data import task as TD
+from acontext_core.infra.db import DatabaseClient
+
+FAKE_ASSET = {
+    "bucket": "b",
+    "s3_key": "k",
+    "etag": "e",
+    "sha256": "s",
+    "mime": "application/json",
+    "size_b": 1,
+}
+
+
+async def _seed(session, n_tasks: int, n_messages: int):
+    project = Project(
+        secret_key_hmac="test_key_hmac", secret_key_hash_phc="test_key_hash"
+    )
+    session.add(project)
+    await session.flush()
+    test_session = Session(project_id=project.id)
+    session.add(test_session)
+    await session.flush()
+    tasks = []
+    for i in range(n_tasks):
+        task = Task(
+            project_id=project.id,
+            session_id=test_session.id,
+            order=i + 1,
+            data={"task_description": f"Task {i + 1}"},
+            status="pending",
+        )
+        session.add(task)
+        tasks.append(task)
+    await session.flush()
+    base = datetime.now(timezone.utc)
+    messages = []
+    for i in range(n_messages):
+        m = Message(
+            session_id=test_session.id,
+            role="user",
+            parts_asset_meta=FAKE_ASSET,
+            # The first message is already linked from a previous run
+            task_id=tasks[0].id if i == 0 else None,
+        )
+        session.add(m)
+        await session.flush()
+        m.created_at = base + timedelta(seconds=i)
+        messages.append(m)
+    await session.flush()
+    return project, test_session, tasks, messages
+
+
+class TestTaskCtxIncrementalUpdates:
+    @pytest.mark.asyncio
+    async def test_tool_calls_keep_ctx_in_sync(self):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project, test_session, tasks, messages = await _seed(session, 3, 5)
+            blobs = [
+                MessageBlob(message_id=m.id, role="user", parts=[])
+                for m in messages[1:]
+            ]
+            r = await build_task_ctx(session, project.id, test_session.id, blobs)
+            ctx, eil = r.unpack()
+            assert eil is None
+
+            calls = [
+                ("insert_task", {"after_task_order": 1, "task_description": "New"}),
+                ("insert_task", {"after_task_order": 0, "task_description": "First"}),
+                ("update_task", {"task_order": 4, "task_status": "success"}),
+                (
+                    "append_messages_to_task",
+                    {
+                        "task_order": 2,
+                        "message_ids": [2, 0],
+                        "progress": "did a thing",
+                        "user_preference_and_infos": "likes tests",
+                    },
+                ),
+                (
+                    "append_messages_to_task",
+                    {"task_order": 3, "message_ids": [1], "progress": "next"},
+                ),
+                # Moves message 2 away from task 2
+                ("append_messages_to_planning_section", {"message_ids": [2, 3]}),
+                ("update_task", {"task_order": 5, "task_description": "Renamed"}),
+            ]
+            replies = []
+            with patch.object(insert_tool, "capture_increment"):
+                for name, arguments in calls:
+                    r = await TASK_TOOLS[name].handler(ctx, arguments)
+                    assert r.ok(), r
+                    replies.append(r.data)
+            # Replies use the 1-based orders, not the sparse sort keys
+            assert replies[:3] == [
+                "Task 2 created",
+                "Task 1 created",
+                "Task 4 updated",
+            ]
+            assert replies[-1] == "Task 5 updated"
+
+            r = await TD.fetch_current_tasks(session, test_session.id)
+            db_tasks, eil = r.unpack()
+            assert eil is None
+            assert ctx.task_index == db_tasks
+            assert ctx.task_ids_index == [t.id for t in db_tasks]
+            assert [t.data.task_description for t in db_tasks] == [
+                "First",
+                "Task 1",
+                "New",
+                "Task 2",
+                "Renamed",
+            ]
+            assert db_tasks[1].raw_message_ids == [messages[0].id, messages[1].id]
+            assert db_tasks[1].data.progresses == ["did a thing"]
+
+            await session.delete(test_session)
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_turn_keeps_ctx_in_sync(self):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        # Tool calls commit in their own DB sessions, so seed in a committed one
+        async with db_client.get_session_context() as session:
+            project, test_session, tasks, messages = await _seed(session, 3, 5)
+            blobs = [
+                MessageBlob(message_id=m.id, role="user", parts=[])
+                for m in messages[1:]
+            ]
+            r = await build_task_ctx(session, project.id, test_session.id, blobs)
+            ctx, eil = r.unpack()
+            assert eil is None
+
+        arguments = [
+            ("report_thinking", {"thinking": "plan"}),
+            (
+                "append_messages_to_task",
+                {"task_order": 1, "message_ids": [0], "progress": "p1"},
+            ),
+            (
+                "append_messages_to_task",
+                {"task_order": 2, "message_ids": [1, 2], "progress": "p2"},
+            ),
+            ("update_task", {"task_order": 3, "task_status": "failed"}),
+            ("append_messages_to_planning_section", {"message_ids": [3]}),
+            ("insert_task", {"after_task_order": 3, "task_description": "Last"}),
+            ("update_task", {"task_order": 4, "task_status": "success"}),
+        ]
+        calls = [
+            LLMToolCall(
+                id=str(i),
+                type="function",
+                function={"name": name, "arguments": args},
+            )
+            for i, (name, args) in enumerate(arguments)
+        ]
+        with (
+            patch.object(insert_tool, "capture_increment"),
+            patch.object(task_agent, "DB_CLIENT", db_client),
+        ):
+            results = await run_tool_calls(
+                calls,
+                access=tool_call_access,
+                run=lambda tc: run_task_tool_call(ctx, tc),
+            )
+        assert all(r.ok() for r in results), results
+
+        async with db_client.get_session_context() as session:
+            r = await TD.fetch_current_tasks(session, test_session.id)
+            db_tasks, eil = r.unpack()
+            assert eil is None
+            assert ctx.task_index == db_tasks
+            assert [t.status for t in db_tasks] == [
+                "running",
+                "running",
+                "failed",
+                "success",
+            ]
+            assert db_tasks[1].raw_message_ids == [messages[2].id, messages[3].id]
+            await session.delete(await session.get(Session, test_session.id))
+            await session.delete(await session.get(Project, project.id))
+
+    @pytest.mark.asyncio
+    async def test_grouped_inserts_keep_ctx_in_sync(self):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project, test_session, tasks, messages = await _seed(session, 2, 1)
+            r = await build_task_ctx(session, project.id, test_session.id, [])
+            ctx, eil = r.unpack()
+            assert eil is None
+
+        arguments = [
+            ("insert_task", {"after_task_order": 0, "task_description": "First"}),
+            ("insert_task", {"after_task_order": 2, "task_description": "Middle"}),
+            ("insert_task", {"after_task_order": 9, "task_description": "Last"}),
+            ("update_task", {"task_order": 1, "task_status": "running"}),
+        ]
+        calls = [
+            LLMToolCall(
+                id=str(i),
+                type="function",
+                function={"name": name, "arguments": args},
+            )
+            for i, (name, args) in enumerate(arguments)
+        ]
+        groups = group_tool_calls(calls)
+        assert [len(g) for g in groups] == [3, 1]
+
+        with (
+            patch.object(insert_tool, "capture_increment"),
+            patch.object(task_agent, "DB_CLIENT", db_client),
+        ):
+            for group in groups:
+                r = await run_task_tool_group(ctx, group)
+                contents, eil = r.unpack()
+                assert eil is None
+                assert len(contents) == len(group)
+
+        async with db_client.get_session_context() as session:
+            r = await TD.fetch_current_tasks(session, test_session.id)
+            db_tasks, eil = r.unpack()
+            assert eil is None
+            assert ctx.task_index == db_tasks
+            assert [t.data.task_description for t in db_tasks] == [
+                "First",
+                "Task 1",
+                "Middle",
+                "Task 2",
+                "Last",
+            ]
+            assert db_tasks[0].status == "running"
+            await session.delete(await session.get(Session, test_session.id))
+            await session.delete(await session.get(Project, project.id))
@@ -0,0 +1,96 @@
+"""
+Tests for the dependency-aware tool call executor.
+"""
+
+import asyncio
+import pytest
+
+from acontext_core.llm.tool.base import ToolAccess
+from acontext_core.llm.tool.executor import ToolCallRunner, run_tool_calls
+from acontext_core.schema.result import Result
+
+
+def _access(reads=(), writes=()) -> ToolAccess:
+    return ToolAccess(reads=frozenset(reads), writes=frozenset(writes))
+
+
+class Recorder:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.started = []
+
+    async def run(self, call) -> Result[str]:
+        name, _, delay, ok = call
+        self.started.append(name)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(delay)
+        self.running -= 1
+        return Result.resolve(name) if ok else Result.reject(f"{name} failed")
+
+
+class TestRunToolCalls:
+    @pytest.mark.asyncio
+    async def test_independent_calls_run_concurrently_in_order(self):
+        rec = Recorder()
+        calls = [
+            ("a", _access(writes={"task.1"}), 0.05, True),
+            ("b", _access(writes={"task.2"}), 0.01, True),
+            ("think", _access(), 0.0, True),
+        ]
+        results = await run_tool_calls(calls, lambda c: c[1], rec.run)
+        assert [r.data for r in results] == ["a", "b", "think"]
+        assert rec.peak == 3
+
+    @pytest.mark.asyncio
+    async def test_conflicting_calls_keep_their_order(self):
+        rec = Recorder()
+        calls = [
+            ("update", _access(reads={"ordering"}, writes={"task.1"}), 0.02, True),
+            ("insert", _access(writes={"ordering"}), 0.0, True),
+            ("append", _access(reads={"ordering"}, writes={"task.2"}), 0.0, True),
+            ("unknown", None, 0.0, True),
+        ]
+        results = await run_tool_calls(calls, lambda c: c[1], rec.run)
+        assert rec.started == ["update", "insert", "append", "unknown"]
+        assert rec.peak == 1
+        assert all(r.ok() for r in results)
+
+    @pytest.mark.asyncio
+    async def test_failure_skips_dependents_only(self):
+        rec = Recorder()
+        calls = [
+            ("a", _access(writes={"task.1"}), 0.01, False),
+            ("b", _access(writes={"task.1"}), 0.0, True),
+            ("c", _access(writes={"task.2"}), 0.0, True),
+        ]
+        results = await run_tool_calls(calls, lambda c: c[1], rec.run)
+        assert [r.ok() for r in results] == [False, False, True]
+        assert "b" not in rec.started
+
+    @pytest.mark.asyncio
+    async def test_failure_skips_calls_not_started(self):
+        rec = Recorder()
+        calls = [
+            ("a", _access(writes={"task.1"}), 0.0, False),
+            ("b", _access(writes={"task.2"}), 0.02, True),
+            ("c", _access(writes={"task.2"}), 0.0, True),
+        ]
+        results = await run_tool_calls(calls, lambda c: c[1], rec.run)
+        # b was already running and keeps its changes, c waited for it
+        assert [r.ok() for r in results] == [False, True, False]
+        assert rec.started == ["a", "b"]
+        assert "tool call 0 failed" in results[2].error.errmsg
+
+    @pytest.mark.asyncio
+    async def test_failure_skips_later_submissions(self):
+        rec = Recorder()
+        runner = ToolCallRunner(lambda c: c[1], rec.run)
+        runner.submit(("a", _access(writes={"task.1"}), 0.0, False))
+        await asyncio.sleep(0.01)
+        # e.g. streamed after the first call failed
+        runner.submit(("b", _access(writes={"task.2"}), 0.0, True))
+        results = await runner.results()
+        assert [r.ok() for r in results] == [False, False]
+        assert rec.started == ["a"]
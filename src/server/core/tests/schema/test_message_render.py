@@ -0,0 +1,59 @@
+import uuid
+from unittest.mock import patch
+
+from acontext_core.schema.orm import Part
+from acontext_core.schema.session import message as message_module
+from acontext_core.schema.session.message import MessageBlob
+
+
+def _tool_call_blob(call_id: str) -> MessageBlob:
+    return MessageBlob(
+        message_id=uuid.uuid4(),
+        role="assistant",
+        parts=[
+            Part(
+                type="tool-call",
+                meta={"id": call_id, "name": "search", "arguments": '{"q": "x"}'},
+            )
+        ],
+    )
+
+
+def _tool_result_blob(call_id: str) -> MessageBlob:
+    return MessageBlob(
+        message_id=uuid.uuid4(),
+        role="user",
+        parts=[Part(type="tool-result", text="ok", meta={"tool_call_id": call_id})],
+    )
+
+
+def test_render_is_reused():
+    blob = _tool_call_blob("call_1")
+    first_mapping = {}
+    first = blob.to_string(first_mapping, truncate_chars=256)
+
+    second_mapping = {}
+    with patch.object(message_module, "pack_part_line") as pack_part_line:
+        second = blob.to_string(second_mapping, truncate_chars=256)
+    pack_part_line.assert_not_called()
+    assert second == first
+    # The tool calls of the message are registered on a hit as well
+    assert second_mapping == first_mapping
+    assert second_mapping["call_1"].name == "search"
+
+    # Another truncate length is rendered separately
+    assert blob.to_string({}, truncate_chars=8) == first[:8] + "[...truncated]"
+
+
+def test_render_depends_on_previous_tool_calls():
+    call = _tool_call_blob("call_2")
+    result = _tool_result_blob("call_2")
+
+    unlinked = result.to_string({})
+    tool_mapping = {}
+    call.to_string(tool_mapping)
+    linked = result.to_string(tool_mapping)
+
+    assert unlinked == '<user>(tool-result) {"result": "ok"}'
+    assert linked == '<user>(tool-result) {"tool_name": "search", "result": "ok"}'
+    assert result.to_string({}) == unlinked
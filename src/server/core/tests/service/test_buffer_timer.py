@@ -0,0 +1,78 @@
+"""
+Tests for the debounced session buffer flush scheduler.
+"""
+
+import time
+import uuid
+import pytest
+from unittest.mock import patch
+
+from acontext_core.service import buffer_timer as BT
+from acontext_core.schema.mq.session import InsertNewMessage
+from acontext_core.infra.redis import RedisClient
+
+
+@pytest.fixture
+async def redis_client():
+    client_instance = RedisClient()
+    with patch.object(BT, "REDIS_CLIENT", client_instance):
+        async with client_instance.get_client_context() as client:
+            await client.delete(BT.BUFFER_TIMER_KEY, BT.BUFFER_TIMER_PAYLOAD_KEY)
+        yield client_instance
+        async with client_instance.get_client_context() as client:
+            await client.delete(BT.BUFFER_TIMER_KEY, BT.BUFFER_TIMER_PAYLOAD_KEY)
+    await client_instance.close()
+
+
+def _body(project_id, session_id) -> InsertNewMessage:
+    return InsertNewMessage(
+        project_id=project_id, session_id=session_id, message_id=uuid.uuid4()
+    )
+
+
+class TestBufferTimer:
+    @pytest.mark.asyncio
+    async def test_single_deadline_per_session(self, redis_client):
+        project_id, session_id = uuid.uuid4(), uuid.uuid4()
+        bodies = [_body(project_id, session_id) for _ in range(5)]
+        for b in bodies:
+            assert await BT.schedule_buffer_flush(b, 10)
+
+        now = time.time()
+        assert await BT.lease_due_buffer_flushes(now=now) == []
+
+        leases = await BT.lease_due_buffer_flushes(now=now + 11)
+        assert len(leases) == 1
+        member, leased_score, body = leases[0]
+        # The last message wins
+        assert body == bodies[-1]
+
+        assert await BT.ack_buffer_flush(member, leased_score)
+        assert await BT.lease_due_buffer_flushes(now=now + 1000) == []
+
+    @pytest.mark.asyncio
+    async def test_unacked_lease_is_notified_again(self, redis_client):
+        b = _body(uuid.uuid4(), uuid.uuid4())
+        await BT.schedule_buffer_flush(b, 0)
+
+        now = time.time() + 1
+        assert len(await BT.lease_due_buffer_flushes(now=now)) == 1
+        # Leased, not due again until the lease expires
+        assert await BT.lease_due_buffer_flushes(now=now + 1) == []
+        leases = await BT.lease_due_buffer_flushes(now=now + 1000)
+        assert [lease[2] for lease in leases] == [b]
+
+    @pytest.mark.asyncio
+    async def test_new_message_during_lease_is_kept(self, redis_client):
+        project_id, session_id = uuid.uuid4(), uuid.uuid4()
+        await BT.schedule_buffer_flush(_body(project_id, session_id), 0)
+        [(member, leased_score, _)] = await BT.lease_due_buffer_flushes(
+            now=time.time() + 1
+        )
+
+        newer = _body(project_id, session_id)
+        await BT.schedule_buffer_flush(newer, 10)
+        assert not await BT.ack_buffer_flush(member, leased_score)
+
+        leases = await BT.lease_due_buffer_flushes(now=time.time() + 11)
+        assert [lease[2] for lease in leases] == [newer]
@@ -0,0 +1,187 @@
+"""
+Tests for the Redis pending message index.
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from acontext_core.service.data import message as MD
+from acontext_core.service.data import message_index as MI
+from acontext_core.schema.orm import Project, Session, Message
+from acontext_core.schema.session.task import TaskStatus
+from acontext_core.infra.db import DatabaseClient
+from acontext_core.infra.redis import RedisClient
+
+FAKE_ASSET = {
+    "bucket": "b",
+    "s3_key": "k",
+    "etag": "e",
+    "sha256": "s",
+    "mime": "application/json",
+    "size_b": 1,
+}
+
+
+@pytest.fixture
+async def redis_client():
+    client_instance = RedisClient()
+    with patch.object(MI, "REDIS_CLIENT", client_instance):
+        yield client_instance
+    await client_instance.close()
+
+
+async def _seed_session(session, n_messages: int):
+    project = Project(
+        secret_key_hmac="test_key_hmac", secret_key_hash_phc="test_key_hash"
+    )
+    session.add(project)
+    await session.flush()
+    test_session = Session(project_id=project.id)
+    session.add(test_session)
+    await session.flush()
+    messages = [
+        await _add_message(session, test_session.id, i) for i in range(n_messages)
+    ]
+    return project, test_session, messages
+
+
+async def _add_message(session, session_id, nth: int):
+    # Rows of one transaction share now(), so spread created_at explicitly
+    m = Message(session_id=session_id, role="user", parts_asset_meta=FAKE_ASSET)
+    session.add(m)
+    await session.flush()
+    m.created_at = datetime.now(timezone.utc) + timedelta(seconds=nth)
+    await session.flush()
+    return m
+
+
+class TestPendingMessageIndex:
+    @pytest.mark.asyncio
+    async def test_index_miss_rebuilds_from_db(self, redis_client):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project, test_session, messages = await _seed_session(session, 3)
+            await MI.drop_pending_index(test_session.id)
+
+            r = await MD.get_pending_message_summary(
+                session, test_session.id, new_message_ids=[messages[-1].id]
+            )
+            (count, latest), eil = r.unpack()
+            assert eil is None
+            assert count == 3
+            assert latest == messages[-1].id
+
+            # Index hit: a new message is counted without touching the DB
+            m = await _add_message(session, test_session.id, 3)
+            assert await MI.record_pending_messages(test_session.id, [m.id]) == (
+                4,
+                m.id,
+            )
+            # Redelivery of the same message is idempotent
+            assert await MI.record_pending_messages(test_session.id, [m.id]) == (
+                4,
+                m.id,
+            )
+
+            await MI.drop_pending_index(test_session.id)
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_status_update_removes_messages(self, redis_client):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project, test_session, messages = await _seed_session(session, 3)
+            await MI.drop_pending_index(test_session.id)
+            await MD.get_pending_message_summary(session, test_session.id)
+
+        async with db_client.get_session_context() as session:
+            await MD.update_message_status_to(
+                session, [m.id for m in messages[:2]], TaskStatus.RUNNING
+            )
+            # The index only changes once the update commits
+            assert (await MI.record_pending_messages(test_session.id))[0] == 3
+        assert await MI.record_pending_messages(test_session.id) == (
+            1,
+            messages[-1].id,
+        )
+
+        async with db_client.get_session_context() as session:
+
+            # A retried delivery of a processed message is not pending again
+            summary = await MI.record_pending_messages(
+                test_session.id, [messages[0].id]
+            )
+            assert summary == (1, messages[-1].id)
+
+            await MI.drop_pending_index(test_session.id)
+            await session.delete(await session.get(Project, project.id))
+
+    @pytest.mark.asyncio
+    async def test_rolled_back_status_update_keeps_index(self, redis_client):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project, test_session, messages = await _seed_session(session, 2)
+            await MI.drop_pending_index(test_session.id)
+            await MD.get_pending_message_summary(session, test_session.id)
+
+        with pytest.raises(RuntimeError):
+            async with db_client.get_session_context() as session:
+                await MD.unpending_session_messages_to_running(
+                    session, test_session.id, limit=2
+                )
+                raise RuntimeError("commit never happens")
+        # Still pending in the DB, so still pending in the index
+        assert await MI.record_pending_messages(test_session.id) == (
+            2,
+            messages[-1].id,
+        )
+
+        async with db_client.get_session_context() as session:
+            await MI.drop_pending_index(test_session.id)
+            await session.delete(await session.get(Project, project.id))
+
+    @pytest.mark.asyncio
+    async def test_reconcile_removes_stale_entries(self, redis_client):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project, test_session, messages = await _seed_session(session, 2)
+            await MI.drop_pending_index(test_session.id)
+            await MD.get_pending_message_summary(session, test_session.id)
+
+            # Status changed behind the index's back
+            messages[0].session_task_process_status = TaskStatus.SUCCESS.value
+            await session.flush()
+            assert (await MI.record_pending_messages(test_session.id))[0] == 2
+
+            r = await MD.reconcile_pending_index(session, test_session.id)
+            assert r.unpack() == (1, None)
+            assert await MI.record_pending_messages(test_session.id) == (
+                1,
+                messages[1].id,
+            )
+
+            await MI.drop_pending_index(test_session.id)
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_fallback_to_db_without_redis(self):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        broken = RedisClient(redis_url="redis://127.0.0.1:1")
+        with patch.object(MI, "REDIS_CLIENT", broken):
+            async with db_client.get_session_context() as session:
+                project, test_session, messages = await _seed_session(session, 2)
+                r = await MD.get_pending_message_summary(session, test_session.id)
+                assert r.unpack() == ((2, messages[-1].id), None)
+                await session.delete(project)
+        await broken.close()
@@ -0,0 +1,97 @@
+"""
+Tests for the message parts cache.
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from acontext_core.service.data import message as MD
+from acontext_core.util.ttl_cache import TTLCache
+
+PARTS = [{"type": "text", "text": "hello", "meta": {"lang": "en"}}]
+
+
+def _asset(sha256: str) -> dict:
+    return {
+        "bucket": "b",
+        "s3_key": f"parts/{sha256}.json",
+        "etag": "e",
+        "sha256": sha256,
+        "mime": "application/json",
+        "size_b": 64,
+    }
+
+
+@pytest.fixture
+def s3_download():
+    async def download(key: str) -> bytes:
+        await asyncio.sleep(0.05)
+        return json.dumps(PARTS).encode("utf-8")
+
+    mock = AsyncMock(side_effect=download)
+    with (
+        patch.object(MD.S3_CLIENT, "download_object", mock),
+        patch.object(MD, "PARTS_CACHE", TTLCache(maxsize=1024, ttl_seconds=None)),
+    ):
+        yield mock
+
+
+class TestMessagePartsCache:
+    @pytest.mark.asyncio
+    async def test_repeated_fetch_hits_cache(self, s3_download):
+        for _ in range(3):
+            r = await MD._fetch_message_parts(_asset("a"))
+            parts, eil = r.unpack()
+            assert eil is None
+            assert parts[0].text == "hello"
+        assert s3_download.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_edits_do_not_reach_the_cache(self, s3_download):
+        parts = (await MD._fetch_message_parts(_asset("d"))).data
+        parts[0].text = "edited"
+        parts[0].meta["lang"] = "fr"
+        parts.append(parts[0])
+
+        parts = (await MD._fetch_message_parts(_asset("d"))).data
+        assert len(parts) == 1
+        assert parts[0].text == "hello"
+        assert parts[0].meta == {"lang": "en"}
+        assert s3_download.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_fetches_are_coalesced(self, s3_download):
+        results = await asyncio.gather(
+            *[MD._fetch_message_parts(_asset("b")) for _ in range(8)],
+            MD._fetch_message_parts(_asset("c")),
+        )
+        assert all(r.ok() for r in results)
+        assert s3_download.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_fetch_is_not_cached(self, s3_download):
+        s3_download.side_effect = RuntimeError("s3 down")
+        r = await MD._fetch_message_parts(_asset("d"))
+        assert not r.ok()
+
+        s3_download.side_effect = None
+        s3_download.return_value = json.dumps(PARTS).encode("utf-8")
+        r = await MD._fetch_message_parts(_asset("d"))
+        assert r.ok()
+        assert s3_download.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_fetch_does_not_cancel_the_others(self, s3_download):
+        leader = asyncio.create_task(MD._fetch_message_parts(_asset("e")))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(MD._fetch_message_parts(_asset("e")))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        r = await follower
+        assert r.ok()
+        assert leader.cancelled()
+        # The follower fetched again in place of the cancelled leader
+        assert s3_download.await_count == 2
@@ -0,0 +1,145 @@
+"""
+Tests for the project config cache.
+"""
+
+import asyncio
+import uuid
+import pytest
+from unittest.mock import patch
+
+from acontext_core.service.data import project as PD
+from acontext_core.schema.orm import Project
+from acontext_core.infra.db import DatabaseClient
+from acontext_core.infra.redis import RedisClient
+from acontext_core.util.ttl_cache import TTLCache
+
+
+@pytest.fixture
+async def redis_client():
+    client_instance = RedisClient()
+    with patch.object(PD, "REDIS_CLIENT", client_instance):
+        yield client_instance
+    await client_instance.close()
+
+
+@pytest.fixture
+def project_config_cache():
+    cache = TTLCache(maxsize=16, ttl_seconds=60)
+    with patch.object(PD, "PROJECT_CONFIG_CACHE", cache):
+        yield cache
+
+
+class TestTTLCache:
+    def test_lru_eviction_and_stats(self):
+        cache = TTLCache(maxsize=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats() == {
+            "size": 2,
+            "weight": 2,
+            "maxsize": 2,
+            "hits": 2,
+            "misses": 1,
+        }
+
+    def test_weighted_eviction(self):
+        cache = TTLCache(maxsize=10, ttl_seconds=None)
+        cache.set("a", 1, weight=6)
+        cache.set("b", 2, weight=3)
+        cache.set("c", 3, weight=4)
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        # Larger than the whole cache, never stored
+        cache.set("d", 4, weight=11)
+        assert cache.get("d") is None
+        assert cache.stats()["weight"] == 7
+
+    def test_expiration(self):
+        cache = TTLCache(maxsize=2, ttl_seconds=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+class TestProjectConfigCache:
+    @pytest.mark.asyncio
+    async def test_cached_until_invalidated(self, redis_client, project_config_cache):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac="test_key_hmac",
+                secret_key_hash_phc="test_key_hash",
+                configs={
+                    "project_config": {"project_session_message_buffer_max_turns": 4}
+                },
+            )
+            session.add(project)
+            await session.flush()
+
+            r = await PD.get_project_config(session, project.id)
+            config, eil = r.unpack()
+            assert eil is None
+            assert config.project_session_message_buffer_max_turns == 4
+
+            project.configs = {
+                "project_config": {"project_session_message_buffer_max_turns": 8}
+            }
+            await session.flush()
+            r = await PD.get_project_config(session, project.id)
+            assert r.data.project_session_message_buffer_max_turns == 4
+            assert project_config_cache.hits == 1
+
+            await PD.invalidate_project_config(project.id)
+            r = await PD.get_project_config(session, project.id)
+            assert r.data.project_session_message_buffer_max_turns == 8
+
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_missing_project_is_not_cached(self, project_config_cache):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac="test_key_hmac", secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            await session.delete(project)
+            await session.flush()
+
+            r = await PD.get_project_config(session, project.id)
+            assert not r.ok()
+            assert len(project_config_cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_invalidation_broadcast(self, redis_client, project_config_cache):
+        project_id = uuid.uuid4()
+        listener = asyncio.create_task(PD.listen_project_config_invalidation())
+        try:
+            # Wait for the subscription, which clears the cache
+            await asyncio.sleep(0.3)
+            project_config_cache.set("other", PD.DEFAULT_PROJECT_CONFIG)
+            project_config_cache.set(project_id, PD.DEFAULT_PROJECT_CONFIG)
+
+            async with redis_client.get_client_context() as client:
+                await client.publish(
+                    PD.PROJECT_CONFIG_INVALIDATE_CHANNEL, str(project_id)
+                )
+            for _ in range(30):
+                if len(project_config_cache) == 1:
+                    break
+                await asyncio.sleep(0.1)
+
+            assert project_config_cache.pop(project_id) is None
+            assert project_config_cache.pop("other") is not None
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
@@ -2,12 +2,17 @@
 Tests for sandbox service with mock backend.
 """
 
+import asyncio
+import base64
 import pytest
+import tempfile
+import threading
 import uuid
 from datetime import datetime, timezone
 from unittest.mock import patch
 
 from acontext_core.service.data import sandbox as SB
+from acontext_core.service.data import sandbox_events as SE
 from acontext_core.schema.orm import Project, SandboxLog
 from acontext_core.schema.sandbox import (
     SandboxCreateConfig,
@@ -16,8 +21,15 @@ from acontext_core.schema.sandbox import (
     SandboxCommandOutput,
     SandboxStatus,
 )
+from acontext_core.env import DEFAULT_CORE_CONFIG
 from acontext_core.infra.db import DatabaseClient
-from acontext_core.infra.sandbox.backend.base import SandboxBackend
+from acontext_core.infra.redis import RedisClient
+from acontext_core.infra.sandbox.backend.base import (
+    SandboxBackend,
+    iter_b64decode,
+    b64encode_stream,
+    spool_stream,
+)
 
 
 class MockSandboxBackend(SandboxBackend):
@@ -92,6 +104,17 @@ class MockSandboxBackend(SandboxBackend):
         return True
 
 
+@pytest.fixture(autouse=True)
+def sandbox_event_writer():
+    """Flush sandbox activity through this test's database client."""
+    with (
+        patch.object(SE, "DB_CLIENT", DatabaseClient()),
+        patch.object(SE, "_PENDING_EVENTS", []),
+        patch.object(SE, "_PENDING_KEEPALIVES", {}),
+    ):
+        yield
+
+
 @pytest.fixture
 def mock_sandbox_backend():
     """Create a mock sandbox backend and patch SANDBOX_CLIENT."""
@@ -203,18 +226,25 @@ class TestExecCommandLogging:
             result2 = await SB.exec_command(session, unified_id, "ls -la")
             assert result2.ok()
 
-            # Refresh the sandbox log to get updated history_commands
+            # Commands are written behind
             await session.commit()
+            assert (await SE.flush_sandbox_events()).data == 2
             sandbox_log = await SB.get_sandbox_log(session, unified_id)
             assert sandbox_log.ok()
 
-            # Verify history_commands contains both commands
-            history = sandbox_log.data.history_commands
-            assert len(history) == 2
-            assert history[0]["command"] == "echo hello"
-            assert history[0]["exit_code"] == 0
-            assert history[1]["command"] == "ls -la"
-            assert history[1]["exit_code"] == 0
+            # Verify the events contain both commands
+            events = sandbox_log.data.events
+            assert [e.kind for e in events] == ["command", "command"]
+            assert events[0].payload == {"command": "echo hello", "exit_code": 0}
+            assert events[1].payload == {"command": "ls -la", "exit_code": 0}
+
+            # And the history_commands mirror too
+            row = await session.get(SandboxLog, unified_id)
+            await session.refresh(row)
+            assert [h["command"] for h in row.history_commands] == [
+                "echo hello",
+                "ls -la",
+            ]
 
             # Clean up
             await session.delete(project)
@@ -244,9 +274,10 @@ class TestExecCommandLogging:
             assert result.ok()
 
             await session.commit()
+            await SE.flush_sandbox_events()
             sandbox_log = await SB.get_sandbox_log(session, unified_id)
             assert sandbox_log.ok()
-            assert len(sandbox_log.data.history_commands) == 1
+            assert len(sandbox_log.data.events) == 1
 
             # Clean up
             await session.delete(project)
@@ -287,13 +318,14 @@ class TestDownloadFileLogging:
             )
             assert result2.ok()
 
-            # Refresh and verify
+            # Flush and verify
             await session.commit()
+            await SE.flush_sandbox_events()
             sandbox_log = await SB.get_sandbox_log(session, unified_id)
             assert sandbox_log.ok()
 
-            # Verify generated_files contains both files
-            files = sandbox_log.data.generated_files
+            # Verify the events contain both files
+            files = [e.payload for e in sandbox_log.data.events if e.kind == "file"]
             assert len(files) == 2
             assert files[0]["sandbox_path"] == "/app/output.txt"
             assert files[1]["sandbox_path"] == "/app/report.pdf"
@@ -368,3 +400,292 @@ class TestKillSandbox:
 
             # Clean up
             await session.delete(project)
+
+
+class TestSandboxRefCache:
+    """Test that the sandbox id mapping is served from the caches."""
+
+    @pytest.fixture
+    async def redis_client(self):
+        redis_client = RedisClient()
+        with patch.object(SB, "REDIS_CLIENT", redis_client):
+            yield redis_client
+        await redis_client.close()
+
+    @pytest.mark.asyncio
+    async def test_commands_skip_the_mapping_lookup(
+        self, mock_sandbox_backend, redis_client
+    ):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            create_result = await SB.create_sandbox(
+                session, project.id, SandboxCreateConfig()
+            )
+            unified_id = uuid.UUID(create_result.data.sandbox_id)
+            # Cached once the row commits
+            assert SB.SANDBOX_REF_CACHE.get(unified_id) is None
+        assert SB.SANDBOX_REF_CACHE.get(unified_id) is not None
+
+        async with db_client.get_session_context() as session:
+            with patch.object(SB, "select", wraps=SB.select) as select:
+                for command in ("ls", "pwd"):
+                    assert (await SB.exec_command(session, unified_id, command)).ok()
+                assert select.call_count == 0
+
+                # Another replica: empty local cache, same Redis
+                SB.SANDBOX_REF_CACHE.clear()
+                assert (await SB.exec_command(session, unified_id, "ls")).ok()
+                assert select.call_count == 0
+
+                async with redis_client.get_client_context() as client:
+                    await client.delete(SB._sandbox_ref_key(unified_id))
+                SB.SANDBOX_REF_CACHE.clear()
+                ref = (await SB._get_sandbox_ref(session, unified_id)).data
+                assert select.call_count == 1
+            assert ref.backend_type == "mock"
+            assert ref.project_id == project.id
+
+            assert (await SB.kill_sandbox(session, unified_id)).ok()
+            # Evicted once the kill commits
+            assert SB.SANDBOX_REF_CACHE.get(unified_id) is not None
+
+        async with db_client.get_session_context() as session:
+            assert SB.SANDBOX_REF_CACHE.get(unified_id) is None
+            result = await SB.exec_command(session, unified_id, "ls")
+            assert "was killed" in result.error.errmsg
+
+            await session.delete(await session.get(Project, project.id))
+
+    @pytest.mark.asyncio
+    async def test_rolled_back_sandbox_is_not_cached(
+        self, mock_sandbox_backend, redis_client
+    ):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            create_result = await SB.create_sandbox(
+                session, project.id, SandboxCreateConfig()
+            )
+            unified_id = uuid.UUID(create_result.data.sandbox_id)
+            await session.rollback()
+
+        assert SB.SANDBOX_REF_CACHE.get(unified_id) is None
+        async with redis_client.get_client_context() as client:
+            assert await client.get(SB._sandbox_ref_key(unified_id)) is None
+
+    @pytest.mark.asyncio
+    async def test_kill_invalidates_other_replicas(self, redis_client):
+        sandbox_id = uuid.uuid4()
+        ref = SB.SandboxRef(
+            backend_type="mock", backend_sandbox_id="b", project_id=uuid.uuid4()
+        )
+        listener = asyncio.create_task(SB.listen_sandbox_ref_invalidation())
+        try:
+            # Wait for the subscription, which clears the cache
+            await asyncio.sleep(0.3)
+            SB.SANDBOX_REF_CACHE.set("other", ref)
+            SB.SANDBOX_REF_CACHE.set(sandbox_id, ref)
+
+            async with redis_client.get_client_context() as client:
+                await client.publish(SB.SANDBOX_REF_INVALIDATE_CHANNEL, str(sandbox_id))
+            for _ in range(30):
+                if SB.SANDBOX_REF_CACHE.get(sandbox_id) is None:
+                    break
+                await asyncio.sleep(0.1)
+
+            assert SB.SANDBOX_REF_CACHE.get(sandbox_id) is None
+            assert SB.SANDBOX_REF_CACHE.get("other") is not None
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            SB.SANDBOX_REF_CACHE.clear()
+
+
+class TestSandboxActivityWriteBehind:
+    """Test that sandbox activity is written in batches."""
+
+    @pytest.mark.asyncio
+    async def test_events_are_batched_and_paged(self, mock_sandbox_backend):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            create_result = await SB.create_sandbox(
+                session, project.id, SandboxCreateConfig()
+            )
+            unified_id = uuid.UUID(create_result.data.sandbox_id)
+            await session.commit()
+
+            with patch.object(DEFAULT_CORE_CONFIG, "sandbox_log_inline_history_max", 3):
+                for i in range(5):
+                    assert (await SB.exec_command(session, unified_id, f"c{i}")).ok()
+                assert SE.pending_stats() == {"events": 5, "keepalives": 1}
+                assert (await SE.flush_sandbox_events()).data == 5
+            assert SE.pending_stats() == {"events": 0, "keepalives": 0}
+
+            pages = []
+            after_seq = None
+            while True:
+                page = (
+                    await SB.get_sandbox_log(
+                        session, unified_id, limit=2, after_seq=after_seq
+                    )
+                ).data
+                pages.append([e.payload["command"] for e in page.events])
+                after_seq = page.next_after_seq
+                if after_seq is None:
+                    break
+            assert pages == [["c0", "c1"], ["c2", "c3"], ["c4"]]
+
+            # The mirror keeps only the latest entries
+            row = await session.get(SandboxLog, unified_id)
+            await session.refresh(row)
+            assert [h["command"] for h in row.history_commands] == ["c2", "c3", "c4"]
+
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_keepalives_are_coalesced(self, mock_sandbox_backend):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            create_result = await SB.create_sandbox(
+                session, project.id, SandboxCreateConfig()
+            )
+            unified_id = uuid.UUID(create_result.data.sandbox_id)
+            await session.commit()
+
+            # The latest keepalive of the window wins
+            await SB.update_sandbox(
+                session,
+                unified_id,
+                SandboxUpdateConfig(keepalive_longer_by_seconds=3600),
+            )
+            await SB.exec_command(session, unified_id, "ls")
+            await SE.flush_sandbox_events()
+            row = await session.get(SandboxLog, unified_id)
+            await session.refresh(row)
+            keepalive = DEFAULT_CORE_CONFIG.sandbox_default_keepalive_seconds
+            assert keepalive <= row.will_total_alive_seconds <= keepalive + 5
+
+            await SB.update_sandbox(
+                session,
+                unified_id,
+                SandboxUpdateConfig(keepalive_longer_by_seconds=3600),
+            )
+            assert (await SB.kill_sandbox(session, unified_id)).ok()
+            await session.commit()
+            await SE.flush_sandbox_events()
+            await session.refresh(row)
+            assert 0 <= row.will_total_alive_seconds <= 5
+
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_kill_wins_over_later_touches(self, mock_sandbox_backend):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            create_result = await SB.create_sandbox(
+                session, project.id, SandboxCreateConfig()
+            )
+            unified_id = uuid.UUID(create_result.data.sandbox_id)
+            await session.commit()
+
+            assert (await SB.kill_sandbox(session, unified_id)).ok()
+            await session.commit()
+            # A command in flight during the kill, then reading the log
+            SE.touch_sandbox_keepalive(unified_id)
+            assert (await SB.get_sandbox_log(session, unified_id)).ok()
+            await SE.flush_sandbox_events()
+            row = await session.get(SandboxLog, unified_id)
+            await session.refresh(row)
+            assert 0 <= row.will_total_alive_seconds <= 5
+
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_requeues(self):
+        sandbox_id = uuid.uuid4()
+        SE.record_sandbox_event(sandbox_id, "command", {"command": "ls"})
+        SE.touch_sandbox_keepalive(sandbox_id)
+
+        with patch.object(
+            SE.DB_CLIENT, "get_session_context", side_effect=RuntimeError("db down")
+        ):
+            assert not (await SE.flush_sandbox_events()).ok()
+        assert SE.pending_stats() == {"events": 1, "keepalives": 1}
+
+        # Unknown sandboxes are dropped
+        assert (await SE.flush_sandbox_events()).data == 0
+        assert SE.pending_stats() == {"events": 0, "keepalives": 0}
+
+
+class TestBase64Streaming:
+    @pytest.mark.asyncio
+    async def test_roundtrip_in_uneven_chunks(self):
+        data = bytes(range(256)) * 41
+
+        async def chunks():
+            for i in range(0, len(data), 1000):
+                yield data[i : i + 1000]
+
+        encoded = await b64encode_stream(chunks())
+        assert encoded == base64.b64encode(data).decode("ascii")
+
+        decoded = [c async for c in iter_b64decode(encoded, 1001)]
+        assert all(len(c) <= 1001 for c in decoded)
+        assert b"".join(decoded) == data
+
+
+class TestSpoolStream:
+    @pytest.mark.asyncio
+    async def test_disk_writes_run_off_the_event_loop(self):
+        data = bytes(range(256)) * 40
+        on_loop = []
+        write = tempfile.SpooledTemporaryFile.write
+
+        def recording_write(self, s):
+            on_loop.append(threading.current_thread() is threading.main_thread())
+            return write(self, s)
+
+        async def chunks():
+            for i in range(0, len(data), 1024):
+                yield data[i : i + 1024]
+
+        with patch.object(tempfile.SpooledTemporaryFile, "write", recording_write):
+            spooled = await spool_stream(chunks(), max_memory=4096)
+        with spooled:
+            assert spooled.read() == data
+        # The first 4 chunks fit in memory, the rollover and later writes don't
+        assert on_loop == [True] * 4 + [False] * 6
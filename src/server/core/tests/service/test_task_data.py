@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import uuid
 from sqlalchemy import select, func
@@ -7,6 +8,17 @@ from acontext_core.service.data.task import (
     insert_task,
     delete_task,
     append_progress_to_task,
+    apply_task_mutations,
+    replay_task_mutations,
+    assign_sort_keys,
+    TASK_ORDER_GAP,
+)
+from acontext_core.schema.session.task import (
+    TaskSchema,
+    TaskData,
+    TaskInsertOp,
+    TaskDeleteOp,
+    TaskMoveOp,
 )
 from acontext_core.schema.orm import Task, Project, Session
 from acontext_core.schema.result import Result
@@ -548,9 +560,9 @@ class TestInsertTask:
             t_data, error = result.unpack()
             assert error is None
             assert t_data is not None
-            assert isinstance(t_data, Task)  # Should return Task object, not UUID
+            assert isinstance(t_data, TaskSchema)
             assert t_data.order == 1  # Should be at position 1
-            assert t_data.data == data
+            assert t_data.data.task_description == data["task_description"]
 
             await session.delete(project)
 
@@ -573,7 +585,7 @@ class TestInsertTask:
             await session.flush()
 
             data = {"task_description": "Custom status task"}
-            after_order = 1  # Insert after position 1 (will become position 2)
+            after_order = 1  # Clamped to the end of the empty session
             custom_status = "running"
 
             result = await insert_task(
@@ -588,10 +600,10 @@ class TestInsertTask:
             t_data, error = result.unpack()
             assert error is None
             assert t_data is not None
-            assert isinstance(t_data, Task)
+            assert isinstance(t_data, TaskSchema)
             assert t_data.status == custom_status
-            assert t_data.order == 2  # Should be at position 2
-            assert t_data.data == data
+            assert t_data.order == 1
+            assert t_data.data.task_description == data["task_description"]
 
             await session.delete(project)
 
@@ -614,7 +626,7 @@ class TestInsertTask:
             await session.flush()
 
             data = {"task_description": "Default status task"}
-            after_order = 2  # Insert after position 2 (will become position 3)
+            after_order = 2  # Clamped to the end of the empty session
 
             result = await insert_task(
                 session, project.id, test_session.id, after_order, data
@@ -623,9 +635,9 @@ class TestInsertTask:
             data, error = result.unpack()
             assert error is None
             assert data is not None
-            assert isinstance(data, Task)
+            assert isinstance(data, TaskSchema)
             assert data.status == "pending"  # Should have default status
-            assert data.order == 3  # Should be at position 3
+            assert data.order == 1
 
             await session.delete(project)
 
@@ -659,8 +671,8 @@ class TestInsertTask:
             data, error = result.unpack()
             assert error is None
             assert data is not None
-            assert isinstance(data, Task)
-            assert data.data == complex_data
+            assert isinstance(data, TaskSchema)
+            assert data.data == TaskData(**complex_data)
 
             await session.delete(project)
 
@@ -1054,17 +1066,17 @@ class TestIntegrationScenarios:
             assert tasks[3].id == task3.id
             assert tasks[3].order == 4  # Was 3, incremented to 4
 
-            # Now test manual order updates
-            await update_task(session, task1.id, order=10)  # Move task1 to the end
+            # Now test manual sort key updates
+            await update_task(
+                session, task1.id, order=10 * TASK_ORDER_GAP
+            )  # Move task1 to the end
 
-            # Fetch again and verify
+            # Fetch again and verify, orders stay dense
             fetch_result2 = await fetch_current_tasks(session, test_session.id)
             tasks2, _ = fetch_result2.unpack()
 
-            # Note: This doesn't automatically reorder other tasks - that would need
-            # additional logic. For now, just verify the update worked.
-            task1_updated = next(t for t in tasks2 if t.id == task1.id)
-            assert task1_updated.order == 10
+            assert tasks2[-1].id == task1.id
+            assert [t.order for t in tasks2] == [1, 2, 3, 4]
 
             await session.delete(project)
 
@@ -1339,4 +1351,322 @@ class TestAppendProgressToTask:
             assert error is not None
             assert "not found" in error.errmsg
 
+    @pytest.mark.asyncio
+    async def test_append_progress_to_json_null_lists(self):
+        """Test appending when progresses and user_preferences are JSON null"""
+        db_client = DatabaseClient()
+        await db_client.create_tables()
 
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac="test_key_hmac_progress_null",
+                secret_key_hash_phc="test_key_hash_progress_null",
+            )
+            session.add(project)
+            await session.flush()
+            test_session = Session(project_id=project.id)
+            session.add(test_session)
+            await session.flush()
+            task = Task(
+                session_id=test_session.id,
+                project_id=project.id,
+                order=1,
+                data={
+                    "task_description": "Test task",
+                    "progresses": None,
+                    "user_preferences": None,
+                },
+                status="pending",
+            )
+            session.add(task)
+            await session.flush()
+
+            result = await append_progress_to_task(
+                session, task.id, "Step 1", user_preference="Use tabs"
+            )
+            assert result.ok()
+
+            await session.refresh(task)
+            assert task.data == {
+                "task_description": "Test task",
+                "progresses": ["Step 1"],
+                "user_preferences": ["Use tabs"],
+            }
+
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_appends_keep_all_progresses(self):
+        """Test that concurrent appends from different DB sessions are not lost"""
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac="test_key_hmac_progress_concurrent",
+                secret_key_hash_phc="test_key_hash_progress_concurrent",
+            )
+            session.add(project)
+            await session.flush()
+            test_session = Session(project_id=project.id)
+            session.add(test_session)
+            await session.flush()
+            task = Task(
+                session_id=test_session.id,
+                project_id=project.id,
+                order=1,
+                data={"task_description": "Test task", "progresses": []},
+                status="pending",
+            )
+            session.add(task)
+            await session.flush()
+            project_id, task_id = project.id, task.id
+
+        async def append(i: int):
+            async with db_client.get_session_context() as session:
+                r = await append_progress_to_task(session, task_id, f"Step {i}")
+                assert r.ok()
+
+        await asyncio.gather(*[append(i) for i in range(10)])
+
+        async with db_client.get_session_context() as session:
+            task = await session.get(Task, task_id)
+            assert sorted(task.data["progresses"]) == sorted(
+                f"Step {i}" for i in range(10)
+            )
+            await session.delete(await session.get(Project, project_id))
+
+
+class TestApplyTaskMutations:
+    def test_replay_task_mutations(self):
+        sequence = replay_task_mutations(
+            ["a", "b", "c"],
+            [
+                TaskInsertOp(after_order=0, data={}),
+                TaskInsertOp(after_order=9, data={}),
+                TaskDeleteOp(order=3),
+                TaskMoveOp(order=4, after_order=1),
+                TaskMoveOp(order=2, after_order=2),
+            ],
+            [0, 1],
+        )
+        # [0, a, b, c, 1] -> [0, a, c, 1] -> [0, 1, a, c]
+        assert sequence == [0, 1, "a", "c"]
+
+        with pytest.raises(ValueError):
+            replay_task_mutations(["a"], [TaskDeleteOp(order=2)], [])
+
+    @pytest.mark.asyncio
+    async def test_apply_task_mutations(self):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac="test_key_hmac", secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            test_session = Session(project_id=project.id)
+            session.add(test_session)
+            await session.flush()
+            session.add_all(
+                [
+                    Task(
+                        session_id=test_session.id,
+                        project_id=project.id,
+                        order=i,
+                        data={"task_description": f"Task {i}"},
+                        status="pending",
+                    )
+                    for i in (1, 2, 3, 4)
+                ]
+            )
+            await session.flush()
+
+            mutations = [
+                TaskInsertOp(after_order=1, data={"task_description": "New A"}),
+                TaskInsertOp(
+                    after_order=0,
+                    data={"task_description": "New B"},
+                    status="running",
+                ),
+                TaskDeleteOp(order=4),
+                TaskMoveOp(order=5, after_order=0),
+            ]
+            result = await apply_task_mutations(
+                session, project.id, test_session.id, mutations
+            )
+            inserted, error = result.unpack()
+            assert error is None
+            assert [t.data.task_description for t in inserted] == [
+                "New A",
+                "New B",
+            ]
+
+            fetch_result = await fetch_current_tasks(session, test_session.id)
+            all_tasks, _ = fetch_result.unpack()
+            assert [t.data.task_description for t in all_tasks] == [
+                "Task 4",
+                "New B",
+                "Task 1",
+                "New A",
+                "Task 3",
+            ]
+            assert [t.order for t in all_tasks] == [1, 2, 3, 4, 5]
+            assert [t.order for t in inserted] == [4, 2]
+            assert all_tasks[1].status == "running"
+
+            # Out of range mutations are rejected before any write
+            result = await apply_task_mutations(
+                session, project.id, test_session.id, [TaskDeleteOp(order=6)]
+            )
+            assert not result.ok()
+
+            await session.delete(project)
+
+
+class TestTaskSortKeys:
+    def test_assign_sort_keys(self):
+        assert assign_sort_keys([None, None]) == [TASK_ORDER_GAP, 2 * TASK_ORDER_GAP]
+        assert assign_sort_keys([None, 10, None, None, 16, None]) == [
+            5,
+            10,
+            12,
+            14,
+            16,
+            16 + TASK_ORDER_GAP,
+        ]
+        # No room left between 1 and 2
+        assert assign_sort_keys([1, None, 2]) is None
+
+    @pytest.mark.asyncio
+    async def test_insert_keeps_other_rows(self):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac="test_key_hmac", secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            test_session = Session(project_id=project.id)
+            session.add(test_session)
+            await session.flush()
+
+            for i, description in enumerate(["A", "C", "D"]):
+                r = await insert_task(
+                    session,
+                    project.id,
+                    test_session.id,
+                    i,
+                    {"task_description": description},
+                )
+                assert r.ok()
+
+            async def sort_keys():
+                rows = await session.execute(
+                    select(Task.order)
+                    .where(Task.session_id == test_session.id)
+                    .order_by(Task.order)
+                )
+                return rows.scalars().all()
+
+            assert await sort_keys() == [
+                TASK_ORDER_GAP,
+                2 * TASK_ORDER_GAP,
+                3 * TASK_ORDER_GAP,
+            ]
+
+            r = await insert_task(
+                session, project.id, test_session.id, 1, {"task_description": "B"}
+            )
+            task, _ = r.unpack()
+            assert task.order == 2
+            # Only the new row takes a key, between its neighbours
+            assert await sort_keys() == [
+                TASK_ORDER_GAP,
+                TASK_ORDER_GAP + TASK_ORDER_GAP // 2,
+                2 * TASK_ORDER_GAP,
+                3 * TASK_ORDER_GAP,
+            ]
+
+            # Moving D to the front only rekeys D
+            r = await apply_task_mutations(
+                session,
+                project.id,
+                test_session.id,
+                [TaskMoveOp(order=4, after_order=0)],
+            )
+            assert r.ok()
+            assert await sort_keys() == [
+                TASK_ORDER_GAP // 2,
+                TASK_ORDER_GAP,
+                TASK_ORDER_GAP + TASK_ORDER_GAP // 2,
+                2 * TASK_ORDER_GAP,
+            ]
+
+            r = await fetch_current_tasks(session, test_session.id)
+            tasks, _ = r.unpack()
+            assert [(t.order, t.data.task_description) for t in tasks] == [
+                (1, "D"),
+                (2, "A"),
+                (3, "B"),
+                (4, "C"),
+            ]
+
+            await session.delete(project)
+
+    @pytest.mark.asyncio
+    async def test_rebalance_when_no_room(self):
+        db_client = DatabaseClient()
+        await db_client.create_tables()
+
+        async with db_client.get_session_context() as session:
+            project = Project(
+                secret_key_hmac="test_key_hmac", secret_key_hash_phc="test_key_hash"
+            )
+            session.add(project)
+            await session.flush()
+            test_session = Session(project_id=project.id)
+            session.add(test_session)
+            await session.flush()
+            session.add_all(
+                [
+                    Task(
+                        session_id=test_session.id,
+                        project_id=project.id,
+                        order=i,
+                        data={"task_description": f"Task {i}"},
+                    )
+                    for i in (1, 2)
+                ]
+            )
+            await session.flush()
+
+            r = await insert_task(
+                session, project.id, test_session.id, 1, {"task_description": "New"}
+            )
+            task, _ = r.unpack()
+            assert task.order == 2
+
+            rows = await session.execute(
+                select(Task.order)
+                .where(Task.session_id == test_session.id)
+                .order_by(Task.order)
+            )
+            assert rows.scalars().all() == [
+                TASK_ORDER_GAP,
+                2 * TASK_ORDER_GAP,
+                3 * TASK_ORDER_GAP,
+            ]
+            r = await fetch_current_tasks(session, test_session.id)
+            tasks, _ = r.unpack()
+            assert [t.data.task_description for t in tasks] == [
+                "Task 1",
+                "New",
+                "Task 2",
+            ]
+
+            await session.delete(project)
@@ -0,0 +1,130 @@
+"""
+Benchmark of the aggregated task query against the previous ORM fan-out.
+
+Run with `pytest -s` to see the timings.
+"""
+
+import time
+import uuid
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert
+from sqlalchemy.orm import selectinload
+
+from acontext_core.service.data.task import fetch_current_tasks
+from acontext_core.schema.orm import Project, Session, Task, Message
+from acontext_core.schema.session.task import TaskSchema
+from acontext_core.infra.db import DatabaseClient
+
+N_TASKS = 40
+N_MESSAGES = 4000
+ROUNDS = 5
+
+FAKE_ASSET = {
+    "bucket": "b",
+    "s3_key": "k",
+    "etag": "e",
+    "sha256": "s",
+    "mime": "application/json",
+    "size_b": 1,
+}
+
+
+async def _fetch_current_tasks_orm(db_session, session_id) -> list[TaskSchema]:
+    """The previous implementation: load Message rows and sort them in Python."""
+    query = (
+        select(Task)
+        .where(Task.session_id == session_id)
+        .where(Task.is_planning == False)  # noqa: E712
+        .options(selectinload(Task.messages))
+        .order_by(Task.order.asc())
+    )
+    result = await db_session.execute(query)
+    return [
+        TaskSchema(
+            id=t.id,
+            session_id=t.session_id,
+            order=t.order,
+            status=t.status,
+            data=t.data,
+            raw_message_ids=[
+                msg.id for msg in sorted(t.messages, key=lambda m: m.created_at)
+            ],
+        )
+        for t in result.scalars().all()
+    ]
+
+
+async def _timed(fn, *args) -> tuple[float, object]:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        out = await fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+@pytest.mark.asyncio
+async def test_fetch_current_tasks_benchmark():
+    db_client = DatabaseClient()
+    await db_client.create_tables()
+
+    async with db_client.get_session_context() as session:
+        project = Project(
+            secret_key_hmac="test_key_hmac", secret_key_hash_phc="test_key_hash"
+        )
+        session.add(project)
+        await session.flush()
+        test_session = Session(project_id=project.id)
+        session.add(test_session)
+        await session.flush()
+
+        task_ids = [uuid.uuid4() for _ in range(N_TASKS)]
+        await session.execute(
+            insert(Task),
+            [
+                {
+                    "id": task_id,
+                    "project_id": project.id,
+                    "session_id": test_session.id,
+                    "order": i + 1,
+                    "data": {"task_description": f"Task {i}"},
+                    "status": "running",
+                }
+                for i, task_id in enumerate(task_ids)
+            ],
+        )
+        # Interleave messages across tasks with distinct created_at
+        base = datetime.now(timezone.utc)
+        await session.execute(
+            insert(Message),
+            [
+                {
+                    "session_id": test_session.id,
+                    "role": "user",
+                    "parts_asset_meta": FAKE_ASSET,
+                    "task_id": task_ids[(i * 7) % N_TASKS],
+                    "created_at": base + timedelta(milliseconds=N_MESSAGES - i),
+                }
+                for i in range(N_MESSAGES)
+            ],
+        )
+        await session.flush()
+
+        orm_time, orm_tasks = await _timed(
+            _fetch_current_tasks_orm, session, test_session.id
+        )
+        session.expunge_all()
+        lean_time, r = await _timed(fetch_current_tasks, session, test_session.id)
+        lean_tasks, eil = r.unpack()
+        assert eil is None
+
+        assert lean_tasks == orm_tasks
+        assert sum(len(t.raw_message_ids) for t in lean_tasks) == N_MESSAGES
+        print(
+            f"\nfetch_current_tasks ({N_TASKS} tasks, {N_MESSAGES} messages): "
+            f"orm {orm_time * 1000:.1f}ms, aggregated {lean_time * 1000:.1f}ms"
+        )
+
+        await session.delete(test_session)
+        await session.delete(project)
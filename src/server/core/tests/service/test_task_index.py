@@ -0,0 +1,218 @@
+"""
+Tests for the semantic task index: incremental sync and both search backends.
+"""
+
+import uuid
+import numpy as np
+import pytest
+from sqlalchemy import select, update
+from unittest.mock import patch
+
+from acontext_core.env import DEFAULT_CORE_CONFIG
+from acontext_core.infra.db import DatabaseClient
+from acontext_core.infra.redis import RedisClient
+from acontext_core.llm.embeddings import cache as embedding_cache
+from acontext_core.schema.orm import Project, Session, Task, TaskEmbedding
+from acontext_core.schema.session.task import TaskStatus
+from acontext_core.service.data import task as TD
+from acontext_core.service.data import task_index as TI
+from acontext_core.util.vector_index import VectorIndex
+
+
+@pytest.fixture
+async def index_env():
+    redis_client = RedisClient()
+    db_client = DatabaseClient()
+    await db_client.create_tables()
+    with (
+        patch.object(embedding_cache, "REDIS_CLIENT", redis_client),
+        patch.object(TI, "DB_CLIENT", db_client),
+        patch.object(DEFAULT_CORE_CONFIG, "block_embedding_provider", "fake"),
+    ):
+        yield db_client
+    await redis_client.close()
+
+
+def test_vector_index_ivf_matches_brute_force():
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((2000, 16)).astype(np.float32)
+    exact = VectorIndex(vectors)
+    ivf = VectorIndex(vectors, nlist=20)
+    queries = vectors[:50] + 0.01 * rng.standard_normal((50, 16))
+
+    recall = np.mean(
+        [ivf.search(q, 1, nprobe=4)[0][0] == exact.search(q, 1)[0][0] for q in queries]
+    )
+    assert recall >= 0.95
+    top, scores = exact.search(vectors[7], 3)
+    assert top[0] == 7 and scores[0] == pytest.approx(1, abs=1e-5)
+    assert list(scores) == sorted(scores, reverse=True)
+
+    mask = np.zeros(len(vectors), dtype=bool)
+    mask[[3, 9]] = True
+    assert sorted(exact.search(vectors[7], 5, mask=mask)[0]) == [3, 9]
+
+
+def test_task_texts():
+    data = {
+        "task_description": "Deploy the API",
+        "progresses": ["Built the image", "Pushed it"],
+        "user_preferences": None,
+    }
+    assert TI.task_texts(data) == {
+        ("task_description", 0): "Deploy the API",
+        ("progress", 0): "Built the image",
+        ("progress", 1): "Pushed it",
+    }
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_tasks_are_not_queued(index_env):
+    task_id = uuid.uuid4()
+    async with index_env.get_session_context() as session:
+        await session.execute(select(Task.id).limit(1))
+        TI.mark_tasks_dirty(session, [task_id])
+        await session.rollback()
+    assert task_id not in TI._DIRTY_TASK_IDS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["pgvector", "numpy"])
+async def test_incremental_sync_and_search(index_env, backend):
+    db_client = index_env
+    async with db_client.get_session_context() as session:
+        project = Project(
+            secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc="test_key_hash"
+        )
+        session.add(project)
+        await session.flush()
+        sessions = [Session(project_id=project.id) for _ in range(2)]
+        session.add_all(sessions)
+        await session.flush()
+        tasks = []
+        for s, description in zip(
+            sessions, ["Fix the flaky login test", "Write the release notes"]
+        ):
+            r = await TD.insert_task(
+                session, project.id, s.id, 0, {"task_description": description}
+            )
+            tasks.append(r.data)
+    # Queued once the session committed
+    assert {t.id for t in tasks} <= TI._DIRTY_TASK_IDS
+    TI._DIRTY_TASK_IDS.difference_update({t.id for t in tasks})
+
+    async with db_client.get_session_context() as session:
+        r = await TI.sync_task_index(session, [t.id for t in tasks])
+        assert r.data == 2
+
+    async with db_client.get_session_context() as session:
+        await TD.append_progress_to_task(
+            session, tasks[0].id, "Retried the login with a fresh cookie jar"
+        )
+        await TD.update_task(session, tasks[1].id, status="success")
+    with patch.object(TI, "_DIRTY_TASK_IDS", {tasks[0].id}):
+        r = await TI.flush_task_index()
+    # Only the new progress is embedded
+    assert r.data == 1
+
+    with patch.object(DEFAULT_CORE_CONFIG, "task_search_backend", backend):
+        async with db_client.get_session_context() as session:
+            r = await TI.search_tasks(
+                session, project.id, "Retried the login with a fresh cookie jar"
+            )
+            hits, eil = r.unpack()
+            assert eil is None
+            # Fake embeddings only match exact texts, the rest come in any order
+            assert (hits[0].task_id, hits[0].kind) == (tasks[0].id, "progress")
+            assert {(h.task_id, h.kind) for h in hits[1:]} == {
+                (tasks[0].id, "task_description"),
+                (tasks[1].id, "task_description"),
+            }
+            assert hits[0].score == pytest.approx(1, abs=1e-4)
+            assert hits[0].task_description == "Fix the flaky login test"
+
+            r = await TI.search_tasks(
+                session, project.id, "release", statuses=[TaskStatus.SUCCESS]
+            )
+            assert [h.task_id for h in r.data] == [tasks[1].id]
+            r = await TI.search_tasks(
+                session, project.id, "login", session_ids=[sessions[0].id], top_k=1
+            )
+            assert [h.session_id for h in r.data] == [sessions[0].id]
+
+            await session.delete(await session.get(Project, project.id))
+
+
+@pytest.mark.asyncio
+async def test_reconcile_indexes_unqueued_tasks(index_env):
+    db_client = index_env
+    async with db_client.get_session_context() as session:
+        project = Project(
+            secret_key_hmac=uuid.uuid4().hex, secret_key_hash_phc="test_key_hash"
+        )
+        session.add(project)
+        await session.flush()
+        s = Session(project_id=project.id)
+        session.add(s)
+        await session.flush()
+        # Written before the index existed, so never queued
+        tasks = [
+            Task(
+                project_id=project.id,
+                session_id=s.id,
+                order=i + 1,
+                data=data,
+                is_planning=i == 2,
+            )
+            for i, data in enumerate(
+                [
+                    {"task_description": "Migrate the billing database"},
+                    {"task_description": "", "progresses": None},
+                    {"task_description": "Planning"},
+                ]
+            )
+        ]
+        session.add_all(tasks)
+    task_ids = [t.id for t in tasks]
+    TI._DIRTY_TASK_IDS.difference_update(task_ids)
+
+    r = await TI.reconcile_task_index()
+    assert r.ok() and r.data >= 1
+    async with db_client.get_session_context() as session:
+        result = await session.execute(
+            select(TaskEmbedding.task_id, TaskEmbedding.text).where(
+                TaskEmbedding.task_id.in_(task_ids)
+            )
+        )
+        assert result.all() == [(task_ids[0], "Migrate the billing database")]
+    # Everything is in sync, tasks without texts are not retried
+    with patch.object(TI, "sync_task_index", wraps=TI.sync_task_index) as sync:
+        assert (await TI.reconcile_task_index()).unpack() == (0, None)
+        sync.assert_not_called()
+
+    # Changed without being queued, e.g. by a process that crashed before its sync
+    async with db_client.get_session_context() as session:
+        await session.execute(
+            update(Task)
+            .where(Task.id == task_ids[0])
+            .values(
+                data={
+                    "task_description": "Migrate the billing database",
+                    "progresses": ["Copied the invoices table"],
+                }
+            )
+        )
+    assert (await TI.reconcile_task_index()).unpack() == (1, None)
+
+    with patch.object(DEFAULT_CORE_CONFIG, "task_search_backend", "pgvector"):
+        async with db_client.get_session_context() as session:
+            r = await TI.search_tasks(session, project.id, "Copied the invoices table")
+            hits, eil = r.unpack()
+            assert eil is None
+            assert [(h.task_id, h.kind) for h in hits] == [
+                (task_ids[0], "progress"),
+                (task_ids[0], "task_description"),
+            ]
+            assert hits[0].score == pytest.approx(1, abs=1e-4)
+
+            await session.delete(await session.get(Project, project.id))